@@ -0,0 +1,327 @@
+"""ASGI serving mode for the backend.
+
+Serves the same routes and JSON shapes as the Flask app in index.py, but the
+handlers run as real coroutines on one persistent event loop, so concurrent
+requests overlap their upstream network waits.
+
+To start: uvicorn asgi:app --app-dir api --port 5000
+"""
+import asyncio
+import inspect
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+
+import index
+from http_client import close_session
+from metrics import RequestTimer, registry as metrics_registry
+
+ROUTES = []
+
+
+def route(pattern, methods):
+    """Register an async handler for a path pattern (regex with named groups)"""
+    def decorator(func):
+        # Metrics label in Flask style, e.g. /token_price/<token_symbol>
+        label = re.sub(r"\(\?P<(\w+)>[^)]*\)", r"<\1>", pattern)
+        ROUTES.append((re.compile(f"^{pattern}$"), set(methods), func, label))
+        return func
+    return decorator
+
+
+class PlainText(str):
+    """Handler result sent with an explicit content type"""
+
+    def __new__(cls, text, content_type):
+        obj = super().__new__(cls, text)
+        obj.content_type = content_type
+        return obj
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.args = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode()).items()}
+        self.body = body
+
+    def get_json(self):
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+
+@route(r"/metrics", ["GET"])
+async def metrics_route(req):
+    return PlainText(metrics_registry.render(), "text/plain; version=0.0.4"), 200
+
+
+@route(r"/", ["GET"])
+async def home(req):
+    return "Hello, World!", 200
+
+
+def _wallet_session_token(req, values):
+    """Session token from the X-Wallet-Session header, or session_token in the query or body"""
+    return req.headers.get(index.WALLET_SESSION_HEADER.lower()) or values.get("session_token")
+
+
+@route(r"/ask_ai/(?P<question>.+)", ["GET"])
+async def ask_ai_get(req, question):
+    model = req.args.get("model")
+    return await index.ask_ai_view(question, model, req.args.get("wallet_address"), _wallet_session_token(req, req.args))
+
+
+@route(r"/ask_ai", ["POST", "OPTIONS"])
+async def ask_ai_post(req):
+    if req.method == "OPTIONS":
+        return "", 200
+
+    data = req.get_json() or {}
+    question = data.get("question", "")
+    model = data.get("model")
+    return await index.ask_ai_view(question, model, data.get("wallet_address"), _wallet_session_token(req, data))
+
+
+@route(r"/ask_ai_stream/(?P<question>.+)", ["GET"])
+async def ask_ai_stream_get(req, question):
+    model = req.args.get("model")
+    return await index.ask_ai_stream_view(
+        question, model, req.args.get("wallet_address"), _wallet_session_token(req, req.args)
+    )
+
+
+@route(r"/ask_ai_stream", ["POST", "OPTIONS"])
+async def ask_ai_stream_post(req):
+    if req.method == "OPTIONS":
+        return "", 200
+
+    data = req.get_json() or {}
+    question = data.get("question", "")
+    model = data.get("model")
+    return await index.ask_ai_stream_view(question, model, data.get("wallet_address"), _wallet_session_token(req, data))
+
+
+@route(r"/conversation/(?P<wallet_address>[^/]+)", ["GET", "DELETE"])
+async def conversation_route(req, wallet_address):
+    session_token = _wallet_session_token(req, req.args)
+    if req.method == "DELETE":
+        return await index.clear_conversation_view(wallet_address, session_token)
+    return await index.conversation_view(wallet_address, session_token)
+
+
+@route(r"/wallet_auth/nonce", ["POST"])
+async def wallet_nonce_route(req):
+    data = req.get_json() or {}
+    return await index.wallet_nonce_view(data.get("wallet_address"))
+
+
+@route(r"/wallet_auth/verify", ["POST"])
+async def wallet_verify_route(req):
+    data = req.get_json() or {}
+    return await index.wallet_verify_view(data.get("wallet_address"), data.get("signature"))
+
+
+@route(r"/token_price/(?P<token_symbol>[^/]+)", ["GET"])
+async def get_token_price_route(req, token_symbol):
+    return await index.token_price_view(token_symbol)
+
+
+@route(r"/token_prices", ["GET", "POST"])
+async def get_token_prices_route(req):
+    if req.method == "POST":
+        data = req.get_json() or {}
+        token_symbols = data.get("tokens", [])
+    else:
+        token_symbols = req.args.get("tokens", "").split(",")
+        token_symbols = [symbol.strip() for symbol in token_symbols if symbol.strip()]
+    return await index.token_prices_view(token_symbols)
+
+
+@route(r"/api_source", ["GET", "POST"])
+async def api_source_route(req):
+    new_source = None
+    price_mode = None
+    if req.method == "POST":
+        data = req.get_json() or {}
+        new_source = data.get("use_1inch", None)
+        price_mode = data.get("price_mode", None)
+    return await index.api_source_view(new_source, price_mode)
+
+
+@route(r"/get_exchange_quotes", ["POST"])
+async def get_exchange_quotes(req):
+    data = req.get_json() or {}
+    return await index.exchange_quotes_view(data.get("quotes", []))
+
+
+@route(r"/price_cache_stats", ["GET"])
+async def price_cache_stats_route(req):
+    return await index.price_cache_stats_view()
+
+
+@route(r"/price_history/(?P<token_symbol>[^/]+)", ["GET"])
+async def price_history_route(req, token_symbol):
+    return await index.price_history_view(
+        token_symbol, req.args.get("start"), req.args.get("end"), req.args.get("max_points")
+    )
+
+
+@route(r"/price_stream", ["GET"])
+async def price_stream_route(req):
+    symbols = [s.strip() for s in req.args.get("symbols", "").split(",") if s.strip()]
+    pairs = [p.strip() for p in req.args.get("pairs", "").split(",") if p.strip()]
+    return await index.price_stream_view(symbols, pairs)
+
+
+@route(r"/completion_cache_stats", ["GET"])
+async def completion_cache_stats_route(req):
+    return await index.completion_cache_stats_view()
+
+
+@route(r"/model_router_stats", ["GET"])
+async def model_router_stats_route(req):
+    return await index.model_router_stats_view()
+
+
+@route(r"/ask_ai_timings", ["GET"])
+async def ask_ai_timings_route(req):
+    return await index.ask_ai_timings_view()
+
+
+@route(r"/tournaments", ["GET", "POST"])
+async def tournaments_route(req):
+    if req.method == "POST":
+        return await index.create_tournament_view(req.get_json() or {})
+    return await index.tournaments_view()
+
+
+@route(r"/tournaments/(?P<tournament_id>[^/]+)", ["GET"])
+async def tournament_route(req, tournament_id):
+    include_history = req.args.get("history", "").lower() in ("1", "true", "yes")
+    return await index.tournament_view(tournament_id, include_history, req.args.get("limit"))
+
+
+@route(r"/tournaments/(?P<tournament_id>[^/]+)/cancel", ["POST"])
+async def cancel_tournament_route(req, tournament_id):
+    return await index.cancel_tournament_view(tournament_id)
+
+
+@route(r"/get_exchange_quote", ["GET"])
+async def get_exchange_quote(req):
+    from_token = req.args.get("from_token", "1INCH")
+    to_token = req.args.get("to_token", "ETH")
+    return await index.exchange_quote_view(from_token, to_token, req.args.get("from_amount", "10"))
+
+
+def _cors_headers(req):
+    origin = req.headers.get("origin")
+    if origin in index.CORS_ORIGINS:
+        return [(b"access-control-allow-origin", origin.encode()), (b"vary", b"Origin")]
+    return []
+
+
+async def _read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_response(send, status, payload, extra_headers):
+    if isinstance(payload, PlainText):
+        body = payload.encode()
+        content_type = payload.content_type.encode()
+    elif isinstance(payload, str):
+        body = payload.encode()
+        content_type = b"text/html; charset=utf-8"
+    else:
+        body = json.dumps(payload).encode()
+        content_type = b"application/json"
+    headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())] + extra_headers
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_event_stream(send, receive, events, extra_headers):
+    """Forward chunks from an async generator until it ends or the client leaves"""
+    headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")] + extra_headers
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def wait_for_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        async for chunk in events:
+            if disconnected.done():
+                break
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+        if not disconnected.done():
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        await events.aclose()
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            index.start_background_tasks(asyncio.get_running_loop())
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            index.price_streamer.stop()
+            index.price_feed.subscribers.clear()
+            await close_session()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    req = Request(scope, await _read_body(receive))
+    cors = _cors_headers(req)
+
+    # A path can be registered once per method, so 405 only once no route takes the method
+    allowed = set()
+    for pattern, methods, handler, label in ROUTES:
+        match = pattern.match(req.path)
+        if not match:
+            continue
+        if req.method not in methods:
+            allowed |= methods
+            continue
+        timer = RequestTimer(label, req.method)
+        status = 500
+        try:
+            try:
+                payload, status = await handler(req, **match.groupdict())
+            except Exception as e:
+                logging.error(f"Error handling {req.method} {req.path}: {str(e)}")
+                payload, status = {"error": str(e)}, 500
+            if inspect.isasyncgen(payload):
+                await _send_event_stream(send, receive, payload, cors)
+            else:
+                await _send_response(send, status, payload, cors)
+        finally:
+            timer.finish(status)
+        return
+
+    if allowed:
+        allow = [(b"allow", ", ".join(sorted(allowed)).encode())]
+        await _send_response(send, 405, {"error": "Method not allowed"}, cors + allow)
+        return
+    await _send_response(send, 404, {"error": "Not found"}, cors)
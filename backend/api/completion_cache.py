@@ -0,0 +1,181 @@
+"""Cache for LLM completions keyed by model and normalized messages.
+
+An in-memory LRU sits in front of an optional SQLite tier
+(COMPLETION_CACHE_DB). Whether and how long a completion is cached depends
+on its prompt type: deterministic extraction prompts are cached, answers that
+embed live prices are not.
+
+The memory tier is read on the event loop; SQLite reads and writes run on a
+worker thread so a slow disk never stalls it.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "2048"))
+COMPLETION_CACHE_DISK_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_DISK_MAX_ENTRIES", "100000"))
+COMPLETION_CACHE_DB = os.getenv("COMPLETION_CACHE_DB", "")
+
+# TTL in seconds per prompt type, 0 disables caching for that type
+COMPLETION_CACHE_POLICY = {
+    "swap_extraction": float(os.getenv("COMPLETION_CACHE_EXTRACTION_TTL", "86400")),
+    "answer": float(os.getenv("COMPLETION_CACHE_ANSWER_TTL", "0")),
+}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_content(content):
+    return _WHITESPACE_RE.sub(" ", content).strip().casefold()
+
+
+def cache_key(model, messages):
+    normalized = [{"role": m["role"], "content": normalize_content(m["content"])} for m in messages]
+    raw = json.dumps({"model": model, "messages": normalized}, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class CompletionCache:
+    def __init__(self, max_entries=COMPLETION_CACHE_MAX_ENTRIES, db_path=COMPLETION_CACHE_DB,
+                 disk_max_entries=COMPLETION_CACHE_DISK_MAX_ENTRIES, policy=None):
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self.policy = dict(COMPLETION_CACHE_POLICY if policy is None else policy)
+        self._entries = OrderedDict()  # key -> (reply, expires_at)
+        self._db = None
+        self._db_lock = threading.Lock()  # one connection, shared by worker threads
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, reply TEXT NOT NULL, expires_at REAL NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS completions_created_at ON completions (created_at)")
+        except sqlite3.Error as e:
+            logging.error(f"Completion cache: can't open {db_path}, using memory only: {str(e)}")
+            self._db = None
+
+    def ttl_for(self, prompt_type):
+        return self.policy.get(prompt_type, 0)
+
+    async def get(self, model, messages, prompt_type):
+        """Return a cached reply or None"""
+        return await self.get_any([model], messages, prompt_type)
+
+    async def get_any(self, models, messages, prompt_type):
+        """Return the first cached reply from any of models, or None; counts as one lookup"""
+        if self.ttl_for(prompt_type) <= 0:
+            self.bypassed += 1
+            return None
+
+        keys = [cache_key(model, messages) for model in models]
+        now = time.time()
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            reply, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return reply
+            del self._entries[key]
+
+        if self._db is not None and keys:
+            row = await asyncio.to_thread(self._read_disk, keys, now)
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(*row)
+                return row[1]
+
+        self.misses += 1
+        return None
+
+    async def put(self, model, messages, prompt_type, reply):
+        ttl = self.ttl_for(prompt_type)
+        if ttl <= 0:
+            return
+        key = cache_key(model, messages)
+        now = time.time()
+        self._remember(key, reply, now + ttl)
+        self.stores += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._write_disk, key, reply, now, now + ttl)
+
+    def _read_disk(self, keys, now):
+        """(key, reply, expires_at) of the first live row among keys, or None"""
+        try:
+            with self._db_lock:
+                for key in keys:
+                    row = self._db.execute(
+                        "SELECT reply, expires_at FROM completions WHERE key = ? AND expires_at > ?", (key, now)
+                    ).fetchone()
+                    if row is not None:
+                        return key, row[0], row[1]
+        except sqlite3.Error as e:
+            logging.error(f"Completion cache: disk lookup failed: {str(e)}")
+        return None
+
+    def _write_disk(self, key, reply, now, expires_at):
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO completions (key, reply, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    (key, reply, expires_at, now),
+                )
+                self._disk_writes += 1
+                # Prune occasionally rather than on every write
+                if self._disk_writes % 500 == 0:
+                    self._prune_disk(now)
+        except sqlite3.Error as e:
+            logging.error(f"Completion cache: disk write failed: {str(e)}")
+
+    def _remember(self, key, reply, expires_at):
+        self._entries[key] = (reply, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_disk(self, now):
+        self._db.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM completions WHERE key IN ("
+            "SELECT key FROM completions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_max_entries,),
+        )
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_enabled": self._db is not None,
+            "policy": self.policy,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else None,
+        }
@@ -0,0 +1,260 @@
+"""Per-user conversation history for multi-turn /ask_ai chats.
+
+Sessions are keyed by wallet address. Each one keeps its last
+CONVERSATION_MAX_TURNS question/answer pairs in a ring buffer. Turns pushed
+out of the buffer are folded into a short running summary, so nothing is
+dropped without a trace. Sessions are held in LRU order: the least recently
+used ones are evicted past CONVERSATION_MAX_SESSIONS, and sessions idle for
+CONVERSATION_IDLE_TIMEOUT are evicted too, which keeps memory flat however
+many users come and go.
+
+With CONVERSATION_DB set, turns are also written to SQLite, and an evicted
+session is reloaded from there on its next question. SQLite is only touched
+from worker threads, so the store's methods are coroutines.
+
+Before prompting, history is cut to a token budget
+(CONVERSATION_HISTORY_TOKENS), newest turns first. Long answers are
+shortened, and the summary of older turns fills the context slot.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "20"))
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000"))
+CONVERSATION_IDLE_TIMEOUT = float(os.getenv("CONVERSATION_IDLE_TIMEOUT", "3600"))
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "1000"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "250"))
+# Answers are stored and quoted back at most this long
+CONVERSATION_MAX_TURN_CHARS = int(os.getenv("CONVERSATION_MAX_TURN_CHARS", "4000"))
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "")
+CONVERSATION_DB_RETENTION = float(os.getenv("CONVERSATION_DB_RETENTION", str(30 * 86400)))
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), good enough for budgeting"""
+    return (len(text) + 3) // 4
+
+
+def shorten(text, max_tokens):
+    """Cut text to about max_tokens, on a word boundary"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut + " …"
+
+
+def _first_sentence(text):
+    line = text.strip().split("\n", 1)[0]
+    for end in (". ", "! ", "? "):
+        if end in line:
+            line = line.split(end, 1)[0] + end.strip()
+            break
+    return line
+
+
+class Session:
+    __slots__ = ("turns", "summary", "last_active")
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)  # (timestamp, question, response)
+        self.summary = []  # one short line per turn that fell out of the ring buffer
+        self.last_active = time.monotonic()
+
+    def add(self, turn, summary_tokens):
+        if len(self.turns) == self.turns.maxlen:
+            _, question, response = self.turns[0]
+            self.summary.append(shorten(f"Asked: {question} → {_first_sentence(response)}", 60))
+            while len(self.summary) > 1 and estimate_tokens(" ".join(self.summary)) > summary_tokens:
+                self.summary.pop(0)
+        self.turns.append(turn)
+
+
+class ConversationStore:
+    def __init__(self, max_turns=CONVERSATION_MAX_TURNS, max_sessions=CONVERSATION_MAX_SESSIONS,
+                 idle_timeout=CONVERSATION_IDLE_TIMEOUT, db_path=CONVERSATION_DB,
+                 history_tokens=CONVERSATION_HISTORY_TOKENS, summary_tokens=CONVERSATION_SUMMARY_TOKENS):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self._sessions = OrderedDict()  # user id -> Session, least recently used first
+        self._db = None
+        self._db_lock = threading.Lock()  # one connection, shared by worker threads
+        self._db_writes = 0
+        self.turns_added = 0
+        self.loaded_from_disk = 0
+        self.evictions = 0
+        self.idle_evictions = 0
+        self.truncated_prompts = 0
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path):
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS turns ("
+                "user_id TEXT NOT NULL, ts REAL NOT NULL, question TEXT NOT NULL, response TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS turns_user_ts ON turns (user_id, ts)")
+        except sqlite3.Error as e:
+            logging.error(f"Conversation store: can't open {db_path}, using memory only: {str(e)}")
+            self._db = None
+
+    def _evict_idle(self, now):
+        # LRU order means idle sessions are at the front
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if now - session.last_active < self.idle_timeout:
+                break
+            del self._sessions[user_id]
+            self.idle_evictions += 1
+
+    async def _session(self, user_id, create):
+        now = time.monotonic()
+        self._evict_idle(now)
+        session = self._sessions.get(user_id)
+        if session is None:
+            loaded = await self._load(user_id)
+            # Another request for this user may have set the session up during the read
+            session = self._sessions.get(user_id) or loaded
+            if session is None:
+                if not create:
+                    return None
+                session = Session(self.max_turns)
+            self._sessions[user_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        self._sessions.move_to_end(user_id)
+        session.last_active = now
+        return session
+
+    async def _load(self, user_id):
+        if self._db is None:
+            return None
+        rows = await asyncio.to_thread(self._read_turns, user_id)
+        if not rows:
+            return None
+        # Replaying the older half rebuilds the summary of turns beyond the ring buffer
+        session = Session(self.max_turns)
+        for row in reversed(rows):
+            session.add(tuple(row), self.summary_tokens)
+        self.loaded_from_disk += 1
+        return session
+
+    def _read_turns(self, user_id):
+        try:
+            with self._db_lock:
+                return self._db.execute(
+                    "SELECT ts, question, response FROM turns WHERE user_id = ? ORDER BY ts DESC LIMIT ?",
+                    (user_id, self.max_turns * 2),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Conversation store: load failed: {str(e)}")
+            return []
+
+    def _write_turn(self, user_id, turn):
+        try:
+            with self._db_lock:
+                self._db.execute("INSERT INTO turns (user_id, ts, question, response) VALUES (?, ?, ?, ?)", (user_id, *turn))
+                self._db_writes += 1
+                # Prune occasionally rather than on every write
+                if self._db_writes % 500 == 0:
+                    self._db.execute("DELETE FROM turns WHERE ts < ?", (time.time() - CONVERSATION_DB_RETENTION,))
+        except sqlite3.Error as e:
+            logging.error(f"Conversation store: disk write failed: {str(e)}")
+
+    def _delete_turns(self, user_id):
+        try:
+            with self._db_lock:
+                return self._db.execute("DELETE FROM turns WHERE user_id = ?", (user_id,)).rowcount > 0
+        except sqlite3.Error as e:
+            logging.error(f"Conversation store: delete failed: {str(e)}")
+            return False
+
+    async def add_turn(self, user_id, question, response):
+        """Record one question/answer pair for a user"""
+        if not user_id:
+            return
+        turn = (time.time(), question[:CONVERSATION_MAX_TURN_CHARS], response[:CONVERSATION_MAX_TURN_CHARS])
+        (await self._session(user_id, create=True)).add(turn, self.summary_tokens)
+        self.turns_added += 1
+        if self._db is not None:
+            await asyncio.to_thread(self._write_turn, user_id, turn)
+
+    async def prompt_context(self, user_id, max_tokens=None):
+        """(history, context) strings for the answer prompt, together within the token budget.
+
+        history holds the most recent turns that fit, newest kept first;
+        context summarizes the turns before them.
+        """
+        session = await self._session(user_id, create=False) if user_id else None
+        if session is None:
+            return "", ""
+        budget = self.history_tokens if max_tokens is None else max_tokens
+        # A single turn may use at most half the budget, so one long answer can't crowd out the rest
+        turn_tokens = max(budget // 2, 1)
+
+        lines = []
+        used = 0
+        included = 0
+        for _, question, response in reversed(session.turns):
+            line = f"User: {shorten(question, turn_tokens // 4)}\nAssistant: {shorten(response, turn_tokens)}"
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+            included += 1
+
+        summary = list(session.summary)
+        # Turns that didn't fit are summarized instead of quoted
+        for _, question, response in list(session.turns)[:len(session.turns) - included]:
+            summary.append(shorten(f"Asked: {question} → {_first_sentence(response)}", 60))
+        if included < len(session.turns) or session.summary:
+            self.truncated_prompts += 1
+        context = ""
+        while summary:
+            context = "Earlier in this conversation: " + " | ".join(summary)
+            if used + estimate_tokens(context) <= budget:
+                break
+            summary.pop(0)
+            context = ""
+
+        return "\n\n".join(reversed(lines)), context
+
+    async def turns(self, user_id):
+        session = await self._session(user_id, create=False)
+        if session is None:
+            return []
+        return [{"time": ts, "question": question, "response": response} for ts, question, response in session.turns]
+
+    async def clear(self, user_id):
+        """Forget a user's conversation, in memory and on disk"""
+        found = self._sessions.pop(user_id, None) is not None
+        if self._db is not None:
+            found = await asyncio.to_thread(self._delete_turns, user_id) or found
+        return found
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "max_turns": self.max_turns,
+            "history_tokens": self.history_tokens,
+            "disk_enabled": self._db is not None,
+            "turns_added": self.turns_added,
+            "loaded_from_disk": self.loaded_from_disk,
+            "evictions": self.evictions,
+            "idle_evictions": self.idle_evictions,
+            "truncated_prompts": self.truncated_prompts,
+        }
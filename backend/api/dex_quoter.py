@@ -0,0 +1,323 @@
+"""Local swap quotes from Uniswap V2-style pool reserves.
+
+Pools are loaded into an in-memory graph from one of two sources:
+- a JSON snapshot (DEX_POOLS_PATH), read when the quoter is created;
+- a node (DEX_RPC_URL), reading token0/token1/getReserves from the pair
+  contracts listed in DEX_PAIR_ADDRESSES, or from every pair of
+  DEX_FACTORY_ADDRESS up to DEX_MAX_PAIRS. These are blocking Web3 calls, so
+  the app reads them on a worker thread once its event loop has started
+  (index.start_background_tasks) and adds the pools on the loop.
+
+Outputs use the constant-product formula in integer base units, the same
+way UniswapV2Library.getAmountOut computes them, hop by hop. For each hop
+the best pool between the two tokens is used.
+
+Adjacency is built when the pools are loaded. The candidate paths for a
+token pair are enumerated once, with up to DEX_MAX_HOPS hops and the
+shortest paths first, and then cached. Reserve updates leave the cache in
+place, so a quote only costs a few big-integer multiplications per
+candidate path.
+
+The native token placeholder address (0xeeee...) is routed as the chain's
+wrapped native token (for example WETH). Pairs with no route return None,
+and callers fall back to 1inch.
+
+Snapshot format:
+
+    {"wrapped_native": {"1": "WETH"},
+     "pools": [{"chain_id": 1, "token0": "WETH", "token1": "USDC",
+                "reserve0": "5263157894736842105263", "reserve1": "20000000000000",
+                "fee_bps": 30, "address": "0x..."}]}
+
+token0 and token1 are registry symbols or addresses, and reserves are in
+base units.
+"""
+import json
+import logging
+import os
+import time
+
+from web3 import Web3
+
+DEX_POOLS_PATH = os.getenv("DEX_POOLS_PATH", "")
+DEX_RPC_URL = os.getenv("DEX_RPC_URL", "")
+DEX_CHAIN_ID = int(os.getenv("DEX_CHAIN_ID", "1"))
+DEX_PAIR_ADDRESSES = os.getenv("DEX_PAIR_ADDRESSES", "")
+DEX_FACTORY_ADDRESS = os.getenv("DEX_FACTORY_ADDRESS", "")
+DEX_MAX_PAIRS = int(os.getenv("DEX_MAX_PAIRS", "500"))
+DEX_FEE_BPS = int(os.getenv("DEX_FEE_BPS", "30"))
+DEX_MAX_HOPS = int(os.getenv("DEX_MAX_HOPS", "3"))
+DEX_MAX_PATHS = int(os.getenv("DEX_MAX_PATHS", "32"))
+# Seconds between reserve refreshes from DEX_RPC_URL, 0 loads them once
+DEX_REFRESH_INTERVAL = float(os.getenv("DEX_REFRESH_INTERVAL", "0"))
+DEX_GAS_BASE = int(os.getenv("DEX_GAS_BASE", "90000"))
+DEX_GAS_PER_HOP = int(os.getenv("DEX_GAS_PER_HOP", "60000"))
+
+NATIVE_TOKEN_ADDRESS = "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee"
+
+PAIR_ABI = [
+    {"name": "token0", "inputs": [], "outputs": [{"type": "address"}], "stateMutability": "view", "type": "function"},
+    {"name": "token1", "inputs": [], "outputs": [{"type": "address"}], "stateMutability": "view", "type": "function"},
+    {"name": "getReserves", "inputs": [], "outputs": [
+        {"type": "uint112"}, {"type": "uint112"}, {"type": "uint32"}], "stateMutability": "view", "type": "function"},
+]
+FACTORY_ABI = [
+    {"name": "allPairsLength", "inputs": [], "outputs": [{"type": "uint256"}], "stateMutability": "view", "type": "function"},
+    {"name": "allPairs", "inputs": [{"type": "uint256"}], "outputs": [{"type": "address"}], "stateMutability": "view", "type": "function"},
+]
+
+
+def get_amount_out(amount_in, reserve_in, reserve_out, fee_bps=DEX_FEE_BPS):
+    """Constant-product output for amount_in, all in integer base units"""
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0
+    amount_in_with_fee = amount_in * (10000 - fee_bps)
+    return amount_in_with_fee * reserve_out // (reserve_in * 10000 + amount_in_with_fee)
+
+
+class Pool:
+    __slots__ = ("address", "chain_id", "token0", "token1", "reserve0", "reserve1", "fee_bps")
+
+    def __init__(self, address, chain_id, token0, token1, reserve0, reserve1, fee_bps=DEX_FEE_BPS):
+        self.address = address.lower()
+        self.chain_id = int(chain_id)
+        self.token0 = token0.lower()
+        self.token1 = token1.lower()
+        self.reserve0 = int(reserve0)
+        self.reserve1 = int(reserve1)
+        self.fee_bps = int(fee_bps)
+
+    def amount_out(self, token_in, amount_in):
+        if token_in == self.token0:
+            return get_amount_out(amount_in, self.reserve0, self.reserve1, self.fee_bps)
+        return get_amount_out(amount_in, self.reserve1, self.reserve0, self.fee_bps)
+
+
+class LocalQuoter:
+    def __init__(self, registry, max_hops=DEX_MAX_HOPS, max_paths=DEX_MAX_PATHS):
+        self.registry = registry
+        self.max_hops = max_hops
+        self.max_paths = max_paths
+        self.pools = {}  # pool address -> Pool
+        self.wrapped_native = {}  # chain id -> wrapped native token address
+        self._edges = {}  # (chain id, token in, token out) -> [Pool]
+        self._adjacency = {}  # (chain id, token) -> set of neighbor tokens
+        self._paths = {}  # (chain id, from, to) -> [[token, ...], ...]
+        self.loaded_at = None
+        self.quotes = 0
+        self.unroutable = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @property
+    def enabled(self):
+        return bool(self.pools)
+
+    def chains(self):
+        return {pool.chain_id for pool in self.pools.values()}
+
+    def _address(self, value, chain_id):
+        """Registry symbol or 0x address to a lower-case address on chain_id"""
+        if value.startswith("0x"):
+            return value.lower()
+        token = self.registry.get(value, chain_id)
+        if token is None or not token.address:
+            raise ValueError(f"Unknown token {value} on chain {chain_id}")
+        return token.address
+
+    def add_pool(self, pool):
+        existing = self.pools.get(pool.address)
+        if existing is not None:
+            existing.reserve0, existing.reserve1 = pool.reserve0, pool.reserve1
+            return
+        self.pools[pool.address] = pool
+        self._edges.setdefault((pool.chain_id, pool.token0, pool.token1), []).append(pool)
+        self._edges.setdefault((pool.chain_id, pool.token1, pool.token0), []).append(pool)
+        self._adjacency.setdefault((pool.chain_id, pool.token0), set()).add(pool.token1)
+        self._adjacency.setdefault((pool.chain_id, pool.token1), set()).add(pool.token0)
+        # New pools can open new routes
+        self._paths.clear()
+
+    def load_snapshot(self, path):
+        with open(path) as f:
+            snapshot = json.load(f)
+        for chain_id, symbol in snapshot.get("wrapped_native", {}).items():
+            self.wrapped_native[int(chain_id)] = self._address(symbol, int(chain_id))
+        for row in snapshot.get("pools", []):
+            chain_id = int(row.get("chain_id", 1))
+            token0 = self._address(row["token0"], chain_id)
+            token1 = self._address(row["token1"], chain_id)
+            self.add_pool(Pool(
+                row.get("address") or f"{token0}-{token1}", chain_id, token0, token1,
+                row["reserve0"], row["reserve1"], row.get("fee_bps", DEX_FEE_BPS),
+            ))
+        self.loaded_at = time.time()
+        logging.info(f"Local DEX: loaded {len(self.pools)} pools from {path}")
+
+    def read_node_pools(self, rpc_url, pair_addresses=(), factory_address=None, chain_id=DEX_CHAIN_ID,
+                        max_pairs=DEX_MAX_PAIRS):
+        """Pools of the given pair contracts and factory read with Web3 (blocking); they aren't added yet"""
+        web3 = Web3(Web3.HTTPProvider(rpc_url))
+        addresses = list(pair_addresses)
+        if factory_address:
+            factory = web3.eth.contract(address=Web3.to_checksum_address(factory_address), abi=FACTORY_ABI)
+            count = min(factory.functions.allPairsLength().call(), max_pairs)
+            addresses += [factory.functions.allPairs(i).call() for i in range(count)]
+        pools = []
+        for address in addresses:
+            pair = web3.eth.contract(address=Web3.to_checksum_address(address), abi=PAIR_ABI)
+            reserve0, reserve1, _ = pair.functions.getReserves().call()
+            pools.append(Pool(
+                address, chain_id, pair.functions.token0().call(), pair.functions.token1().call(), reserve0, reserve1,
+            ))
+        return pools
+
+    def add_node_pools(self, pools, chain_id=DEX_CHAIN_ID):
+        """Add pools from read_node_pools, routing the native token as the chain's WETH"""
+        for pool in pools:
+            self.add_pool(pool)
+        weth = self.registry.get("WETH", chain_id)
+        if weth is not None and chain_id not in self.wrapped_native:
+            self.wrapped_native[chain_id] = weth.address
+        self.loaded_at = time.time()
+        logging.info(f"Local DEX: loaded {len(pools)} pools from the node")
+
+    def read_reserves(self, rpc_url, chain_id=DEX_CHAIN_ID):
+        """{pool address: (reserve0, reserve1)} read from the node for the chain's on-chain pools (blocking)"""
+        web3 = Web3(Web3.HTTPProvider(rpc_url))
+        reserves = {}
+        for pool in list(self.pools.values()):
+            # Snapshot pools without a contract address are keyed "token0-token1"
+            if pool.chain_id != chain_id or "-" in pool.address:
+                continue
+            try:
+                pair = web3.eth.contract(address=Web3.to_checksum_address(pool.address), abi=PAIR_ABI)
+                reserve0, reserve1, _ = pair.functions.getReserves().call()
+                reserves[pool.address] = (reserve0, reserve1)
+            except Exception as e:
+                self.refresh_errors += 1
+                logging.error(f"Local DEX: can't refresh {pool.address}: {str(e)}")
+        return reserves
+
+    def apply_reserves(self, reserves):
+        """Swap in new reserves; the graph and cached routes stay as they are"""
+        for address, (reserve0, reserve1) in reserves.items():
+            pool = self.pools.get(address)
+            if pool is not None:
+                pool.reserve0, pool.reserve1 = int(reserve0), int(reserve1)
+        self.refreshes += 1
+
+    def _routable(self, address, chain_id):
+        address = address.lower()
+        if address == NATIVE_TOKEN_ADDRESS:
+            return self.wrapped_native.get(chain_id, address)
+        return address
+
+    def paths(self, chain_id, from_address, to_address):
+        """Cached token paths from one token to another, fewest hops first"""
+        key = (chain_id, from_address, to_address)
+        paths = self._paths.get(key)
+        if paths is not None:
+            return paths
+
+        paths = []
+        frontier = [[from_address]]
+        for _ in range(self.max_hops):
+            next_frontier = []
+            for path in frontier:
+                for neighbor in self._adjacency.get((chain_id, path[-1]), ()):
+                    if neighbor in path:
+                        continue
+                    if neighbor == to_address:
+                        paths.append(path + [neighbor])
+                    else:
+                        next_frontier.append(path + [neighbor])
+            if len(paths) >= self.max_paths:
+                break
+            frontier = next_frontier
+        paths = paths[:self.max_paths]
+        self._paths[key] = paths
+        return paths
+
+    def best_route(self, chain_id, from_address, to_address, amount_in):
+        """(amount out, token path, pools used) of the best route, or None"""
+        best = None
+        for path in self.paths(chain_id, from_address, to_address):
+            amount = amount_in
+            used = []
+            for token_in, token_out in zip(path, path[1:]):
+                pool = max(self._edges[(chain_id, token_in, token_out)], key=lambda p: p.amount_out(token_in, amount))
+                amount = pool.amount_out(token_in, amount)
+                used.append(pool)
+                if amount <= 0:
+                    break
+            if amount > 0 and (best is None or amount > best[0]):
+                best = (amount, path, used)
+        return best
+
+    def quote(self, from_token_address, to_token_address, amount_in_wei, chain_id=DEX_CHAIN_ID):
+        """1inch-shaped quote from local pools, or None when the pair can't be routed"""
+        from_address = self._routable(from_token_address, chain_id)
+        to_address = self._routable(to_token_address, chain_id)
+        best = None
+        if from_address != to_address:
+            best = self.best_route(chain_id, from_address, to_address, int(amount_in_wei))
+        if best is None:
+            self.unroutable += 1
+            return None
+        amount_out, path, used = best
+        self.quotes += 1
+
+        from_token = self.registry.by_address(from_token_address, chain_id)
+        to_token = self.registry.by_address(to_token_address, chain_id)
+        route = []
+        for address in path:
+            token = self.registry.by_address(address, chain_id)
+            route.append(token.symbol if token else address)
+        # Name the ends as requested, e.g. ETH rather than the WETH it is routed as
+        route[0] = from_token.symbol if from_token else route[0]
+        route[-1] = to_token.symbol if to_token else route[-1]
+        return {
+            "fromToken": {"symbol": from_token.symbol if from_token else None, "address": from_token_address.lower(),
+                          "decimals": from_token.decimals if from_token else None},
+            "toToken": {"symbol": to_token.symbol if to_token else None, "address": to_token_address.lower(),
+                        "decimals": to_token.decimals if to_token else None},
+            "toAmount": str(amount_out),
+            "estimatedGas": DEX_GAS_BASE + DEX_GAS_PER_HOP * len(used),
+            "protocols": [[[{"name": "LOCAL_UNISWAP_V2", "part": 100, "pool": pool.address,
+                             "fromTokenAddress": token_in, "toTokenAddress": token_out}]
+                           for pool, token_in, token_out in zip(used, path, path[1:])]],
+            "route": route,
+            "source": "local",
+        }
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "pools": len(self.pools),
+            "chains": sorted(self.chains()),
+            "cached_routes": len(self._paths),
+            "quotes": self.quotes,
+            "unroutable": self.unroutable,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def node_pair_addresses():
+    return [address.strip() for address in DEX_PAIR_ADDRESSES.split(",") if address.strip()]
+
+
+def load_local_quoter(registry):
+    """LocalQuoter with the DEX_POOLS_PATH snapshot; empty (disabled) when it isn't set.
+
+    Pools from DEX_RPC_URL are not read here, see read_node_pools.
+    """
+    quoter = LocalQuoter(registry)
+    try:
+        if DEX_POOLS_PATH:
+            quoter.load_snapshot(DEX_POOLS_PATH)
+    except Exception as e:
+        logging.error(f"Local DEX: can't load pools, quoting through 1inch only: {str(e)}")
+    return quoter
@@ -0,0 +1,123 @@
+"""Shared HTTP client layer used by every outbound call of the backend.
+
+Keeps a single cached SSL context and one long-lived aiohttp ClientSession
+per event loop, so calls to 1inch, CoinGecko and OpenRouter reuse pooled
+keep-alive connections instead of paying a TCP+TLS handshake every time.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import ssl
+import threading
+from functools import lru_cache
+
+import aiohttp
+import certifi
+
+from metrics import upstream_trace_config
+
+# Connection pool configuration (overridable through environment variables)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", "30"))
+
+# One session per event loop, aiohttp sessions can't be shared across loops
+_sessions = {}
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def get_ssl_context():
+    """Build the certifi-backed SSL context once and reuse it"""
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def get_session():
+    """Return the pooled ClientSession bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            ssl=get_ssl_context(),
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            use_dns_cache=True,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_REQUEST_TIMEOUT),
+            trace_configs=[upstream_trace_config()],
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def close_session():
+    """Close the session bound to the running event loop, if any"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def get_event_loop():
+    """Return the process-wide event loop, starting its thread on first use"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever, name="http-client-loop", daemon=True
+            )
+            _loop_thread.start()
+    return _loop
+
+
+def run_async(coro):
+    """Run a coroutine on the shared event loop and wait for its result.
+
+    Used by the synchronous Flask routes so the pooled session (and its open
+    connections) survives between requests.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+
+def iterate_async(agen):
+    """Drive an async generator from synchronous code on the shared event loop.
+
+    Lets Flask stream responses produced by coroutine-based generators.
+    """
+    try:
+        while True:
+            try:
+                yield run_async(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        run_async(agen.aclose())
+
+
+def shutdown():
+    """Close pooled connections and stop the shared event loop"""
+    global _loop, _loop_thread
+    with _loop_lock:
+        loop, thread = _loop, _loop_thread
+        _loop, _loop_thread = None, None
+    if loop is None or not loop.is_running():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(close_session(), loop).result(timeout=5)
+    except Exception as e:
+        logging.warning(f"Error closing HTTP session: {str(e)}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+atexit.register(shutdown)
@@ -1,17 +1,35 @@
+import asyncio
 import certifi
+import json
+import math
 import os
 import re
+import time
 from dotenv import load_dotenv
 from datetime import datetime
 import logging
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify
 from flask_cors import CORS
 from flask import request
-import asyncio
-import aiohttp
-import ssl
-import nest_asyncio
-nest_asyncio.apply()
+from completion_cache import CompletionCache
+from dex_quoter import DEX_FACTORY_ADDRESS, DEX_REFRESH_INTERVAL, DEX_RPC_URL, load_local_quoter, node_pair_addresses
+from conversation_store import ConversationStore
+from http_client import get_event_loop, get_session, iterate_async, run_async
+from model_router import ModelCallError, ModelRouter, NoModelAvailable
+from metrics import RequestTimer, log_sampled, register_upstream, registry as metrics_registry
+from price_cache import PriceCache
+from price_feed import PriceFeed, format_sse
+from price_history import SOURCE_NAMES, PriceHistory
+from price_providers import PRICE_FETCH_MODE, PRICE_FETCH_MODES, PriceProvider, hedge_delay_for_mode, hedged_fetch
+from price_streamer import PRICE_STREAMER_ENABLED, PriceStreamer
+from replay import ReplayMarket, StubLLM
+from resilience import get_guard, provider_guards, provider_status
+from single_flight import SingleFlight
+from swap_parser import SWAP_PARSER_MIN_CONFIDENCE, detect_token_symbols, parse_swap_intent
+from timing import StageTimer, TimingLog
+from token_registry import ETHEREUM_CHAIN_ID, TokenRegistry
+from tournament import TournamentManager
+from wallet_auth import WALLET_SESSION_HEADER, WalletAuth
 
 app = Flask(__name__)
 
@@ -27,178 +45,138 @@ app = Flask(__name__)
 
 botRunning = False
 
+CORS_ORIGINS = [
+    "http://localhost:3000",
+    "http://localhost:4000",
+    "http://localhost:5000",
+]
+
 CORS(app, resources={r"/*/*": {
-    "origins": [
-        "http://localhost:3000",
-        "http://localhost:4000",
-        "http://localhost:5000",
-    ]}
+    "origins": CORS_ORIGINS}
 })
 
 default_openrouter_ai_model = "google/gemini-2.0-flash-lite-001"
 
+# Shared deadline (seconds) for all upstream calls made by one /get_exchange_quote
+QUOTE_DEADLINE = float(os.getenv("QUOTE_DEADLINE", "5"))
+
+# Upstream API base URLs, overridable to point at local mock servers (see bench/route_benchmark.py)
+ONEINCH_API_URL = os.getenv("ONEINCH_API_URL", "https://api.1inch.dev").rstrip("/")
+COINGECKO_API_URL = os.getenv("COINGECKO_API_URL", "https://api.coingecko.com").rstrip("/")
+register_upstream("1inch", ONEINCH_API_URL)
+register_upstream("coingecko", COINGECKO_API_URL)
+
+# "live" calls 1inch, CoinGecko and OpenRouter; "replay" serves recorded prices,
+# quotes computed from them and a stub LLM, for offline testing (see replay.py)
+UPSTREAM_MODE = os.getenv("UPSTREAM_MODE", "live").lower()
+
+# Prefetch prices for tokens named in the question while the swap extraction runs
+ASK_AI_PIPELINED = os.getenv("ASK_AI_PIPELINED", "true").lower() in ("1", "true", "yes")
+
+# Batch quote limits for /get_exchange_quotes
+MAX_BATCH_QUOTES = int(os.getenv("MAX_BATCH_QUOTES", "100"))
+QUOTE_CONCURRENCY = int(os.getenv("QUOTE_CONCURRENCY", "8"))
+
 # API Price Source Configuration
 # Set to True to use 1inch API, False to use CoinGecko API
 USE_1INCH_API = True
 
-# Token address mapping for 1inch API (Ethereum mainnet addresses)
-TOKEN_ADDRESS_MAPPING = {
-    "ETH": "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee",  # Native ETH
-    "WETH": "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2",
-    "USDC": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48",
-    "USD": "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48",  # Using USDC as USD equivalent
-    "USDT": "0xdac17f958d2ee523a2206206994597c13d831ec7",
-    "DAI": "0x6b175474e89094c44da98b954eedeac495271d0f",
-    "WBTC": "0x2260fac5e5542a773aa44fbcfedf7c193bc2c599",
-    "BTC": "0x2260fac5e5542a773aa44fbcfedf7c193bc2c599",  # Using WBTC for BTC
-    "LINK": "0x514910771af9ca656af840dff83e8264ecf986ca",
-    "UNI": "0x1f9840a85d5af5bf1d1762f925bdaddc4201f984",
-    "AAVE": "0x7fc66500c84a76ad7e9c93437bfc5ac33e2ddae9",
-    "SNX": "0xc011a73ee8576fb46f5e1c5751ca3b9fe0af2a6f",
-    "MKR": "0x9f8f72aa9304c8b593d555f12ef6589cc3a579a2",
-    "COMP": "0xc00e94cb662c3520282e6f5717214004a7f26888",
-    "YFI": "0x0bc529c00c6401aef6d220be8c6ea1667f6ad93e",
-    "SUSHI": "0x6b3595068778dd592e39a122f4f5a5cf09c90fe2",
-    "WISE": "0x66a0f676479cee1d7373f3dc2e2952778bff5bd6",
-    "1INCH": "0x111111111117dc0aa78b770fa6a738034120c302",
-    "CELO": "0x471ece3750da237f93b8e339c536989b8978a438"  # CELO token address
-}
+# Token addresses, decimals, CoinGecko ids and chains, see tokens.json
+token_registry = TokenRegistry.load()
 
-# Token mapping for CoinGecko API IDs (kept for reference only)
-TOKEN_ID_MAPPING = {
-    "ETH": "ethereum",
-    "WETH": "weth",
-    "USDC": "usd-coin",
-    "USD": "usd-coin",
-    "USDT": "tether",
-    "DAI": "dai",
-    "WBTC": "wrapped-bitcoin",
-    "BTC": "bitcoin",
-    "LINK": "chainlink",
-    "UNI": "uniswap",
-    "AAVE": "aave",
-    "SNX": "synthetix-network-token",
-    "MKR": "maker",
-    "COMP": "compound-governance-token",
-    "YFI": "yearn-finance",
-    "SUSHI": "sushi",
-    "WISE": "wise-token",
-    "CELO": "celo"  # CELO token ID for CoinGecko
+# Chains served by the 1inch price, swap and gas price APIs. Tokens on other
+# chains (e.g. CELO on Celo) are priced through CoinGecko only.
+ONEINCH_CHAIN_IDS = {int(chain_id) for chain_id in os.getenv("ONEINCH_CHAIN_IDS", "1,10,56,100,137,250,324,8453,42161,43114,59144").split(",")}
+
+# Native gas token per chain, used to price quote network fees
+CHAIN_NATIVE_SYMBOLS = {
+    1: "ETH", 10: "ETH", 324: "ETH", 8453: "ETH", 42161: "ETH", 59144: "ETH",
+    56: "BNB", 100: "XDAI", 137: "MATIC", 250: "FTM", 43114: "AVAX", 42220: "CELO",
 }
 
+# Swap quotes computed from local Uniswap V2-style pool reserves, see dex_quoter.py.
+# Pools from DEX_RPC_URL are added by start_background_tasks, off the import path.
+local_quoter = load_local_quoter(token_registry)
+
+def oneinch_token(symbol):
+    """Registry token if 1inch can price and quote it, else None"""
+    token = token_registry.get(symbol)
+    if token is None or not token.address or token.chain_id not in ONEINCH_CHAIN_IDS:
+        return None
+    return token
+
 async def get_token_price_from_coingecko(token_symbol):
     """Get token price in USD from CoinGecko API"""
-    token_id = TOKEN_ID_MAPPING.get(token_symbol.upper())
+    token_id = token_registry.coingecko_id(token_symbol)
     if not token_id:
         logging.warning(f"No CoinGecko mapping found for token symbol: {token_symbol}")
         return None
 
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={token_id}&vs_currencies=usd"
+    url = f"{COINGECKO_API_URL}/api/v3/simple/price?ids={token_id}&vs_currencies=usd"
     try:
-        # Create SSL context with certifi certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-
-        # Create connector with the SSL context
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-
-        # Use the connector in the ClientSession
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if token_id in data and 'usd' in data[token_id]:
-                        return data[token_id]['usd']
-                logging.warning(f"CoinGecko: Failed to get price for {token_symbol}: {await response.text()}")
-                return None
+        session = get_session()
+        async with session.get(url) as response:
+            if response.status == 200:
+                data = await response.json()
+                if token_id in data and 'usd' in data[token_id]:
+                    return data[token_id]['usd']
+            logging.warning(f"CoinGecko: Failed to get price for {token_symbol}: {await response.text()}")
+            return None
     except Exception as e:
         logging.error(f"CoinGecko: Error fetching price for {token_symbol}: {str(e)}")
         return None
 
 async def get_token_price_from_1inch(token_symbol):
     """Get token price in USD from 1inch API"""
-    token_address = TOKEN_ADDRESS_MAPPING.get(token_symbol.upper())
-    if not token_address:
+    token = oneinch_token(token_symbol)
+    if token is None:
         logging.warning(f"No 1inch address mapping found for token symbol: {token_symbol}")
         return None
+    token_address = token.address
 
-    # 1inch API for Ethereum mainnet (chain ID 1)
-    url = "https://api.1inch.dev/price/v1.1/1"
+    # 1inch price API on the token's chain
+    url = f"{ONEINCH_API_URL}/price/v1.1/{token.chain_id}"
 
     # Using the get_prices_for_addresses approach for a single token
     specific_url = f"{url}/{token_address}"
 
     try:
-        # Create SSL context with certifi certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-
-        # Create connector with the SSL context
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
+        session = get_session()
+        # Get your API key from environment variables for better security
+        api_key = os.getenv("ONEINCH_API_KEY", "jnSBv4cJLnFd4BtiSrxosxaFdasKTMV8")
+
+        async with session.get(specific_url, headers={'Authorization': f'Bearer {api_key}'}) as response:
+            if response.status == 200:
+                data = await response.json()
+                # 1inch API returns price directly for the token address
+                if token_address in data:
+                    return float(data[token_address])
+                else:
+                    logging.warning(f"1inch: Token address {token_address} not found in response: {data}")
+                    return None
+            else:
+                logging.warning(f"1inch: Failed to get price for {token_symbol}: {await response.text()}")
 
-        # Use the connector in the ClientSession
-        async with aiohttp.ClientSession(connector=connector) as session:
-            # Get your API key from environment variables for better security
-            api_key = os.getenv("ONEINCH_API_KEY", "jnSBv4cJLnFd4BtiSrxosxaFdasKTMV8")
+        # Fallback to the POST method if GET fails
+        payload = {
+            "tokens": [token_address]
+        }
 
-            async with session.get(specific_url, headers={'Authorization': f'Bearer {api_key}'}) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    # 1inch API returns price directly for the token address
-                    if token_address in data:
-                        return float(data[token_address])
-                    else:
-                        logging.warning(f"1inch: Token address {token_address} not found in response: {data}")
-                        return None
-                else:
-                    logging.warning(f"1inch: Failed to get price for {token_symbol}: {await response.text()}")
-
-                    # Fallback to the POST method if GET fails
-                    payload = {
-                        "tokens": [token_address]
-                    }
-
-                    async with session.post(url, headers={'Authorization': f'Bearer {api_key}'}, json=payload) as post_response:
-                        if post_response.status == 200:
-                            data = await post_response.json()
-                            if token_address in data:
-                                return float(data[token_address])
-                        logging.warning(f"1inch: Fallback request failed for {token_symbol}: {await post_response.text()}")
-                        return None
+        async with session.post(url, headers={'Authorization': f'Bearer {api_key}'}, json=payload) as post_response:
+            if post_response.status == 200:
+                data = await post_response.json()
+                if token_address in data:
+                    return float(data[token_address])
+            logging.warning(f"1inch: Fallback request failed for {token_symbol}: {await post_response.text()}")
+            return None
     except Exception as e:
         logging.error(f"1inch: Error fetching price for {token_symbol}: {str(e)}")
         return None
 
-async def get_token_price(token_symbol):
+async def fetch_token_price(token_symbol):
     """Get token price in USD from the configured API source (1inch or CoinGecko)"""
-    # Special handling for CELO to use CoinGecko API directly
-    if token_symbol.upper() == "CELO":
-        logging.info(f"Using CoinGecko API for CELO token")
-        price = await get_token_price_from_coingecko(token_symbol)
-        if price is not None:
-            return price
-        
-        # If no price is found for CELO, return mocked value
-        logging.warning(f"No price found for CELO from CoinGecko. Using mocked price: 0.3026")
-        return 0.3026
-    
-    # Normal flow for other tokens
-    if USE_1INCH_API:
-        price = await get_token_price_from_1inch(token_symbol)
-        if price is not None:
-            return price
-        # Fallback to CoinGecko if 1inch fails and we have a mapping
-        if token_symbol.upper() in TOKEN_ID_MAPPING:
-            logging.info(f"Falling back to CoinGecko for {token_symbol} after 1inch failure")
-            return await get_token_price_from_coingecko(token_symbol)
-        return None
-    else:
-        price = await get_token_price_from_coingecko(token_symbol)
-        if price is not None:
-            return price
-        # Fallback to 1inch if CoinGecko fails and we have a mapping
-        if token_symbol.upper() in TOKEN_ADDRESS_MAPPING:
-            logging.info(f"Falling back to 1inch for {token_symbol} after CoinGecko failure")
-            return await get_token_price_from_1inch(token_symbol)
-        return None
+    prices = await fetch_prices_from_providers([token_symbol.upper()])
+    return prices.get(token_symbol.upper())
 
 async def get_multiple_token_prices_from_coingecko(token_symbols):
     """Get prices for multiple tokens at once using CoinGecko API"""
@@ -207,10 +185,13 @@ async def get_multiple_token_prices_from_coingecko(token_symbols):
     symbol_to_id_map = {}
 
     for symbol in token_symbols:
-        token_id = TOKEN_ID_MAPPING.get(symbol.upper())
+        token_id = token_registry.coingecko_id(symbol)
         if token_id:
-            token_ids.append(token_id)
-            symbol_to_id_map[token_id] = symbol.upper()
+            # Several symbols can share one id (e.g. USD and USDC)
+            if token_id not in symbol_to_id_map:
+                token_ids.append(token_id)
+                symbol_to_id_map[token_id] = []
+            symbol_to_id_map[token_id].append(symbol.upper())
         else:
             logging.warning(f"CoinGecko: No mapping found for token symbol: {symbol}")
 
@@ -218,167 +199,234 @@ async def get_multiple_token_prices_from_coingecko(token_symbols):
         return {}
 
     # CoinGecko API allows fetching multiple tokens in one request
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={','.join(token_ids)}&vs_currencies=usd"
+    url = f"{COINGECKO_API_URL}/api/v3/simple/price?ids={','.join(token_ids)}&vs_currencies=usd"
 
     try:
-        # Create SSL context with certifi certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    # Map the CoinGecko IDs back to symbols
-                    return {symbol_to_id_map[token_id]: data[token_id]['usd'] for token_id in data if token_id in symbol_to_id_map and 'usd' in data[token_id]}
-                else:
-                    logging.warning(f"CoinGecko: Failed to get prices: {await response.text()}")
-                    return {}
+        session = get_session()
+        async with session.get(url) as response:
+            if response.status == 200:
+                data = await response.json()
+                # Map the CoinGecko IDs back to symbols
+                return {symbol: data[token_id]['usd'] for token_id in data if token_id in symbol_to_id_map and 'usd' in data[token_id] for symbol in symbol_to_id_map[token_id]}
+            else:
+                logging.warning(f"CoinGecko: Failed to get prices: {await response.text()}")
+                return {}
     except Exception as e:
         logging.error(f"CoinGecko: Error fetching prices: {str(e)}")
         return {}
 
 async def get_multiple_token_prices_from_1inch(token_symbols):
-    """Get prices for multiple tokens at once using 1inch API"""
+    """Get prices for multiple tokens using 1inch API, one concurrent batch per chain"""
+    symbols_by_chain = {}
+    for symbol in token_symbols:
+        token = oneinch_token(symbol)
+        if token is None:
+            logging.warning(f"1inch: No address mapping found for token symbol: {symbol}")
+            continue
+        symbols_by_chain.setdefault(token.chain_id, []).append(token.symbol)
+
+    if not symbols_by_chain:
+        return {}
+
+    prices = {}
+    for chain_prices in await asyncio.gather(*(
+        get_chain_token_prices_from_1inch(chain_id, symbols) for chain_id, symbols in symbols_by_chain.items()
+    )):
+        prices.update(chain_prices)
+    return prices
+
+async def get_chain_token_prices_from_1inch(chain_id, token_symbols):
+    """Get prices for multiple tokens on one chain in a single 1inch request"""
     # Convert token symbols to addresses
     token_addresses = []
     symbol_to_address_map = {}
 
     for symbol in token_symbols:
-        address = TOKEN_ADDRESS_MAPPING.get(symbol.upper())
+        address = token_registry.address(symbol, chain_id)
         if address:
-            token_addresses.append(address)
-            symbol_to_address_map[address] = symbol.upper()
+            # Several symbols can share one address (e.g. BTC and WBTC)
+            if address not in symbol_to_address_map:
+                token_addresses.append(address)
+                symbol_to_address_map[address] = []
+            symbol_to_address_map[address].append(symbol.upper())
         else:
             logging.warning(f"1inch: No address mapping found for token symbol: {symbol}")
 
     if not token_addresses:
         return {}
 
-    # 1inch API for Ethereum mainnet (chain ID 1)
-    url = "https://api.1inch.dev/price/v1.1/1"
+    url = f"{ONEINCH_API_URL}/price/v1.1/{chain_id}"
 
     try:
-        # Create SSL context with certifi certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-
-        async with aiohttp.ClientSession(connector=connector) as session:
-            api_key = os.getenv("ONEINCH_API_KEY", "jnSBv4cJLnFd4BtiSrxosxaFdasKTMV8")
-
-            if len(token_addresses) == 1:
-                # For a single token, use the GET endpoint
-                specific_url = f"{url}/{token_addresses[0]}"
-                async with session.get(specific_url, headers={'Authorization': f'Bearer {api_key}'}) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return {symbol_to_address_map[addr]: float(price) for addr, price in data.items() if addr in symbol_to_address_map}
-            else:
-                # For multiple tokens, use the POST endpoint
-                payload = {
-                    "tokens": token_addresses
-                }
-
-                async with session.post(url, headers={'Authorization': f'Bearer {api_key}'}, json=payload) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Convert addresses back to symbols in the result
-                        return {symbol_to_address_map[addr]: float(price) for addr, price in data.items() if addr in symbol_to_address_map}
-                    else:
-                        logging.warning(f"1inch: Failed to get prices: {await response.text()}")
-
-            # If we get here, both methods failed or returned no data
-            return {}
+        session = get_session()
+        api_key = os.getenv("ONEINCH_API_KEY", "jnSBv4cJLnFd4BtiSrxosxaFdasKTMV8")
+
+        if len(token_addresses) == 1:
+            # For a single token, use the GET endpoint
+            specific_url = f"{url}/{token_addresses[0]}"
+            async with session.get(specific_url, headers={'Authorization': f'Bearer {api_key}'}) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return {symbol: float(price) for addr, price in data.items() if addr in symbol_to_address_map for symbol in symbol_to_address_map[addr]}
+        else:
+            # For multiple tokens, use the POST endpoint
+            payload = {
+                "tokens": token_addresses
+            }
+
+            async with session.post(url, headers={'Authorization': f'Bearer {api_key}'}, json=payload) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    # Convert addresses back to symbols in the result
+                    return {symbol: float(price) for addr, price in data.items() if addr in symbol_to_address_map for symbol in symbol_to_address_map[addr]}
+                else:
+                    logging.warning(f"1inch: Failed to get prices on chain {chain_id}: {await response.text()}")
+
+        # If we get here, both methods failed or returned no data
+        return {}
     except Exception as e:
-        logging.error(f"1inch: Error fetching prices: {str(e)}")
+        logging.error(f"1inch: Error fetching prices on chain {chain_id}: {str(e)}")
         return {}
 
-async def get_multiple_token_prices(token_symbols):
+# Every price answered by a provider is appended here when PRICE_HISTORY_DIR is set
+price_history = PriceHistory()
+
+# Offline backends, only set up with UPSTREAM_MODE=replay
+replay_market = ReplayMarket(token_registry, history=price_history) if UPSTREAM_MODE == "replay" else None
+stub_llm = StubLLM(token_registry.symbol_set) if UPSTREAM_MODE == "replay" else None
+
+# Upstream price providers, each bounded by its own timeout
+oneinch_provider = PriceProvider(
+    "1inch",
+    get_multiple_token_prices_from_1inch,
+    lambda symbol: oneinch_token(symbol) is not None,
+    float(os.getenv("ONEINCH_TIMEOUT", "3")),
+    fetch_one=get_token_price_from_1inch,
+    guard=get_guard("1inch"),
+    on_prices=price_history.record,
+)
+coingecko_provider = PriceProvider(
+    "CoinGecko",
+    get_multiple_token_prices_from_coingecko,
+    lambda symbol: token_registry.coingecko_id(symbol) is not None,
+    float(os.getenv("COINGECKO_TIMEOUT", "3")),
+    fetch_one=get_token_price_from_coingecko,
+    guard=get_guard("CoinGecko"),
+    on_prices=price_history.record,
+)
+replay_provider = PriceProvider(
+    "replay",
+    replay_market.get_prices,
+    replay_market.supports,
+    float(os.getenv("REPLAY_TIMEOUT", "3")),
+    fetch_one=replay_market.get_price,
+) if replay_market is not None else None
+
+def price_source_name():
+    if replay_provider is not None:
+        return "replay"
+    return "1inch" if USE_1INCH_API else "CoinGecko"
+
+# Identical concurrent upstream calls (same endpoint and params) share one request
+upstream_flights = SingleFlight()
+
+async def fetch_prices_from_providers(symbols):
+    """Fetch prices upstream, sharing identical concurrent batch requests"""
+    key = ("prices", price_source_name(), PRICE_FETCH_MODE, tuple(sorted(set(symbols))))
+    return dict(await upstream_flights.do(key, lambda: fetch_prices_from_providers_uncoalesced(symbols)))
+
+async def fetch_prices_from_providers_uncoalesced(symbols):
+    """Fetch prices from the configured source, using the other one per PRICE_FETCH_MODE.
+
+    "fallback" asks the secondary only for what the primary missed, "race"
+    queries both at once and "hedge" starts the secondary once the primary
+    is slower than its usual latency. The first answer per symbol wins.
+    """
+    if replay_provider is not None:
+        return await replay_provider.fetch([symbol for symbol in symbols if replay_provider.supports(symbol)])
+
+    if USE_1INCH_API:
+        primary, secondary = oneinch_provider, coingecko_provider
+    else:
+        primary, secondary = coingecko_provider, oneinch_provider
+
+    supported = [symbol for symbol in symbols if primary.supports(symbol) or secondary.supports(symbol)]
+    for symbol in symbols:
+        if symbol not in supported:
+            logging.warning(f"No price mapping found for token symbol: {symbol}")
+    if not supported:
+        return {}
+
+    return await hedged_fetch(supported, primary, secondary, hedge_delay_for_mode(PRICE_FETCH_MODE, primary))
+
+async def fetch_multiple_token_prices(token_symbols):
     """Get prices for multiple tokens using the configured API source (1inch or CoinGecko)"""
-    # Split CELO and other tokens
-    celo_tokens = [symbol for symbol in token_symbols if symbol.upper() == "CELO"]
-    other_tokens = [symbol for symbol in token_symbols if symbol.upper() != "CELO"]
-    
-    # Initialize prices dictionary
-    prices = {}
-    
-    # Handle CELO tokens separately using CoinGecko
-    if celo_tokens:
-        logging.info(f"Using CoinGecko API for CELO token")
-        celo_prices = await get_multiple_token_prices_from_coingecko(celo_tokens)
-        
-        # Check if CELO price was successfully retrieved
-        if "CELO" not in celo_prices:
-            # If no price is found for CELO, add mocked value
-            logging.warning(f"No price found for CELO from CoinGecko in bulk request. Using mocked price: 0.3026")
-            celo_prices["CELO"] = 0.3026
-            
-        prices.update(celo_prices)
-    
-    # Process other tokens with the normal flow
-    if other_tokens:
-        if USE_1INCH_API:
-            inch_prices = await get_multiple_token_prices_from_1inch(other_tokens)
-            prices.update(inch_prices)
-
-            # If some tokens don't have prices from 1inch, try to get them from CoinGecko
-            missing_tokens = [symbol for symbol in other_tokens if symbol.upper() not in prices]
-            if missing_tokens:
-                # Only try CoinGecko for tokens that have a CoinGecko mapping
-                coingecko_tokens = [t for t in missing_tokens if t.upper() in TOKEN_ID_MAPPING]
-                if coingecko_tokens:
-                    logging.info(f"Falling back to CoinGecko for {len(coingecko_tokens)} tokens after 1inch failure")
-                    cg_prices = await get_multiple_token_prices_from_coingecko(coingecko_tokens)
-                    # Merge the prices
-                    prices.update(cg_prices)
-        else:
-            cg_prices = await get_multiple_token_prices_from_coingecko(other_tokens)
-            prices.update(cg_prices)
-
-            # If some tokens don't have prices from CoinGecko, try to get them from 1inch
-            missing_tokens = [symbol for symbol in other_tokens if symbol.upper() not in prices]
-            if missing_tokens:
-                # Only try 1inch for tokens that have a 1inch mapping
-                inch_tokens = [t for t in missing_tokens if t.upper() in TOKEN_ADDRESS_MAPPING]
-                if inch_tokens:
-                    logging.info(f"Falling back to 1inch for {len(inch_tokens)} tokens after CoinGecko failure")
-                    inch_prices = await get_multiple_token_prices_from_1inch(inch_tokens)
-                    # Merge the prices
-                    prices.update(inch_prices)
+    return await fetch_prices_from_providers([symbol.upper() for symbol in token_symbols])
 
-    return prices
+async def fetch_all_token_prices():
+    """Fetch every mapped token with one batched call per chain, falling back to one call to the other API"""
+    if replay_provider is not None:
+        symbols = [symbol for symbol in token_registry.symbols() if replay_provider.supports(symbol)]
+        return await replay_provider.fetch(symbols), replay_provider.name
+
+    # Tokens on chains 1inch doesn't serve (CELO) are priced through CoinGecko
+    inch_symbols = [symbol for symbol in token_registry.symbols() if oneinch_token(symbol) is not None]
+    coingecko_symbols = token_registry.coingecko_symbols()
+
+    if USE_1INCH_API:
+        primary, primary_symbols = oneinch_provider, inch_symbols
+        secondary, secondary_symbols = coingecko_provider, coingecko_symbols
+    else:
+        primary, primary_symbols = coingecko_provider, coingecko_symbols
+        secondary, secondary_symbols = oneinch_provider, inch_symbols
+
+    # Skip a provider whose circuit is open rather than waiting for it to fail
+    if not primary.available() and secondary.available():
+        primary, primary_symbols, secondary, secondary_symbols = secondary, secondary_symbols, primary, primary_symbols
+
+    prices = await primary.fetch(primary_symbols)
+    missing = [symbol for symbol in secondary_symbols if symbol not in prices]
+    if missing:
+        prices.update(await secondary.fetch(missing))
+
+    return prices, primary.name
+
+# Shared cache in front of the upstream price APIs, keyed by upper-case symbol
+price_cache = PriceCache()
+
+# Optional background refresher serving all mapped tokens from memory
+price_streamer = PriceStreamer(fetch_all_token_prices)
+
+async def get_token_price(token_symbol):
+    """Get token price in USD, served from the price snapshot or cache when available"""
+    symbol = token_symbol.upper()
+    snapshot_prices = price_streamer.lookup([symbol])
+    if snapshot_prices is not None:
+        return snapshot_prices[symbol]
+    return await price_cache.get(symbol, lambda: fetch_token_price(token_symbol))
+
+async def get_multiple_token_prices(token_symbols):
+    """Get prices for multiple tokens, fetching only cache misses upstream in one batch"""
+    symbols = [symbol.upper() for symbol in token_symbols]
+    snapshot_prices = price_streamer.lookup(symbols)
+    if snapshot_prices is not None:
+        return snapshot_prices
+    return await price_cache.get_many(symbols, fetch_multiple_token_prices)
 
 async def calculate_token_rate(from_token, to_token, from_amount=1.0):
     """Calculate the exchange rate between two tokens"""
-    # Special handling for CELO-USD rate if involved
-    if from_token.upper() == "CELO" or to_token.upper() == "CELO":
-        # Use our mocked CELO price directly for consistent results
-        celo_price = 0.3026  # Our mocked CELO price in USD
-        
-        # If calculating CELO to USD
-        if from_token.upper() == "CELO" and to_token.upper() in ["USD", "USDC", "USDT"]:
-            logging.info(f"Using fixed rate for CELO to USD conversion: {celo_price}")
-            # For CELO to USD, the amount of USD is simply CELO amount * CELO price in USD
-            return celo_price * float(from_amount)
-            
-        # If calculating USD to CELO
-        elif to_token.upper() == "CELO" and from_token.upper() in ["USD", "USDC", "USDT"]:
-            logging.info(f"Using fixed rate for USD to CELO conversion: {1/celo_price}")
-            # For USD to CELO, the amount of CELO is simply USD amount / CELO price in USD
-            return float(from_amount) / celo_price
-    
-    # Normal flow for other tokens
     # Get prices for both tokens at once for efficiency
     prices = await get_multiple_token_prices([from_token, to_token])
 
     from_price = prices.get(from_token.upper())
     to_price = prices.get(to_token.upper())
 
-    # Fallback to individual queries if bulk request failed
-    if from_price is None:
-        from_price = await get_token_price(from_token)
-    if to_price is None:
-        to_price = await get_token_price(to_token)
+    # Fallback to individual queries if bulk request failed, both at once
+    if from_price is None or to_price is None:
+        from_price, to_price = await asyncio.gather(
+            get_token_price(from_token) if from_price is None else asyncio.sleep(0, from_price),
+            get_token_price(to_token) if to_price is None else asyncio.sleep(0, to_price),
+        )
 
     if from_price is None or to_price is None:
         return None
@@ -387,41 +435,166 @@ async def calculate_token_rate(from_token, to_token, from_amount=1.0):
     rate = (from_price / to_price) * float(from_amount)
     return rate
 
+# Picks the LLM per prompt type from latency and error rate, see model_router.py
+model_router = ModelRouter.from_env(default_openrouter_ai_model)
+
+# Cache for deterministic LLM prompts (swap extraction), see COMPLETION_CACHE_POLICY
+completion_cache = CompletionCache()
+
+# "TokenA: X, TokenB: Y, AmountA: a, AmountB: b" replies to the swap extraction prompt
+SWAP_EXTRACTION_RE = re.compile(
+    r"TokenA:\s*(?:\"([^\"]*)\"|'([^']*)'|([\w-]*)|())\s*,\s*"
+    r"TokenB:\s*(?:\"([^\"]*)\"|'([^']*)'|([\w-]*)|())\s*,\s*"
+    r"(?:AmountA:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
+    r"(?:AmountB:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
+    r"|(?:AmountB:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
+    r"(?:AmountA:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
+)
+
+def parse_swap_extraction_reply(response):
+    """Turn the LLM's swap extraction reply into a swap_info dict"""
+    match = SWAP_EXTRACTION_RE.search(response)
+
+    if match:
+        tokenA = (match.group(1) or match.group(2) or match.group(3) or '').upper()
+        tokenB = (match.group(5) or match.group(6) or match.group(7) or '').upper()
+        amountA = (match.group(9) or match.group(12) or '').rstrip(',')
+        amountB = (match.group(10) or match.group(11) or '').rstrip(',')
+
+        return { "inputToken": tokenA, "inputAmount": amountA, "outputToken": tokenB, "outputAmount": amountB }
+
+    return {
+        "inputToken": "",
+        "inputAmount": "",
+        "outputToken": "",
+        "outputAmount": "",
+    }
+
+# Multi-turn chat history per wallet address, see conversation_store.py
+conversation_store = ConversationStore()
+
+WALLET_ADDRESS_RE = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+# Signed-nonce sign in that guards the per-wallet history, see wallet_auth.py
+wallet_auth = WalletAuth()
+
+def is_llm_error(reply):
+    """ask_openrouter returns upstream errors as text; they shouldn't become chat history"""
+    return reply.startswith("OpenRouter API error")
+
 class CryptoTradingAssistant:
     def __init__(self):
         self.OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
         self.OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL")
         self.BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+        # How often swap extraction was answered locally vs. by the LLM
+        self.local_swap_extractions = 0
+        self.llm_swap_extractions = 0
+        # Recent per-stage latencies of process_question
+        self.timings = TimingLog()
+        self._background_tasks = set()
 
     async def process_question(self, question, user_id, model):
-        history = ""
-        context = ""
-        swap_info = await self.recognize_swap_request_with_ai(question, model)
+        history, context = await conversation_store.prompt_context(user_id)
+        timer = StageTimer()
+        swap_info = await self.get_swap_info(question, model, timer)
+        prompt = self.build_answer_prompt(question, swap_info, history, context)
+
+        response = ""
+        with timer.stage("answer"):
+            response = await self.ask_openrouter(prompt, model)
+        self.timings.add(timer.finish())
+
+        if not is_llm_error(response):
+            await conversation_store.add_turn(user_id, question, response)
+        return response
+
+    async def process_question_stream(self, question, user_id, model):
+        """Like process_question, but yields (event, data) pairs as the answer is generated.
+
+        Emits "swap_info" once the swap details are known, then "delta" chunks
+        of the answer and finally "done" with the full response.
+        """
+        history, context = await conversation_store.prompt_context(user_id)
+        timer = StageTimer()
+        swap_info = await self.get_swap_info(question, model, timer)
+        yield "swap_info", swap_info
+
+        prompt = self.build_answer_prompt(question, swap_info, history, context)
+        parts = []
+        answer_started = time.perf_counter()
+        async for chunk in self.ask_openrouter_stream(prompt, model):
+            if not parts:
+                timer.record("first_token", time.perf_counter() - answer_started)
+            parts.append(chunk)
+            yield "delta", {"content": chunk}
+        timer.record("answer", time.perf_counter() - answer_started)
+        self.timings.add(timer.finish())
+
+        response = "".join(parts)
+        if not is_llm_error(response):
+            await conversation_store.add_turn(user_id, question, response)
+        yield "done", {"response": response}
+
+    async def get_swap_info(self, question, model, timer=None):
+        """Extract the swap request and fill in the expected output amount when possible.
+
+        In pipelined mode, prices for any token symbols found in the raw
+        question are prefetched while the extraction runs, so the rate
+        calculation afterwards joins the in-flight fetch or hits the cache.
+        """
+        timer = timer or StageTimer()
+        if ASK_AI_PIPELINED:
+            self.prefetch_prices(question, timer)
+
+        with timer.stage("extraction"):
+            swap_info = await self.recognize_swap_request(question, model)
 
         # If we have input token, input amount, and output token but no output amount,
         # try to calculate the expected output amount
-        print(swap_info)
-        print("nextot ifff")
         if (swap_info["inputToken"] and
             swap_info["inputAmount"] and
             swap_info["outputToken"] and
             not swap_info["outputAmount"]):
             try:
                 # Calculate expected output amount
-                print("making rate")
-                rate = await calculate_token_rate(
-                    swap_info["inputToken"],
-                    swap_info["outputToken"],
-                    float(swap_info["inputAmount"])
-                )
+                with timer.stage("rate"):
+                    rate = await calculate_token_rate(
+                        swap_info["inputToken"],
+                        swap_info["outputToken"],
+                        float(swap_info["inputAmount"])
+                    )
                 if rate:
                     swap_info["outputAmount"] = f"{rate:.6f}"
                     swap_info["rate"] = f"1 {swap_info['inputToken']} ≈ {rate/float(swap_info['inputAmount']):.6f} {swap_info['outputToken']}"
             except Exception as e:
                 logging.error(f"Error calculating rate: {e}")
 
-        print(swap_info)
-        prompt = (
+        log_sampled("swap_info", question=question, swap_info=swap_info)
+        return swap_info
+
+    def prefetch_prices(self, question, timer):
+        """Start warming the price cache for tokens mentioned in the question"""
+        symbols = detect_token_symbols(question, token_registry.symbol_set)
+        if not symbols:
+            return None
+
+        started = time.perf_counter()
+        task = asyncio.ensure_future(get_multiple_token_prices(symbols))
+
+        def done(task):
+            if not task.cancelled() and task.exception() is not None:
+                logging.error(f"Price prefetch failed: {task.exception()}")
+            timer.record("prefetch", time.perf_counter() - started)
+            self._background_tasks.discard(task)
+
+        # Keep a reference so the task isn't collected while still running
+        self._background_tasks.add(task)
+        task.add_done_callback(done)
+        return task
+
+    def build_answer_prompt(self, question, swap_info, history, context):
+        return (
             f"History: {history}\n\n"
             f"Context: {context}\n\n"
             f"SWAP_INFO: {swap_info}\n\n"
@@ -436,67 +609,169 @@ class CryptoTradingAssistant:
             "- If SWAP_INFO contains a 'rate' field, include this information in your response to show the user the current exchange rate.\n"
         )
 
-        response = ""
-        response = await self.ask_openrouter(prompt, model)
-
-        data = []
-        interaction = {
-            "user": user_id,
-            "interactions": [
-                {
-                    "question": question,
-                    "response": response,
-                }
-            ],
-        }
-        data.append(interaction)
-        return response
+    def build_messages(self, prompt):
+        return [
+            {"role": "system", "content": "You are a crypto trading assistant for a EthereumFighter game where AI is pinned against each other to see who is a better trader. Use the provided history to maintain conversation context."},
+            {"role": "user", "content": prompt}
+        ]
+
+    async def ask_openrouter(self, prompt, model, prompt_type="answer"):
+        """Completion from the model the router picks for prompt_type, preferring `model` when given"""
+        try:
+            return await self.routed_complete(prompt, model, prompt_type)
+        except NoModelAvailable as e:
+            logging.error(f"OpenRouter: no model answered the {prompt_type} prompt: {str(e)}")
+            return str(e) if str(e).startswith("OpenRouter API error") else f"OpenRouter API error: {str(e)}"
+
+    async def routed_complete(self, prompt, model, prompt_type):
+        """Cached completion if any model of the route has one, otherwise one routed to a model.
+
+        The cache is checked before routing, so hits don't count as model calls
+        in the router's health stats. Raises NoModelAvailable.
+        """
+        if stub_llm is None:
+            messages = self.build_messages(prompt)
+            cached = await completion_cache.get_any(model_router.models(prompt_type, model), messages, prompt_type)
+            if cached is not None:
+                return cached
+        return await model_router.call(prompt_type, lambda candidate: self.complete(prompt, candidate, prompt_type), model)
+
+    async def complete(self, prompt, model, prompt_type="answer"):
+        """One completion from one model, stored in the completion cache; raises ModelCallError on an error response"""
+        if stub_llm is not None:
+            return await stub_llm.complete(prompt, model, prompt_type)
 
-    async def ask_openrouter(self, prompt, model):
-        # Create SSL context with certifi certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
         headers = {"Authorization": f"Bearer {self.OPENROUTER_API_KEY}"}
+        messages = self.build_messages(prompt)
         data = {
             "model": model,
-            "messages": [
-                {"role": "system", "content": "You are a crypto trading assistant for a EthereumFighter game where AI is pinned against each other to see who is a better trader. Use the provided history to maintain conversation context."},
-                {"role": "user", "content": prompt}
-            ]
+            "messages": messages
         }
-        # Create connector with the SSL context
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-
-        # Use the connector in the ClientSession
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.post(self.OPENROUTER_API_URL, json=data, headers=headers) as response:
-                if response.status == 200:
-                    res = await response.json()
-                    print(res)
-                    reply = (res).get("choices", [{}])[0].get("message", {}).get("content", "No response received.")
-                    logging.info(f"Received response: {reply}")
-                    return reply
-                else:
-                    error_message = f"OpenRouter API error {response.status}: {await response.text()}"
-                    logging.error(error_message)
-                    return error_message
-
-    async def ask_ai(self, question: str, input_model: str = ""):
-        try:
-            #@TODO: use wallet address to identify user (pass to function)
-            user_id = "endpoint: "+ str(datetime.now())
-            # session_id = f"{user_id}"
-            response = ""
-            print(f"Question: {question}")
-            if input_model == "ask_nilai":
-                response = await self.process_question(question, user_id, default_openrouter_ai_model)
+        session = get_session()
+        async with session.post(self.OPENROUTER_API_URL, json=data, headers=headers) as response:
+            if response.status == 200:
+                res = await response.json()
+                log_sampled("openrouter_completion", model=model, prompt_type=prompt_type, usage=res.get("usage"))
+                choice = (res).get("choices", [{}])[0].get("message", {})
+                reply = choice.get("content", "No response received.")
+                logging.info(f"Received response: {reply}")
+                # Only real completions are cached, never errors or placeholders
+                if "content" in choice:
+                    await completion_cache.put(model, messages, prompt_type, reply)
+                return reply
             else:
-                response = await self.process_question(question, user_id, default_openrouter_ai_model)
+                raise ModelCallError(f"OpenRouter API error {response.status}: {await response.text()}")
+
+    async def ask_openrouter_stream(self, prompt, model):
+        """Yield answer text chunks, failing over to the next model until the first chunk arrives"""
+        deadline = model_router.deadline("answer")
+        attempt = 0
+        last_error = None
+        for candidate in model_router.candidates("answer", model):
+            if not model_router.begin("answer", candidate, attempt):
+                continue
+            attempt += 1
+            started = time.perf_counter()
+            stream = self.stream_completion(prompt, candidate)
+            try:
+                first_chunk = await asyncio.wait_for(stream.__anext__(), deadline)
+            except StopAsyncIteration:
+                first_chunk = None
+            except asyncio.TimeoutError:
+                last_error = f"{candidate} sent nothing within {deadline:g}s"
+                model_router.record_failure("answer", candidate, "timeout")
+                await stream.aclose()
+                continue
+            except asyncio.CancelledError:
+                model_router.cancel(candidate)
+                await stream.aclose()
+                raise
+            except Exception as e:
+                last_error = str(e)
+                model_router.record_failure("answer", candidate, "error", e)
+                await stream.aclose()
+                continue
+
+            # Once text has been sent the answer can't switch models any more
+            model_router.record_success(candidate, time.perf_counter() - started)
+            if first_chunk is not None:
+                yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+            return
+
+        error_message = last_error if last_error and last_error.startswith("OpenRouter API error") else f"OpenRouter API error: {last_error or 'no model available'}"
+        logging.error(error_message)
+        yield error_message
+
+    async def stream_completion(self, prompt, model):
+        """Yield answer text chunks as OpenRouter streams them (stream=true); raises ModelCallError on an error response"""
+        if stub_llm is not None:
+            async for chunk in stub_llm.stream(prompt, model):
+                yield chunk
+            return
 
-            return response
+        headers = {"Authorization": f"Bearer {self.OPENROUTER_API_KEY}"}
+        data = {
+            "model": model,
+            "messages": self.build_messages(prompt),
+            "stream": True
+        }
+        session = get_session()
+        async with session.post(self.OPENROUTER_API_URL, json=data, headers=headers) as response:
+            if response.status != 200:
+                raise ModelCallError(f"OpenRouter API error {response.status}: {await response.text()}")
+
+            # Server-sent events: "data: {json}" lines, ": ..." keep-alive comments
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    return
+                try:
+                    chunk = json.loads(payload)
+                except ValueError:
+                    logging.warning(f"OpenRouter: can't parse stream chunk: {payload}")
+                    continue
+                content = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+    async def ask_ai(self, question: str, input_model: str = "", wallet_address: str = None):
+        try:
+            # Conversations are keyed by wallet; without one every question stands alone
+            user_id = wallet_address
+            # No model (or the legacy "ask_nilai" alias) lets the router pick the answer model
+            model = None if input_model in ("", None, "ask_nilai") else input_model
+            return await self.process_question(question, user_id, model)
         except Exception as e:
             logging.error(f"Error in ask_ai: {e}")
             return "An error occurred while processing your question."
 
+    async def ask_ai_stream(self, question: str, input_model: str = "", wallet_address: str = None):
+        """Streaming variant of ask_ai yielding (event, data) pairs"""
+        user_id = wallet_address
+        model = None if input_model in ("", None, "ask_nilai") else input_model
+        try:
+            async for event, data in self.process_question_stream(question, user_id, model):
+                yield event, data
+        except Exception as e:
+            logging.error(f"Error in ask_ai_stream: {e}")
+            yield "error", {"error": "An error occurred while processing your question."}
+
+    async def recognize_swap_request(self, request, model):
+        """Extract swap details locally, only asking the LLM when the local parser isn't confident."""
+        intent = parse_swap_intent(request, token_registry.symbol_set)
+        if intent.confidence >= SWAP_PARSER_MIN_CONFIDENCE:
+            self.local_swap_extractions += 1
+            return intent.to_swap_info()
+
+        self.llm_swap_extractions += 1
+        logging.info(f"Local swap parser not confident ({intent.confidence}), asking LLM")
+        return await self.recognize_swap_request_with_ai(request, model)
+
     async def recognize_swap_request_with_ai(self, request, model):
         """Use AI to extract tokens from the user's request."""
         prompt = (
@@ -514,48 +789,635 @@ class CryptoTradingAssistant:
             "Return only the extracted values without any extra text."
         )
 
-        response = await self.ask_openrouter(prompt, model)
+        # Extraction goes to the router's fast extraction model, not the model chosen for the answer
+        response = await self.ask_openrouter(prompt, None, prompt_type="swap_extraction")
 
-        # Try to parse the response with labels
-        pattern = re.compile(
-            r"TokenA:\s*(?:\"([^\"]*)\"|'([^']*)'|([\w-]*)|())\s*,\s*"
-            r"TokenB:\s*(?:\"([^\"]*)\"|'([^']*)'|([\w-]*)|())\s*,\s*"
-            r"(?:AmountA:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
-            r"(?:AmountB:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
-            r"|(?:AmountB:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
-            r"(?:AmountA:\s*(?:\"?([0-9.,]*)\"?)\s*,?\s*)?"
-        )
-        match = pattern.search(response)
+        return parse_swap_extraction_reply(response)
+
+crypto_assistant = CryptoTradingAssistant()
+
+async def ask_tournament_agent(prompt, model):
+    """Trade decision from the agent's model; raises NoModelAvailable so the tournament counts it as an error"""
+    return await crypto_assistant.routed_complete(prompt, model, "trade_decision")
+
+# AI trader tournaments, scored against the shared price layer
+tournament_manager = TournamentManager(
+    ask_tournament_agent, get_multiple_token_prices, token_registry.symbols(), default_openrouter_ai_model,
+    model_allowed=model_router.is_allowed,
+)
+
+# Route handlers shared by the Flask (WSGI) app below and the ASGI app in asgi.py.
+# Each one is a coroutine returning a (payload, status) tuple.
+
+def normalize_wallet_address(wallet_address):
+    """Lower-case 0x address, None when not given; raises ValueError when malformed"""
+    if not wallet_address:
+        return None
+    if not WALLET_ADDRESS_RE.match(wallet_address):
+        raise ValueError(f"Invalid wallet address: {wallet_address}")
+    return wallet_address.lower()
 
-        if match:
-            tokenA = (match.group(1) or match.group(2) or match.group(3) or '').upper()
-            tokenB = (match.group(5) or match.group(6) or match.group(7) or '').upper()
-            amountA = (match.group(9) or match.group(12) or '').rstrip(',')
-            amountB = (match.group(10) or match.group(11) or '').rstrip(',')
+def authorize_wallet(wallet_address, session_token):
+    """Normalized address when session_token proves control of it, None when no address is given.
 
-            return { "inputToken": tokenA, "inputAmount": amountA, "outputToken": tokenB, "outputAmount": amountB }
+    Raises ValueError for a malformed address and PermissionError without a matching session.
+    """
+    wallet_address = normalize_wallet_address(wallet_address)
+    if wallet_address is None:
+        return None
+    if wallet_auth.wallet_for(session_token) != wallet_address:
+        raise PermissionError("Sign in with this wallet first: POST /wallet_auth/nonce, then /wallet_auth/verify")
+    return wallet_address
+
+async def wallet_nonce_view(wallet_address):
+    try:
+        wallet_address = normalize_wallet_address(wallet_address)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if wallet_address is None:
+        return {"error": "wallet_address is required"}, 400
+    message = wallet_auth.issue_nonce(wallet_address)
+    return {"wallet_address": wallet_address, "message": message, "expires_in": wallet_auth.nonce_ttl}, 200
+
+async def wallet_verify_view(wallet_address, signature):
+    try:
+        wallet_address = normalize_wallet_address(wallet_address)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if wallet_address is None or not signature:
+        return {"error": "wallet_address and signature are required"}, 400
+    try:
+        token = wallet_auth.verify(wallet_address, signature)
+    except PermissionError as e:
+        return {"error": str(e)}, 401
+    return {"wallet_address": wallet_address, "session_token": token, "expires_in": wallet_auth.session_ttl}, 200
+
+async def ask_ai_view(question, model, wallet_address=None, session_token=None):
+    if not question:
+        return {"error": "Question is empty"}, 400
+    try:
+        wallet_address = authorize_wallet(wallet_address, session_token)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except PermissionError as e:
+        return {"error": str(e)}, 401
+
+    response = await crypto_assistant.ask_ai(question, model, wallet_address)
+    return {"response": response}, 200
 
+async def ask_ai_stream_view(question, model, wallet_address=None, session_token=None):
+    if not question:
+        return {"error": "Question is empty"}, 400
+    try:
+        wallet_address = authorize_wallet(wallet_address, session_token)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except PermissionError as e:
+        return {"error": str(e)}, 401
+
+    async def events():
+        async for event, data in crypto_assistant.ask_ai_stream(question, model, wallet_address):
+            yield format_sse(event, data)
+
+    return events(), 200
+
+async def conversation_view(wallet_address, session_token=None):
+    try:
+        wallet_address = authorize_wallet(wallet_address, session_token)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except PermissionError as e:
+        return {"error": str(e)}, 401
+    return {"wallet_address": wallet_address, "turns": await conversation_store.turns(wallet_address)}, 200
+
+async def clear_conversation_view(wallet_address, session_token=None):
+    try:
+        wallet_address = authorize_wallet(wallet_address, session_token)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except PermissionError as e:
+        return {"error": str(e)}, 401
+    return {"wallet_address": wallet_address, "cleared": await conversation_store.clear(wallet_address)}, 200
+
+async def token_price_view(token_symbol):
+    api_source = price_source_name()
+    price = await get_token_price(token_symbol)
+    if price is not None:
         return {
-            "inputToken": "",
-            "inputAmount": "",
-            "outputToken": "",
-            "outputAmount": "",
-        }
+            "token": token_symbol.upper(),
+            "price_usd": price,
+            "source": api_source
+        }, 200
+    else:
+        return {"error": f"Unable to fetch price for {token_symbol}"}, 404
 
-crypto_assistant = CryptoTradingAssistant()
+async def token_prices_view(token_symbols):
+    api_source = price_source_name()
+
+    if not token_symbols:
+        return {"error": "No tokens specified"}, 400
+
+    prices = await get_multiple_token_prices(token_symbols)
+    if prices:
+        return {
+            "prices": prices,
+            "source": api_source
+        }, 200
+    else:
+        return {"error": "Unable to fetch prices for the specified tokens"}, 404
+
+async def api_source_view(new_source=None, price_mode=None):
+    global USE_1INCH_API, PRICE_FETCH_MODE
+
+    if price_mode is not None:
+        if price_mode not in PRICE_FETCH_MODES:
+            return {"error": f"Unknown price mode {price_mode}, expected one of {', '.join(PRICE_FETCH_MODES)}"}, 400
+        PRICE_FETCH_MODE = price_mode
+        logging.info(f"Price fetch mode changed to {PRICE_FETCH_MODE}")
+
+    if new_source is not None:
+        USE_1INCH_API = bool(new_source)
+        # Cached prices came from the previous source
+        price_cache.clear()
+        price_streamer.snapshot = None
+        logging.info(f"API source changed to {'1inch' if USE_1INCH_API else 'CoinGecko'}")
+
+    return {
+        "use_1inch": USE_1INCH_API,
+        "current_source": price_source_name(),
+        "price_mode": PRICE_FETCH_MODE
+    }, 200
+
+async def price_cache_stats_view():
+    stats = price_cache.stats()
+    stats["streamer"] = price_streamer.stats()
+    stats["feed"] = price_feed.stats()
+    stats["providers"] = {name: guard.stats() for name, guard in provider_guards.items()}
+    stats["provider_status"] = provider_status()
+    stats["single_flight"] = upstream_flights.stats()
+    stats["history"] = price_history.stats()
+    stats["local_dex"] = local_quoter.stats()
+    if replay_market is not None:
+        stats["replay"] = replay_market.stats()
+    return stats, 200
+
+async def price_history_view(token_symbol, start=None, end=None, max_points=None):
+    """Recorded ticks for one token in [start, end) (unix seconds, default the last hour)"""
+    if not price_history.enabled:
+        return {"error": "Price history is disabled, set PRICE_HISTORY_DIR"}, 404
+    try:
+        end = float(end) if end else time.time()
+        start = float(start) if start else end - 3600
+        max_points = int(max_points) if max_points else 1000
+    except ValueError:
+        return {"error": "start and end must be unix timestamps, max_points an integer"}, 400
+    if max_points <= 0:
+        return {"error": "max_points must be positive"}, 400
+
+    try:
+        ticks = await asyncio.to_thread(price_history.query, token_symbol, start, end)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # Evenly thin out long ranges; a strided slice is still a view
+    sampled = ticks[::-(-len(ticks) // max_points)] if len(ticks) > max_points else ticks
+    return {
+        "token": token_symbol.upper(),
+        "start": start,
+        "end": end,
+        "count": len(ticks),
+        "timestamps": sampled["ts"].tolist(),
+        "prices": sampled["price"].tolist(),
+        "sources": [SOURCE_NAMES.get(code, "unknown") for code in sampled["source"].tolist()],
+    }, 200
+
+async def price_stream_view(symbols, pairs):
+    if not symbols and not pairs:
+        return {"error": "No symbols or pairs specified"}, 400
+
+    try:
+        subscription = price_feed.subscribe(symbols, pairs)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    async def events():
+        try:
+            while True:
+                update = await subscription.next_event()
+                # Comment lines keep idle connections open through proxies
+                yield ": heartbeat\n\n" if update is None else format_sse(*update)
+        finally:
+            subscription.close()
+
+    return events(), 200
+
+async def completion_cache_stats_view():
+    stats = completion_cache.stats()
+    stats["local_swap_extractions"] = crypto_assistant.local_swap_extractions
+    stats["llm_swap_extractions"] = crypto_assistant.llm_swap_extractions
+    return stats, 200
+
+async def model_router_stats_view():
+    return model_router.stats(), 200
+
+async def ask_ai_timings_view():
+    summary = crypto_assistant.timings.summary()
+    summary["pipelined"] = ASK_AI_PIPELINED
+    return summary, 200
+
+async def tournaments_view():
+    return {
+        "tournaments": [t.summary() for t in reversed(tournament_manager.tournaments.values())],
+        "stats": tournament_manager.stats(),
+    }, 200
+
+async def create_tournament_view(data):
+    """Start a tournament; it keeps running after the response is sent"""
+    if not isinstance(data, dict):
+        return {"error": "Body must be a JSON object"}, 400
+    try:
+        unknown = [s for s in data.get("symbols") or [] if s.upper() not in token_registry]
+        if unknown:
+            return {"error": f"Unknown tokens: {', '.join(unknown)}"}, 400
+        tournament = tournament_manager.create(
+            data.get("agents") or [],
+            symbols=data.get("symbols"),
+            rounds=data.get("rounds", 10),
+            round_interval=data.get("round_interval", 0),
+            starting_balance=data.get("starting_balance"),
+        )
+    except (TypeError, ValueError, AttributeError) as e:
+        return {"error": str(e)}, 400
+    return tournament.summary(), 202
+
+async def tournament_view(tournament_id, include_history=False, limit=None):
+    tournament = tournament_manager.get(tournament_id)
+    if tournament is None:
+        return {"error": f"Unknown tournament {tournament_id}"}, 404
+    try:
+        limit = int(limit) if limit not in (None, "") else None
+    except (TypeError, ValueError):
+        return {"error": "limit must be an integer"}, 400
+    if limit is not None:
+        limit = max(1, min(limit, len(tournament.agents)))
+    return tournament.results(include_history, limit), 200
+
+async def cancel_tournament_view(tournament_id):
+    if tournament_manager.get(tournament_id) is None:
+        return {"error": f"Unknown tournament {tournament_id}"}, 404
+    if not tournament_manager.cancel(tournament_id):
+        return {"error": f"Tournament {tournament_id} is not running"}, 409
+    return {"id": str(tournament_id), "cancelled": True}, 200
+
+def parse_from_amount(value):
+    """from_amount as a positive, finite float; raises ValueError otherwise"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("from_amount must be a number")
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError("from_amount must be a positive number")
+    return amount
+
+def validate_quote_leg(from_token, to_token, from_amount):
+    """(FROM, TO, amount) leg and None, or None and the error, shared by the single and batch quote views"""
+    try:
+        from_amount = parse_from_amount(from_amount)
+    except ValueError as e:
+        return None, str(e)
+    from_token, to_token = str(from_token).upper(), str(to_token).upper()
+    from_token_info, to_token_info = token_registry.get(from_token), token_registry.get(to_token)
+    if not from_token_info or not to_token_info or not from_token_info.address or not to_token_info.address:
+        return None, f"Token address not found for {from_token} or {to_token}"
+    error = quote_chain_error(from_token_info, to_token_info)
+    if error:
+        return None, error
+    return (from_token, to_token, from_amount), None
+
+async def exchange_quote_view(from_token, to_token, from_amount):
+    leg, error = validate_quote_leg(from_token, to_token, from_amount)
+    if error:
+        return {"error": error}, 400
+    from_amount = leg[2]
+
+    # Get real token addresses for 1inch API
+    from_token_info = token_registry.get(from_token)
+    to_token_info = token_registry.get(to_token)
+    chain_id = from_token_info.chain_id
+
+    # Convert amount to base units (1inch API expects amount in wei) using the token's decimals
+    amount_in_wei = from_token_info.to_wei(from_amount)
+
+    # The quote, both USD prices, the native token price (for the network fee)
+    # and the gas price don't depend on each other, so fetch them all at once
+    # under one deadline. Legs that miss the deadline come back as None.
+    try:
+        legs = await gather_with_deadline({
+            "quote": get_swap_quote(from_token_info.address, to_token_info.address, amount_in_wei, chain_id),
+            "from_price": get_token_price(from_token),
+            "to_price": get_token_price(to_token),
+            "native_price": get_token_price(CHAIN_NATIVE_SYMBOLS.get(chain_id, "ETH")),
+            "gas_price": get_gas_price_wei(chain_id),
+        }, QUOTE_DEADLINE)
+    except Exception as e:
+        logging.error(f"Error getting 1inch quote: {str(e)}")
+        return {"error": str(e)}, 500
+
+    result = legs["quote"]
+    if not result or "toAmount" not in result:
+        logging.error(f"Invalid response from 1inch API: {result}")
+        return {"error": "Failed to get quote from 1inch API"}, 500
+
+    missing = [name for name, value in legs.items() if value is None]
+    try:
+        return build_quote_payload(
+            from_token, to_token, from_amount, result,
+            legs["from_price"], legs["to_price"], legs["native_price"], legs["gas_price"], missing
+        ), 200
+    except Exception as e:
+        logging.error(f"Error building quote: {str(e)}")
+        return {"error": "Failed to build quote"}, 500
+
+def quote_chain_error(from_token_info, to_token_info):
+    """Why two registry tokens can't be quoted through 1inch, or None"""
+    if from_token_info.chain_id != to_token_info.chain_id:
+        return (f"Cross-chain quotes are not supported: {from_token_info.symbol} is on chain "
+                f"{from_token_info.chain_id}, {to_token_info.symbol} on chain {to_token_info.chain_id}")
+    if from_token_info.chain_id not in ONEINCH_CHAIN_IDS and from_token_info.chain_id not in local_quoter.chains():
+        return f"No quote source for chain {from_token_info.chain_id}"
+    return None
+
+def price_implied_quote(to_token, from_amount, from_price_usd, to_price_usd):
+    """Quote-shaped result from USD prices alone, for legs that got no upstream quote; None without both prices"""
+    if not from_price_usd or not to_price_usd:
+        return None
+    to_amount = from_amount * from_price_usd / to_price_usd
+    return {"toAmount": str(token_registry.get(to_token).to_wei(to_amount)), "source": "price_estimate"}
+
+def build_quote_payload(from_token, to_token, from_amount, result, from_price_usd, to_price_usd, native_price_usd, gas_price_wei, missing):
+    """Build the /get_exchange_quote response from a 1inch quote and the looked up prices"""
+    # Convert the result amount from base units using the output token's decimals
+    to_amount = float(token_registry.get(to_token).from_wei(result["toAmount"]))
+
+    # Calculate exchange rate per token
+    exchange_rate = to_amount / from_amount
+
+    # Calculate USD values
+    from_value_usd = from_price_usd * from_amount if from_price_usd else None
+    to_value_usd = to_price_usd * to_amount if to_price_usd else None
+
+    # Network fee = estimated gas * live gas price, paid in the chain's native token (18 decimals)
+    estimated_gas = int(result.get("estimatedGas", 200000))
+    network_fee_usd = None
+    if gas_price_wei is not None and native_price_usd:
+        network_fee_native = (estimated_gas * gas_price_wei) / 1e18
+        network_fee_usd = network_fee_native * native_price_usd
+
+    logging.info(f"1inch quote: {from_amount} {from_token} = {to_amount} {to_token}")
+    return {
+        "from": {
+            "token": from_token.upper(),
+            "amount": from_amount,
+            "value_usd": from_value_usd,
+            "price_usd": from_price_usd
+        },
+        "to": {
+            "token": to_token.upper(),
+            "amount": to_amount,
+            "value_usd": to_value_usd,
+            "price_usd": to_price_usd
+        },
+        "exchange_rate": exchange_rate,
+        "network_fee_usd": network_fee_usd,
+        "gas_price_gwei": gas_price_wei / 1e9 if gas_price_wei is not None else None,
+        # Legs that timed out or failed, their values above are null
+        "missing": missing,
+        "timestamp": datetime.now().isoformat(),
+        # Where the quote came from: "local" pool reserves, "1inch" or "price_estimate" (USD prices only)
+        "quote_source": result.get("source", "1inch"),
+        # Include raw quote response for reference
+        "raw_response": result
+    }
+
+async def exchange_quotes_view(quote_requests):
+    """Quote many pairs at once.
+
+    Identical (from, to, amount) legs are quoted once, upstream quote calls run
+    concurrently under QUOTE_CONCURRENCY, and a single batched price lookup
+    plus one gas price lookup per chain are shared by every quote. Results
+    keep the order of the request.
+
+    1inch quotes share the provider's rate limit (ONEINCH_RATE_LIMIT,
+    ONEINCH_BURST; 1 rps with a burst of 5 by default), so only about
+    burst + rate * QUOTE_DEADLINE distinct legs get a 1inch quote in time.
+    Pairs in the local pool set don't count against it. The other legs are
+    priced from the shared USD prices instead and marked with
+    quote_source "price_estimate"; only legs without both prices fail.
+    """
+    if not isinstance(quote_requests, list) or not quote_requests:
+        return {"error": "No quotes specified"}, 400
+    if len(quote_requests) > MAX_BATCH_QUOTES:
+        return {"error": f"Too many quotes, at most {MAX_BATCH_QUOTES} per request"}, 400
+
+    # Normalize every entry to a (FROM, TO, amount) leg, or an error
+    entries = []
+    for item in quote_requests:
+        try:
+            leg, error = validate_quote_leg(item["from_token"], item["to_token"], item.get("from_amount", 10))
+        except (KeyError, TypeError, AttributeError):
+            entries.append({"error": "Each quote needs from_token, to_token and a numeric from_amount"})
+            continue
+        entries.append({"error": error} if error else leg)
+
+    unique_legs = list(dict.fromkeys(entry for entry in entries if isinstance(entry, tuple)))
+    chain_ids = list(dict.fromkeys(token_registry.get(leg[0]).chain_id for leg in unique_legs))
+    native_symbols = [CHAIN_NATIVE_SYMBOLS.get(chain_id, "ETH") for chain_id in chain_ids]
+    symbols = list(dict.fromkeys([s for leg in unique_legs for s in leg[:2]] + native_symbols))
+    semaphore = asyncio.Semaphore(QUOTE_CONCURRENCY)
+
+    async def limited_quote(leg):
+        from_token_info, to_token_info = token_registry.get(leg[0]), token_registry.get(leg[1])
+        async with semaphore:
+            return await get_swap_quote(
+                from_token_info.address,
+                to_token_info.address,
+                from_token_info.to_wei(leg[2]),
+                from_token_info.chain_id
+            )
+
+    coros = {"prices": get_multiple_token_prices(symbols)}
+    coros.update({("gas_price", chain_id): get_gas_price_wei(chain_id) for chain_id in chain_ids})
+    coros.update({leg: limited_quote(leg) for leg in unique_legs})
+    legs = await gather_with_deadline(coros, QUOTE_DEADLINE)
+    prices = legs["prices"] or {}
+
+    quotes = []
+    for entry in entries:
+        if not isinstance(entry, tuple):
+            quotes.append(entry)
+            continue
+        from_token, to_token, from_amount = entry
+        result = legs[entry]
+        if not result or "toAmount" not in result:
+            # Usually a leg that waited out the 1inch rate limit; price it from the shared lookup instead
+            result = price_implied_quote(to_token, from_amount, prices.get(from_token), prices.get(to_token))
+        if result is None:
+            quotes.append({"error": f"Failed to get quote from 1inch API for {from_token} -> {to_token}"})
+            continue
+        chain_id = token_registry.get(from_token).chain_id
+        native_price = prices.get(CHAIN_NATIVE_SYMBOLS.get(chain_id, "ETH"))
+        gas_price_wei = legs[("gas_price", chain_id)]
+        missing = [name for name, value in (
+            ("from_price", prices.get(from_token)),
+            ("to_price", prices.get(to_token)),
+            ("native_price", native_price),
+            ("gas_price", gas_price_wei),
+        ) if value is None]
+        try:
+            quotes.append(build_quote_payload(
+                from_token, to_token, from_amount, result,
+                prices.get(from_token), prices.get(to_token), native_price, gas_price_wei, missing
+            ))
+        except Exception as e:
+            logging.error(f"Error building quote for {from_token} -> {to_token}: {str(e)}")
+            quotes.append({"error": "Failed to build quote"})
+
+    return {"quotes": quotes}, 200
+
+async def get_feed_quote(from_token, to_token, from_amount):
+    """Quote used by the streaming feed, without per-call fields like timestamp"""
+    payload, status = await exchange_quote_view(from_token, to_token, from_amount)
+    if status != 200:
+        return None
+    return {key: payload[key] for key in ("from", "to", "exchange_rate", "network_fee_usd")}
+
+# Single upstream refresher shared by every /price_stream client
+price_feed = PriceFeed(get_multiple_token_prices, get_feed_quote)
+
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+def collect_app_metrics():
+    """Cache, feed, provider and tournament state sampled at scrape time for /metrics"""
+    price_stats = price_cache.stats()
+    completion_stats = completion_cache.stats()
+    tournament_stats = tournament_manager.stats()
+    conversation_stats = conversation_store.stats()
+    wallet_auth_stats = wallet_auth.stats()
+    return [
+        ("cache_hit_ratio", "gauge", "Share of lookups answered from cache", ("cache",), {
+            ("price",): price_stats["hit_ratio"],
+            ("completion",): completion_stats["hit_ratio"],
+        }),
+        ("cache_entries", "gauge", "Entries currently held in cache", ("cache",), {
+            ("price",): price_stats["size"],
+            ("completion",): completion_stats["size"],
+        }),
+        ("price_cache_upstream_calls_total", "counter", "Upstream fetches made by the price cache", (), {
+            (): price_stats["upstream_calls"],
+        }),
+        ("price_provider_timeouts_total", "counter", "Price requests that hit the provider timeout", ("provider",), {
+            (oneinch_provider.name,): oneinch_provider.timeouts,
+            (coingecko_provider.name,): coingecko_provider.timeouts,
+        }),
+        ("provider_circuit_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)", ("provider",), {
+            (name,): CIRCUIT_STATE_VALUES[guard.breaker.state] for name, guard in provider_guards.items()
+        }),
+        ("provider_circuit_trips_total", "counter", "Times the provider circuit breaker opened", ("provider",), {
+            (name,): guard.breaker.trips for name, guard in provider_guards.items()
+        }),
+        ("provider_rejected_calls_total", "counter", "Calls not sent to a provider", ("provider", "reason"), {
+            **{(name, "circuit_open"): guard.rejected_open for name, guard in provider_guards.items()},
+            **{(name, "rate_limited"): guard.rejected_rate for name, guard in provider_guards.items()},
+        }),
+        ("single_flight_calls_total", "counter", "Upstream lookups by endpoint and how they were served", ("endpoint", "outcome"), {
+            (endpoint, outcome): count
+            for endpoint, counts in upstream_flights.calls.items() for outcome, count in counts.items()
+        }),
+        ("price_stream_subscribers", "gauge", "Connected /price_stream clients", (), {
+            (): len(price_feed.subscribers),
+        }),
+        ("price_snapshot_age_seconds", "gauge", "Age of the background price snapshot", (), {
+            (): price_streamer.snapshot.age() if price_streamer.snapshot else None,
+        }),
+        ("tournaments_running", "gauge", "Tournaments currently playing", (), {
+            (): tournament_stats["running"],
+        }),
+        ("tournament_agent_rounds_total", "counter", "Agent decisions played in kept tournaments", (), {
+            (): tournament_stats["agent_rounds"],
+        }),
+        ("conversation_sessions", "gauge", "Chat sessions held in memory", (), {
+            (): conversation_stats["sessions"],
+        }),
+        ("conversation_evictions_total", "counter", "Chat sessions evicted from memory", ("reason",), {
+            ("lru",): conversation_stats["evictions"],
+            ("idle",): conversation_stats["idle_evictions"],
+        }),
+        ("wallet_auth_sessions", "gauge", "Wallet sign-in sessions held in memory", (), {
+            (): wallet_auth_stats["sessions"],
+        }),
+        ("wallet_auth_failed_verifications_total", "counter", "Wallet sign-ins rejected for a missing nonce or bad signature", (), {
+            (): wallet_auth_stats["failed_verifications"],
+        }),
+        ("model_route_decisions_total", "counter", "Models chosen per prompt type, first choice or failover", ("prompt_type", "model", "kind"), {
+            key: count for key, count in model_router.decisions.items()
+        }),
+        ("model_calls_total", "counter", "LLM calls by model and outcome", ("model", "outcome"), {
+            (model, outcome): count for model, health in model_router.health.items() for outcome, count in health.calls.items()
+        }),
+        ("model_latency_seconds", "gauge", "Rolling mean LLM call latency", ("model",), {
+            (model,): health.latency() for model, health in model_router.health.items()
+        }),
+        ("model_error_rate", "gauge", "Rolling share of failed LLM calls", ("model",), {
+            (model,): health.error_rate() for model, health in model_router.health.items()
+        }),
+        ("local_dex_quotes_total", "counter", "Quote requests seen by the local pool quoter", ("outcome",), {
+            ("routed",): local_quoter.quotes,
+            ("unroutable",): local_quoter.unroutable,
+        }),
+        ("swap_extractions_total", "counter", "Swap extractions by method", ("method",), {
+            ("local",): crypto_assistant.local_swap_extractions,
+            ("llm",): crypto_assistant.llm_swap_extractions,
+        }),
+    ]
+
+metrics_registry.add_collector(collect_app_metrics)
+
+@app.before_request
+def start_request_timer():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.request_timer = RequestTimer(route, request.method)
+
+@app.after_request
+def record_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_request_timer(exception=None):
+    timer = g.pop("request_timer", None)
+    if timer is not None:
+        timer.finish(g.pop("response_status", 500))
+
+@app.route("/metrics")
+def metrics_route():
+    """Prometheus text format metrics"""
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/")
 def home():
     return "Hello, World!"
 
+def wallet_session_token(values):
+    """Session token from the X-Wallet-Session header, or session_token in the query or body"""
+    return request.headers.get(WALLET_SESSION_HEADER) or values.get("session_token")
+
 @app.route("/ask_ai/<path:question>", methods=["GET"])
 def ask_ai_get(question):
-    model = request.args.get("model", default_openrouter_ai_model)
-    if not question:
-        return jsonify({"error": "Question is empty"}), 400
-
-    response = asyncio.run(crypto_assistant.ask_ai(question, model))
-    return jsonify({"response": response})
+    model = request.args.get("model")
+    payload, status = run_async(ask_ai_view(
+        question, model, request.args.get("wallet_address"), wallet_session_token(request.args)
+    ))
+    return jsonify(payload), status
 
 @app.route("/ask_ai", methods=["POST", "OPTIONS"])
 def ask_ai_post():
@@ -565,35 +1427,71 @@ def ask_ai_post():
 
     data = request.get_json() or {}
     question = data.get("question", "")
-    model = data.get("model", default_openrouter_ai_model)
+    model = data.get("model")
+
+    payload, status = run_async(ask_ai_view(question, model, data.get("wallet_address"), wallet_session_token(data)))
+    return jsonify(payload), status
+
+@app.route("/ask_ai_stream/<path:question>", methods=["GET"])
+def ask_ai_stream_get(question):
+    """Server-Sent Events variant of /ask_ai: swap_info, delta..., done"""
+    model = request.args.get("model")
+    events, status = run_async(ask_ai_stream_view(
+        question, model, request.args.get("wallet_address"), wallet_session_token(request.args)
+    ))
+    if status != 200:
+        return jsonify(events), status
+    return Response(iterate_async(events), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route("/ask_ai_stream", methods=["POST", "OPTIONS"])
+def ask_ai_stream_post():
+    if request.method == "OPTIONS":
+        return "", 200
 
-    if not question:
-        return jsonify({"error": "Question is empty"}), 400
+    data = request.get_json() or {}
+    question = data.get("question", "")
+    model = data.get("model")
+
+    events, status = run_async(ask_ai_stream_view(
+        question, model, data.get("wallet_address"), wallet_session_token(data)
+    ))
+    if status != 200:
+        return jsonify(events), status
+    return Response(iterate_async(events), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route("/conversation/<wallet_address>", methods=["GET", "DELETE"])
+def conversation_route(wallet_address):
+    """Stored chat turns for a wallet; DELETE forgets them. Needs a session from /wallet_auth/verify"""
+    session_token = wallet_session_token(request.args)
+    if request.method == "DELETE":
+        payload, status = run_async(clear_conversation_view(wallet_address, session_token))
+    else:
+        payload, status = run_async(conversation_view(wallet_address, session_token))
+    return jsonify(payload), status
 
-    # Call your async method:
-    response = asyncio.run(crypto_assistant.ask_ai(question, model))
+@app.route("/wallet_auth/nonce", methods=["POST"])
+def wallet_nonce_route():
+    """Body: {"wallet_address": "0x..."}; returns the message to sign with personal_sign"""
+    data = request.get_json() or {}
+    payload, status = run_async(wallet_nonce_view(data.get("wallet_address")))
+    return jsonify(payload), status
 
-    return jsonify({"response": response})
+@app.route("/wallet_auth/verify", methods=["POST"])
+def wallet_verify_route():
+    """Body: {"wallet_address": "0x...", "signature": "0x..."}; returns a session token"""
+    data = request.get_json() or {}
+    payload, status = run_async(wallet_verify_view(data.get("wallet_address"), data.get("signature")))
+    return jsonify(payload), status
 
 @app.route("/token_price/<token_symbol>", methods=["GET"])
 def get_token_price_route(token_symbol):
     """Route to get the current price of a token using the configured price API"""
-    api_source = "1inch" if USE_1INCH_API else "CoinGecko"
-    price = asyncio.run(get_token_price(token_symbol))
-    if price is not None:
-        return jsonify({
-            "token": token_symbol.upper(),
-            "price_usd": price,
-            "source": api_source
-        })
-    else:
-        return jsonify({"error": f"Unable to fetch price for {token_symbol}"}), 404
+    payload, status = run_async(token_price_view(token_symbol))
+    return jsonify(payload), status
 
 @app.route("/token_prices", methods=["GET", "POST"])
 def get_token_prices_route():
     """Route to get the current prices of multiple tokens using the configured price API"""
-    api_source = "1inch" if USE_1INCH_API else "CoinGecko"
-
     if request.method == "POST":
         data = request.get_json() or {}
         token_symbols = data.get("tokens", [])
@@ -601,120 +1499,234 @@ def get_token_prices_route():
         token_symbols = request.args.get("tokens", "").split(",")
         token_symbols = [symbol.strip() for symbol in token_symbols if symbol.strip()]
 
-    if not token_symbols:
-        return jsonify({"error": "No tokens specified"}), 400
-
-    prices = asyncio.run(get_multiple_token_prices(token_symbols))
-    if prices:
-        return jsonify({
-            "prices": prices,
-            "source": api_source
-        })
-    else:
-        return jsonify({"error": "Unable to fetch prices for the specified tokens"}), 404
+    payload, status = run_async(token_prices_view(token_symbols))
+    return jsonify(payload), status
 
 @app.route("/api_source", methods=["GET", "POST"])
 def api_source_route():
     """Route to get or set the current API source (1inch or CoinGecko)"""
-    global USE_1INCH_API
-
+    new_source = None
+    price_mode = None
     if request.method == "POST":
         data = request.get_json() or {}
         new_source = data.get("use_1inch", None)
+        price_mode = data.get("price_mode", None)
 
-        if new_source is not None:
-            USE_1INCH_API = bool(new_source)
-            logging.info(f"API source changed to {'1inch' if USE_1INCH_API else 'CoinGecko'}")
+    payload, status = run_async(api_source_view(new_source, price_mode))
+    return jsonify(payload), status
 
-    return jsonify({
-        "use_1inch": USE_1INCH_API,
-        "current_source": "1inch" if USE_1INCH_API else "CoinGecko"
-    })
+@app.route("/get_exchange_quotes", methods=["POST"])
+def get_exchange_quotes():
+    """Get exchange quotes for many pairs/amounts in one request.
+
+    Body: {"quotes": [{"from_token": "1INCH", "to_token": "ETH", "from_amount": 10}, ...]}
+    """
+    data = request.get_json() or {}
+    payload, status = run_async(exchange_quotes_view(data.get("quotes", [])))
+    return jsonify(payload), status
+
+@app.route("/price_cache_stats", methods=["GET"])
+def price_cache_stats_route():
+    """Route to inspect price cache hit/miss counters"""
+    payload, status = run_async(price_cache_stats_view())
+    return jsonify(payload), status
+
+@app.route("/price_history/<token_symbol>", methods=["GET"])
+def price_history_route(token_symbol):
+    """Example: /price_history/ETH?start=1717000000&end=1717003600&max_points=500"""
+    payload, status = run_async(price_history_view(
+        token_symbol, request.args.get("start"), request.args.get("end"), request.args.get("max_points")
+    ))
+    return jsonify(payload), status
+
+@app.route("/price_stream", methods=["GET"])
+def price_stream_route():
+    """Server-Sent Events feed of price and quote changes.
+
+    Example: /price_stream?symbols=ETH,USDC&pairs=1INCH:ETH:10
+    """
+    symbols = [s.strip() for s in request.args.get("symbols", "").split(",") if s.strip()]
+    pairs = [p.strip() for p in request.args.get("pairs", "").split(",") if p.strip()]
+
+    events, status = run_async(price_stream_view(symbols, pairs))
+    if status != 200:
+        return jsonify(events), status
+    return Response(iterate_async(events), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.route("/completion_cache_stats", methods=["GET"])
+def completion_cache_stats_route():
+    """Route to inspect LLM completion cache hit/miss counters"""
+    payload, status = run_async(completion_cache_stats_view())
+    return jsonify(payload), status
+
+@app.route("/model_router_stats", methods=["GET"])
+def model_router_stats_route():
+    """Route to inspect per-model latency, error rate and routing decisions"""
+    payload, status = run_async(model_router_stats_view())
+    return jsonify(payload), status
+
+@app.route("/ask_ai_timings", methods=["GET"])
+def ask_ai_timings_route():
+    """Route to inspect per-stage latencies of recent /ask_ai requests"""
+    payload, status = run_async(ask_ai_timings_view())
+    return jsonify(payload), status
+
+@app.route("/tournaments", methods=["GET", "POST"])
+def tournaments_route():
+    """List tournaments, or start one.
+
+    Body: {"agents": [{"name": "bull", "model": "...", "prompt": "Buy dips"}, ...],
+           "rounds": 20, "round_interval": 5, "symbols": ["ETH", "WBTC", "USDC"],
+           "starting_balance": {"USDC": 1000}}
+    """
+    if request.method == "POST":
+        payload, status = run_async(create_tournament_view(request.get_json() or {}))
+    else:
+        payload, status = run_async(tournaments_view())
+    return jsonify(payload), status
+
+@app.route("/tournaments/<tournament_id>", methods=["GET"])
+def tournament_route(tournament_id):
+    """Leaderboard and status; ?limit=10 for the top 10, ?history=1 for per-round prices and values"""
+    include_history = request.args.get("history", "").lower() in ("1", "true", "yes")
+    payload, status = run_async(tournament_view(tournament_id, include_history, request.args.get("limit")))
+    return jsonify(payload), status
+
+@app.route("/tournaments/<tournament_id>/cancel", methods=["POST"])
+def cancel_tournament_route(tournament_id):
+    payload, status = run_async(cancel_tournament_view(tournament_id))
+    return jsonify(payload), status
 
 @app.route("/get_exchange_quote", methods=["GET"])
 def get_exchange_quote():
     """Get a real exchange quote directly from 1inch API"""
     from_token = request.args.get("from_token", "1INCH")
     to_token = request.args.get("to_token", "ETH")
-    from_amount = float(request.args.get("from_amount", "10"))
+    # Validated by the view, which answers 400 for anything but a positive number
+    from_amount = request.args.get("from_amount", "10")
+
+    payload, status = run_async(exchange_quote_view(from_token, to_token, from_amount))
+    return jsonify(payload), status
+
+async def gather_with_deadline(coros, deadline):
+    """Run named coroutines concurrently; anything unfinished by the deadline yields None"""
+    tasks = {name: asyncio.ensure_future(coro) for name, coro in coros.items()}
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    for name, task in tasks.items():
+        if task in pending:
+            logging.warning(f"{name} did not finish within {deadline}s")
+            results[name] = None
+        elif task.exception() is not None:
+            logging.error(f"{name} failed: {str(task.exception())}")
+            results[name] = None
+        else:
+            results[name] = task.result()
+    return results
 
-    # Get real token addresses for 1inch API
-    from_token_address = TOKEN_ADDRESS_MAPPING.get(from_token.upper())
-    to_token_address = TOKEN_ADDRESS_MAPPING.get(to_token.upper())
+async def get_gas_price_wei(chain_id=ETHEREUM_CHAIN_ID):
+    """Get the current gas price on a chain in wei, sharing concurrent lookups"""
+    return await upstream_flights.do(("gas_price", chain_id), lambda: fetch_gas_price_wei(chain_id))
 
-    if not from_token_address or not to_token_address:
-        return jsonify({"error": f"Token address not found for {from_token} or {to_token}"}), 400
+async def fetch_gas_price_wei(chain_id=ETHEREUM_CHAIN_ID):
+    """Get the current gas price on a chain in wei.
 
-    # Convert amount to wei (1inch API expects amount in wei)
-    # For 1INCH token with 18 decimals
-    decimals = 18  # Most ERC20 tokens use 18 decimals
-    amount_in_wei = int(from_amount * (10 ** decimals))
+    Uses eth_gasPrice on ETH_RPC_URL for Ethereum mainnet when configured,
+    otherwise the 1inch gas price API (medium maxFeePerGas).
+    """
+    if replay_market is not None:
+        return await replay_market.get_gas_price_wei()
 
-    # Directly query 1inch swap API for a real quote
+    rpc_url = os.getenv("ETH_RPC_URL")
+    if not rpc_url or chain_id != ETHEREUM_CHAIN_ID:
+        return await get_1inch_gas_price_wei(chain_id)
     try:
-        # Use 1inch Swap API to get a quote
-        # We'll use Ethereum mainnet (chain ID 1)
-        result = asyncio.run(get_1inch_quote(
-            from_token_address,
-            to_token_address,
-            amount_in_wei
-        ))
-
-        if result and "toAmount" in result:
-            # Convert the result amount from wei to ETH (decimal)
-            to_amount = float(result["toAmount"]) / (10 ** decimals)
-
-            # Calculate exchange rate per token
-            exchange_rate = to_amount / from_amount
-
-            # Get token prices for USD values
-            from_price_usd = asyncio.run(get_token_price(from_token))
-            to_price_usd = asyncio.run(get_token_price(to_token))
-
-            # Calculate USD values
-            from_value_usd = from_price_usd * from_amount if from_price_usd else None
-            to_value_usd = to_price_usd * to_amount if to_price_usd else None
-
-            # Get estimated gas fee
-            estimated_gas = int(result.get("estimatedGas", 200000))
-            gas_price_wei = 30000000000  # 30 gwei as default
-
-            # Calculate network fee in ETH
-            network_fee_eth = (estimated_gas * gas_price_wei) / 1e18
-            # Convert to USD
-            network_fee_usd = network_fee_eth * to_price_usd if to_price_usd else 0.16
-
-            logging.info(f"1inch quote: {from_amount} {from_token} = {to_amount} {to_token}")
-            return jsonify({
-                "from": {
-                    "token": from_token.upper(),
-                    "amount": from_amount,
-                    "value_usd": from_value_usd,
-                    "price_usd": from_price_usd
-                },
-                "to": {
-                    "token": to_token.upper(),
-                    "amount": to_amount,
-                    "value_usd": to_value_usd,
-                    "price_usd": to_price_usd
-                },
-                "exchange_rate": exchange_rate,
-                "network_fee_usd": network_fee_usd,
-                "timestamp": datetime.now().isoformat(),
-                # Include raw 1inch response for reference
-                "raw_response": result
-            })
-        else:
-            logging.error(f"Invalid response from 1inch API: {result}")
-            return jsonify({"error": "Failed to get quote from 1inch API"}), 500
+        session = get_session()
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "eth_gasPrice", "params": []}
+        async with session.post(rpc_url, json=payload) as response:
+            if response.status == 200:
+                data = await response.json()
+                return int(data["result"], 16)
+            logging.warning(f"RPC: Failed to get gas price: {await response.text()}")
+            return None
     except Exception as e:
-        logging.error(f"Error getting 1inch quote: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        logging.error(f"Error fetching gas price: {str(e)}")
+        return None
+
+async def get_1inch_gas_price_wei(chain_id=ETHEREUM_CHAIN_ID):
+    """Get the medium maxFeePerGas on a chain from the 1inch gas price API"""
+    guard = get_guard("1inch")
+    if not await guard.acquire(max_wait=QUOTE_DEADLINE):
+        logging.warning(f"1inch: Skipping gas price request, provider {guard.breaker.state} or rate limited")
+        return None
+
+    api_key = os.getenv("ONEINCH_API_KEY", "jnSBv4cJLnFd4BtiSrxosxaFdasKTMV8")
+    try:
+        session = get_session()
+        async with session.get(f"{ONEINCH_API_URL}/gas-price/v1.5/{chain_id}", headers={'Authorization': f'Bearer {api_key}'}) as response:
+            guard.record_status(response.status)
+            if response.status == 200:
+                data = await response.json()
+                return int(data["medium"]["maxFeePerGas"])
+            logging.warning(f"1inch: Failed to get gas price: {await response.text()}")
+            return None
+    except asyncio.CancelledError:
+        guard.breaker.release_probe()
+        raise
+    except Exception as e:
+        guard.record_failure()
+        logging.error(f"Error fetching gas price: {str(e)}")
+        return None
+
+async def get_swap_quote(from_token_address, to_token_address, amount_in_wei, chain_id=ETHEREUM_CHAIN_ID):
+    """Quote from local pool reserves when the pair can be routed there, else from 1inch"""
+    if local_quoter.enabled:
+        quote = local_quoter.quote(from_token_address, to_token_address, amount_in_wei, chain_id)
+        if quote is not None:
+            return quote
+    if chain_id not in ONEINCH_CHAIN_IDS:
+        return None
+    return await get_1inch_quote(from_token_address, to_token_address, amount_in_wei, chain_id)
+
+async def load_local_pools(loop):
+    """Read the pools at DEX_RPC_URL, then refresh their reserves if DEX_REFRESH_INTERVAL is set"""
+    try:
+        # Web3 calls block, so they run in a thread; the pools are added on the loop
+        pools = await loop.run_in_executor(
+            None, local_quoter.read_node_pools, DEX_RPC_URL, node_pair_addresses(), DEX_FACTORY_ADDRESS or None,
+        )
+        local_quoter.add_node_pools(pools)
+    except Exception as e:
+        logging.error(f"Local DEX: can't load pools from the node, quoting through 1inch only: {str(e)}")
+    if local_quoter.enabled and DEX_REFRESH_INTERVAL > 0:
+        await refresh_local_pools(loop)
+
+async def refresh_local_pools(loop):
+    """Re-read local pool reserves from DEX_RPC_URL every DEX_REFRESH_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(DEX_REFRESH_INTERVAL)
+        try:
+            # Web3 calls block, so they run in a thread; reserves are swapped in on the loop
+            reserves = await loop.run_in_executor(None, local_quoter.read_reserves, DEX_RPC_URL)
+            local_quoter.apply_reserves(reserves)
+        except Exception as e:
+            logging.error(f"Local DEX: reserve refresh failed: {str(e)}")
 
-async def get_1inch_quote(from_token_address, to_token_address, amount_in_wei):
+async def get_1inch_quote(from_token_address, to_token_address, amount_in_wei, chain_id=ETHEREUM_CHAIN_ID):
+    """Get a 1inch quote, sharing identical concurrent requests"""
+    key = ("quote", chain_id, from_token_address.lower(), to_token_address.lower(), int(amount_in_wei))
+    return await upstream_flights.do(key, lambda: fetch_1inch_quote(from_token_address, to_token_address, amount_in_wei, chain_id))
+
+async def fetch_1inch_quote(from_token_address, to_token_address, amount_in_wei, chain_id=ETHEREUM_CHAIN_ID):
     """Get an actual swap quote from 1inch API"""
-    # 1inch Swap API endpoint for quotes
-    url = "https://api.1inch.dev/swap/v5.2/1/quote"
+    if replay_market is not None:
+        return await replay_market.quote(from_token_address, to_token_address, amount_in_wei, chain_id)
+
+    # 1inch Swap API endpoint for quotes on the tokens' chain
+    url = f"{ONEINCH_API_URL}/swap/v5.2/{chain_id}/quote"
 
     # Get your API key from environment variables
     api_key = os.getenv("ONEINCH_API_KEY", "")
@@ -727,26 +1739,44 @@ async def get_1inch_quote(from_token_address, to_token_address, amount_in_wei):
         "includeProtocols": "true"
     }
 
+    # Quotes wait for a rate limit token rather than failing outright
+    guard = get_guard("1inch")
+    if not await guard.acquire(max_wait=QUOTE_DEADLINE):
+        logging.warning(f"1inch: Skipping quote request, provider {guard.breaker.state} or rate limited")
+        return None
+
     try:
-        # Create SSL context with certifi certificates
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.get(url, headers={
-                'Authorization': f'Bearer {api_key}',
-                'Accept': 'application/json'
-            }, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data
-                else:
-                    error_text = await response.text()
-                    logging.error(f"1inch API error: {response.status} - {error_text}")
-                    return None
+        session = get_session()
+        async with session.get(url, headers={
+            'Authorization': f'Bearer {api_key}',
+            'Accept': 'application/json'
+        }, params=params) as response:
+            guard.record_status(response.status)
+            if response.status == 200:
+                data = await response.json()
+                return data
+            else:
+                error_text = await response.text()
+                logging.error(f"1inch API error: {response.status} - {error_text}")
+                return None
+    except asyncio.CancelledError:
+        guard.breaker.release_probe()
+        raise
     except Exception as e:
+        guard.record_failure()
         logging.error(f"Error in 1inch API request: {str(e)}")
         return None
 
+background_tasks = set()
+
+def start_background_tasks(loop):
+    """Start optional background refreshers on the given event loop"""
+    if PRICE_STREAMER_ENABLED:
+        price_streamer.start(loop)
+    if DEX_RPC_URL:
+        # Keep a reference so the task isn't collected while still running
+        loop.call_soon_threadsafe(lambda: background_tasks.add(loop.create_task(load_local_pools(loop))))
+
 if __name__ == "__main__":
+    start_background_tasks(get_event_loop())
     app.run()
@@ -0,0 +1,221 @@
+"""Lightweight in-process metrics exposed in Prometheus text format.
+
+Counters, gauges and histograms are plain dicts keyed by label values, so
+recording on the hot path is a dict lookup and an addition. Every outbound
+aiohttp request is timed through a TraceConfig attached to the shared
+session, so upstream calls need no per-call instrumentation.
+"""
+import bisect
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import aiohttp
+
+# Fraction of structured log events that are actually written
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        with _lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        return [(self.name, self.labels, key, value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *label_values, value):
+        with _lock:
+            self.values[label_values] = value
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, *label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            state = self.values.get(label_values)
+            if state is None:
+                state = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        samples = []
+        for key, state in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", self.labels + ("le",), key + (repr(bound),), cumulative))
+            samples.append((f"{self.name}_bucket", self.labels + ("le",), key + ("+Inf",), state[-1]))
+            samples.append((f"{self.name}_sum", self.labels, key, state[-2]))
+            samples.append((f"{self.name}_count", self.labels, key, state[-1]))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """collector() returns [(name, kind, help, label_names, {label values: value})] at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            with _lock:
+                samples = metric.samples()
+            for name, label_names, label_values, value in samples:
+                lines.append(f"{name}{_format_labels(label_names, label_values)} {value}")
+        for collector in self.collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                logging.error(f"Metrics collector failed: {str(e)}")
+                continue
+            for name, kind, help_text, label_names, values in collected:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for label_values, value in values.items():
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(label_names, label_values)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Latency of handled HTTP requests", ("route", "method", "status")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("route",)))
+upstream_request_duration = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Latency of outbound calls until response headers", ("provider", "operation", "method")))
+upstream_errors = registry.register(Counter(
+    "upstream_errors_total", "Outbound calls that failed or returned an error status", ("provider", "operation", "reason")))
+
+
+# (base URL, provider label), most recently registered first
+_upstreams = [("https://api.1inch.dev", "1inch"), ("https://api.coingecko.com", "coingecko")]
+
+
+def register_upstream(provider, base_url):
+    """Label calls under base_url as provider, e.g. when it points at a mock server"""
+    _upstreams.insert(0, (base_url.rstrip("/"), provider))
+
+
+def classify_upstream(url):
+    """Map an outbound URL to (provider, operation) labels"""
+    host = url.host or ""
+    path = url.path
+    text = str(url)
+    for base, provider in _upstreams:
+        if text.startswith(base + "/"):
+            if provider == "1inch":
+                path = text[len(base):].split("?", 1)[0]
+                for prefix, operation in (("/price/", "price"), ("/swap/", "quote"), ("/gas-price/", "gas_price")):
+                    if path.startswith(prefix):
+                        return provider, operation
+                return provider, "other"
+            return provider, "price"
+    if path.endswith("/chat/completions"):
+        return "openrouter" if "openrouter" in host else host, "completion"
+    return host, path.rsplit("/", 1)[-1] or "root"
+
+
+async def _on_request_start(session, context, params):
+    context.started = time.perf_counter()
+
+
+async def _on_request_end(session, context, params):
+    provider, operation = classify_upstream(params.url)
+    upstream_request_duration.observe(provider, operation, params.method, value=time.perf_counter() - context.started)
+    if params.response.status >= 400:
+        upstream_errors.inc(provider, operation, str(params.response.status))
+
+
+async def _on_request_exception(session, context, params):
+    provider, operation = classify_upstream(params.url)
+    upstream_request_duration.observe(provider, operation, params.method, value=time.perf_counter() - context.started)
+    upstream_errors.inc(provider, operation, type(params.exception).__name__)
+
+
+def upstream_trace_config():
+    """TraceConfig timing every request made through a ClientSession"""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
+
+
+class RequestTimer:
+    """Tracks one inbound HTTP request for the route histogram and in-flight gauge"""
+    __slots__ = ("route", "method", "started")
+
+    def __init__(self, route, method):
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        http_requests_in_flight.inc(route)
+
+    def finish(self, status):
+        http_requests_in_flight.dec(self.route)
+        http_request_duration.observe(self.route, self.method, str(status), value=time.perf_counter() - self.started)
+
+
+def log_sampled(event, sample_rate=None, **fields):
+    """Write a structured (JSON) log line for a fraction of calls"""
+    rate = LOG_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1.0 and random.random() >= rate:
+        return
+    logging.info(json.dumps({"event": event, **fields}, default=str))
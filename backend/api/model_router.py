@@ -0,0 +1,240 @@
+"""Choosing which LLM answers each prompt, with deadlines and failover.
+
+Each prompt type has its own list of candidate models. Swap extraction
+defaults to a cheap, fast model, and answers to a configurable one. Every
+model keeps a rolling window of its call latencies and outcomes, plus a
+circuit breaker (see resilience.py).
+
+A call works as follows:
+- The model the caller asked for is tried first.
+- The other candidates follow, healthy ones ordered by rolling latency.
+  Models whose error rate is above MODEL_ROUTER_MAX_ERROR_RATE go last, and
+  models with an open breaker are skipped.
+- Each attempt gets the prompt type's deadline. A model that stalls or
+  errors is recorded as failed, and the next candidate is tried, up to
+  MODEL_ROUTER_MAX_ATTEMPTS models.
+
+Models that have not been measured yet sort first, so every candidate gets
+a latency before the router starts preferring one.
+
+Candidates are configured per prompt type as comma-separated lists:
+MODEL_ROUTER_EXTRACTION_MODELS, MODEL_ROUTER_ANSWER_MODELS and
+MODEL_ROUTER_TRADE_MODELS. A prompt type with no list uses only the
+requested model.
+
+Clients may only ask for allowlisted models: the configured candidates, the
+default model and MODEL_ROUTER_ALLOWED_MODELS. Any other requested model is
+ignored and the prompt type's candidates answer instead. That also bounds
+the per-model health entries and metric labels to the allowlist.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from resilience import CircuitBreaker
+
+MODEL_ROUTER_WINDOW = int(os.getenv("MODEL_ROUTER_WINDOW", "50"))
+MODEL_ROUTER_MAX_ATTEMPTS = int(os.getenv("MODEL_ROUTER_MAX_ATTEMPTS", "3"))
+MODEL_ROUTER_MAX_ERROR_RATE = float(os.getenv("MODEL_ROUTER_MAX_ERROR_RATE", "0.5"))
+MODEL_ROUTER_BREAKER_THRESHOLD = int(os.getenv("MODEL_ROUTER_BREAKER_THRESHOLD", "3"))
+MODEL_ROUTER_BREAKER_RESET = float(os.getenv("MODEL_ROUTER_BREAKER_RESET", "30"))
+
+# Per-attempt deadline in seconds per prompt type; for streams it bounds the wait for the first chunk
+MODEL_ROUTER_DEADLINES = {
+    "swap_extraction": float(os.getenv("MODEL_ROUTER_EXTRACTION_DEADLINE", "8")),
+    "answer": float(os.getenv("MODEL_ROUTER_ANSWER_DEADLINE", "30")),
+    "trade_decision": float(os.getenv("MODEL_ROUTER_TRADE_DEADLINE", "20")),
+}
+MODEL_ROUTER_DEFAULT_DEADLINE = float(os.getenv("MODEL_ROUTER_DEFAULT_DEADLINE", "30"))
+
+
+class ModelCallError(Exception):
+    """A model answered with an error instead of a completion"""
+
+
+class NoModelAvailable(Exception):
+    """Every candidate model failed or was skipped"""
+
+
+def _models_from_env(name, default=""):
+    return [model.strip() for model in os.getenv(name, default).split(",") if model.strip()]
+
+
+class ModelHealth:
+    def __init__(self, model, window=MODEL_ROUTER_WINDOW, failure_threshold=MODEL_ROUTER_BREAKER_THRESHOLD,
+                 reset_timeout=MODEL_ROUTER_BREAKER_RESET):
+        self.model = model
+        self.latencies = deque(maxlen=window)  # seconds, successful calls only
+        self.outcomes = deque(maxlen=window)  # True for success
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.calls = {"success": 0, "timeout": 0, "error": 0}
+
+    def latency(self):
+        """Rolling mean latency in seconds, None until measured"""
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+    def error_rate(self):
+        return 1 - sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    def record_success(self, elapsed):
+        self.latencies.append(elapsed)
+        self.outcomes.append(True)
+        self.calls["success"] += 1
+        self.breaker.record_success()
+
+    def record_failure(self, outcome):
+        self.outcomes.append(False)
+        self.calls[outcome] += 1
+        self.breaker.record_failure()
+
+    def stats(self):
+        latency = self.latency()
+        return {
+            "latency_ms": latency * 1000 if latency is not None else None,
+            "error_rate": self.error_rate(),
+            "state": self.breaker.state,
+            "calls": dict(self.calls),
+        }
+
+
+class ModelRouter:
+    def __init__(self, routes, deadlines=None, max_attempts=MODEL_ROUTER_MAX_ATTEMPTS,
+                 max_error_rate=MODEL_ROUTER_MAX_ERROR_RATE, allowed_models=()):
+        """routes: {prompt type: [candidate models in preference order]}.
+
+        Requested models must be in a route or in allowed_models.
+        """
+        self.routes = {prompt_type: list(models) for prompt_type, models in routes.items()}
+        self.allowed_models = set(allowed_models).union(*self.routes.values())
+        self.deadlines = dict(MODEL_ROUTER_DEADLINES if deadlines is None else deadlines)
+        self.max_attempts = max_attempts
+        self.max_error_rate = max_error_rate
+        self.health = {}
+        self.decisions = {}  # (prompt type, model, "primary" | "failover") -> count
+        self.skipped = {}  # model -> attempts skipped because its breaker was open
+        self.rejected = 0  # requests for models outside the allowlist
+        self.exhausted = 0
+
+    @classmethod
+    def from_env(cls, default_model):
+        return cls({
+            "swap_extraction": _models_from_env("MODEL_ROUTER_EXTRACTION_MODELS", default_model),
+            "answer": _models_from_env("MODEL_ROUTER_ANSWER_MODELS", default_model),
+            "trade_decision": _models_from_env("MODEL_ROUTER_TRADE_MODELS"),
+        }, allowed_models=[default_model] + _models_from_env("MODEL_ROUTER_ALLOWED_MODELS"))
+
+    def is_allowed(self, model):
+        return model in self.allowed_models
+
+    def _health(self, model):
+        health = self.health.get(model)
+        if health is None:
+            health = self.health[model] = ModelHealth(model)
+        return health
+
+    def deadline(self, prompt_type):
+        return self.deadlines.get(prompt_type, MODEL_ROUTER_DEFAULT_DEADLINE)
+
+    def models(self, prompt_type, model=None):
+        """Every model a call could be routed to, preferred first; unlike candidates() it counts nothing"""
+        route = self.routes.get(prompt_type, [])
+        if model and self.is_allowed(model):
+            return [model] + [m for m in route if m != model]
+        return list(route)
+
+    def candidates(self, prompt_type, model=None):
+        """Models to try in order: the requested one, then healthy candidates fastest first.
+
+        Models with an open breaker are left out before the list is cut to
+        max_attempts, so they don't use up attempts the others could have.
+        """
+        if model and not self.is_allowed(model):
+            self.rejected += 1
+            logging.warning(f"Model router: {model} is not allowlisted, using the {prompt_type} candidates")
+            model = None
+        others = [m for m in self.routes.get(prompt_type, []) if m != model]
+
+        def rank(m):
+            health = self._health(m)
+            latency = health.latency()
+            return (health.error_rate() > self.max_error_rate, latency if latency is not None else 0.0)
+
+        # sorted() is stable, so the configured order breaks ties
+        ordered = ([model] if model else []) + sorted(others, key=rank)
+        available = [m for m in ordered if self._health(m).breaker.available()]
+        self._count_skipped(m for m in ordered if m not in available)
+        return available[:self.max_attempts]
+
+    def _count_skipped(self, models):
+        for model in models:
+            self.skipped[model] = self.skipped.get(model, 0) + 1
+
+    def _count(self, prompt_type, model, kind):
+        key = (prompt_type, model, kind)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def begin(self, prompt_type, model, attempt):
+        """Reserve an attempt on model; False means skip it because its breaker is open"""
+        health = self._health(model)
+        if not health.breaker.allow():
+            self._count_skipped([model])
+            return False
+        self._count(prompt_type, model, "failover" if attempt else "primary")
+        return True
+
+    def record_success(self, model, elapsed):
+        self._health(model).record_success(elapsed)
+
+    def record_failure(self, prompt_type, model, outcome, error=None):
+        self._health(model).record_failure(outcome)
+        logging.warning(f"Model router: {model} {outcome} on {prompt_type}{': ' + str(error) if error else ''}")
+
+    def cancel(self, model):
+        """The caller went away mid-call; the outcome says nothing about the model"""
+        self._health(model).breaker.release_probe()
+
+    async def call(self, prompt_type, call, model=None):
+        """Run call(model) -> reply on the best candidate, failing over on errors and deadline misses"""
+        deadline = self.deadline(prompt_type)
+        attempt = 0
+        last_error = None
+        for candidate in self.candidates(prompt_type, model):
+            if not self.begin(prompt_type, candidate, attempt):
+                continue
+            attempt += 1
+            started = time.perf_counter()
+            try:
+                reply = await asyncio.wait_for(call(candidate), deadline)
+            except asyncio.TimeoutError:
+                last_error = f"{candidate} timed out after {deadline:g}s"
+                self.record_failure(prompt_type, candidate, "timeout")
+                continue
+            except asyncio.CancelledError:
+                self.cancel(candidate)
+                raise
+            except Exception as e:
+                last_error = str(e)
+                self.record_failure(prompt_type, candidate, "error", e)
+                continue
+            self.record_success(candidate, time.perf_counter() - started)
+            return reply
+
+        self.exhausted += 1
+        raise NoModelAvailable(last_error or f"No model available for {prompt_type}")
+
+    def stats(self):
+        decisions = {}
+        for (prompt_type, model, kind), count in self.decisions.items():
+            decisions.setdefault(prompt_type, {}).setdefault(model, {})[kind] = count
+        return {
+            "routes": self.routes,
+            "allowed_models": sorted(self.allowed_models),
+            "deadlines": self.deadlines,
+            "models": {model: health.stats() for model, health in self.health.items()},
+            "decisions": decisions,
+            "skipped_open": dict(self.skipped),
+            "rejected_models": self.rejected,
+            "exhausted": self.exhausted,
+        }
@@ -0,0 +1,105 @@
+"""Holdings of many portfolios as one dense matrix, valued and ranked in bulk.
+
+Row i holds the token amounts of portfolio i. The columns follow the token
+registry order, so a {symbol: price} snapshot becomes a single price vector
+and one valuation tick is one matrix-vector product (holdings @ prices),
+whatever the number of agents or holdings. Trades only touch two cells.
+
+The leaderboard is a sorted index of rows by value that is carried across
+ticks. Prices move a little between ticks, so the previous order is nearly
+sorted, and re-sorting it with a stable sort (timsort) takes close to
+linear time. Ranking thousands of portfolios every second therefore needs
+neither per-holding Python loops nor price lookups.
+"""
+import numpy as np
+
+
+class PortfolioBook:
+    def __init__(self, symbols, capacity=64):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.columns = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.holdings = np.zeros((capacity, len(self.symbols)))
+        self.values = np.zeros(capacity)
+        self.names = []
+        self.rows = {}
+        self.order = np.empty(0, dtype=np.intp)  # rows by value, highest first
+        self.valuations = 0
+        self._dirty = False
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, holdings=None):
+        """Add a portfolio and return its row"""
+        if name in self.rows:
+            raise ValueError(f"Portfolio {name!r} already exists")
+        row = len(self.names)
+        if row == len(self.holdings):
+            self.holdings = np.concatenate([self.holdings, np.zeros_like(self.holdings)])
+            self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+        for symbol, amount in (holdings or {}).items():
+            self.holdings[row, self.column(symbol)] = float(amount)
+        self.names.append(name)
+        self.rows[name] = row
+        self.order = np.append(self.order, row)
+        self._dirty = True
+        return row
+
+    def column(self, symbol):
+        column = self.columns.get(symbol.upper())
+        if column is None:
+            raise ValueError(f"Unknown token {symbol}")
+        return column
+
+    def amount(self, row, symbol):
+        column = self.columns.get(symbol.upper())
+        return float(self.holdings[row, column]) if column is not None else 0.0
+
+    def holdings_of(self, row):
+        """Non-zero holdings of one portfolio as {symbol: amount}"""
+        columns = np.flatnonzero(self.holdings[row])
+        return {self.symbols[column]: float(self.holdings[row, column]) for column in columns}
+
+    def transfer(self, row, from_symbol, from_amount, to_symbol, to_amount):
+        """Swap from_amount of one token for to_amount of another in one portfolio"""
+        from_column, to_column = self.column(from_symbol), self.column(to_symbol)
+        self.holdings[row, from_column] = max(self.holdings[row, from_column] - from_amount, 0.0)
+        self.holdings[row, to_column] += to_amount
+
+    def price_vector(self, prices):
+        """{symbol: price} as a vector in column order; unpriced tokens count as 0"""
+        vector = np.zeros(len(self.symbols))
+        for symbol, price in prices.items():
+            column = self.columns.get(symbol.upper())
+            if column is not None and price is not None:
+                vector[column] = price
+        return vector
+
+    def value(self, price_vector):
+        """Value every portfolio at once and return the per-row values"""
+        count = len(self.names)
+        np.matmul(self.holdings[:count], price_vector, out=self.values[:count])
+        self.valuations += 1
+        self._dirty = True
+        return self.values[:count]
+
+    def ranking(self):
+        """Rows ordered by value, highest first"""
+        if self._dirty:
+            # Stable sort of the previous order: near-linear when only a few ranks changed
+            self.order = self.order[np.argsort(-self.values[self.order], kind="stable")]
+            self._dirty = False
+        return self.order
+
+    def top(self, limit=None):
+        """(name, value) of the best portfolios, best first"""
+        order = self.ranking()
+        if limit is not None:
+            order = order[:limit]
+        return [(self.names[row], float(self.values[row])) for row in order]
+
+    def ranks(self):
+        """1-based rank of every row"""
+        ranks = np.empty(len(self.names), dtype=np.intp)
+        ranks[self.ranking()] = np.arange(1, len(self.names) + 1)
+        return ranks
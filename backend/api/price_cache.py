@@ -0,0 +1,151 @@
+"""In-memory TTL price cache with stale-while-revalidate and request coalescing.
+
+Entries younger than `ttl` are served directly. Entries older than that but
+within `stale_ttl` are still served, while a single background refresh is
+started. Concurrent misses for the same key share one upstream call, and the
+cache is bounded with LRU eviction.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "15"))
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "120"))
+PRICE_CACHE_MAX_SIZE = int(os.getenv("PRICE_CACHE_MAX_SIZE", "1024"))
+
+
+class PriceCache:
+    def __init__(self, ttl=PRICE_CACHE_TTL, stale_ttl=PRICE_CACHE_STALE_TTL, max_size=PRICE_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._inflight = {}  # key -> asyncio.Future shared by concurrent callers
+        self._refresh_tasks = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        """Return (value, is_stale) for a usable entry or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, fetched_at = entry
+        age = time.monotonic() - fetched_at
+        if age < self.ttl:
+            self._entries.move_to_end(key)
+            return value, False
+        if age < self.ttl + self.stale_ttl:
+            self._entries.move_to_end(key)
+            return value, True
+        del self._entries[key]
+        return None
+
+    def _store(self, key, value):
+        if value is None:
+            return
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _load_many(self, keys, batch_loader):
+        """Fetch keys in one upstream call, sharing in-flight futures"""
+        loop = asyncio.get_running_loop()
+        waiting = {}
+        to_fetch = []
+        for key in keys:
+            if key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            elif key not in waiting:
+                future = loop.create_future()
+                self._inflight[key] = future
+                waiting[key] = future
+                to_fetch.append(key)
+
+        if to_fetch:
+            self.upstream_calls += 1
+            fetched = {}
+            try:
+                fetched = await batch_loader(to_fetch) or {}
+            except Exception as e:
+                logging.error(f"Price cache: upstream fetch failed for {to_fetch}: {str(e)}")
+            finally:
+                # Always release waiters, even if the fetch was cancelled
+                for key in to_fetch:
+                    value = fetched.get(key)
+                    self._store(key, value)
+                    future = self._inflight.pop(key, None)
+                    if future is not None and not future.done():
+                        future.set_result(value)
+
+        return {key: await future for key, future in waiting.items()}
+
+    def _refresh_in_background(self, keys, batch_loader):
+        keys = [key for key in keys if key not in self._inflight]
+        if not keys:
+            return
+        task = asyncio.ensure_future(self._load_many(keys, batch_loader))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def get(self, key, loader):
+        """Get one value; loader is a coroutine function fetching it upstream"""
+        async def batch_loader(keys):
+            return {keys[0]: await loader()}
+
+        result = await self.get_many([key], batch_loader)
+        return result.get(key)
+
+    async def get_many(self, keys, batch_loader):
+        """Get several values; batch_loader(keys) returns a {key: value} dict"""
+        prices = {}
+        stale = []
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached = self._lookup(key)
+            if cached is None:
+                self.misses += 1
+                missing.append(key)
+                continue
+            value, is_stale = cached
+            prices[key] = value
+            if is_stale:
+                self.stale_hits += 1
+                stale.append(key)
+            else:
+                self.hits += 1
+
+        if stale:
+            self._refresh_in_background(stale, batch_loader)
+        if missing:
+            fetched = await self._load_many(missing, batch_loader)
+            prices.update({key: value for key, value in fetched.items() if value is not None})
+        return prices
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else None,
+        }
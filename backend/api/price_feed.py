@@ -0,0 +1,154 @@
+"""Shared price/quote feed fanned out to many streaming clients.
+
+One refresher task polls upstream once per tick for the union of everything
+subscribed (one batched price lookup plus one quote per distinct pair) and
+pushes only the values that changed to each subscriber's queue. N connected
+clients therefore cost one upstream fetch per tick instead of N.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+PRICE_FEED_INTERVAL = float(os.getenv("PRICE_FEED_INTERVAL", "5"))
+PRICE_FEED_QUEUE_SIZE = int(os.getenv("PRICE_FEED_QUEUE_SIZE", "32"))
+PRICE_FEED_HEARTBEAT = float(os.getenv("PRICE_FEED_HEARTBEAT", "15"))
+
+
+def parse_pair(pair):
+    """Parse 'FROM:TO[:AMOUNT]' into a normalized (from, to, amount) key"""
+    parts = pair.split(":")
+    if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+        raise ValueError(f"Invalid pair: {pair}")
+    amount = float(parts[2]) if len(parts) == 3 else 1.0
+    return parts[0].upper(), parts[1].upper(), amount
+
+
+def pair_name(pair_key):
+    from_token, to_token, amount = pair_key
+    return f"{from_token}:{to_token}:{amount:g}"
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    def __init__(self, feed, symbols, pairs):
+        self.feed = feed
+        self.symbols = set(symbols)
+        self.pairs = set(pairs)
+        self.queue = asyncio.Queue(maxsize=PRICE_FEED_QUEUE_SIZE)
+        self.dropped = 0
+
+    def push(self, event, data):
+        # A slow client drops its oldest update rather than blocking the feed
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait((event, data))
+
+    async def next_event(self, timeout=PRICE_FEED_HEARTBEAT):
+        """Wait for the next (event, data) update, or None on heartbeat timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+class PriceFeed:
+    def __init__(self, get_prices, get_quote, interval=PRICE_FEED_INTERVAL):
+        """get_prices(symbols) -> {symbol: price}; get_quote(from, to, amount) -> dict or None"""
+        self.get_prices = get_prices
+        self.get_quote = get_quote
+        self.interval = interval
+        self.subscribers = set()
+        self.prices = {}
+        self.quotes = {}
+        self.ticks = 0
+        self._task = None
+
+    def subscribe(self, symbols=(), pairs=()):
+        """Register a client; it immediately receives the latest known values"""
+        subscription = Subscription(self, [s.upper() for s in symbols], [parse_pair(p) for p in pairs])
+        self.subscribers.add(subscription)
+
+        known_prices = {s: self.prices[s] for s in subscription.symbols if s in self.prices}
+        if known_prices:
+            subscription.push("prices", known_prices)
+        for pair in subscription.pairs:
+            if pair in self.quotes:
+                subscription.push("quote", {"pair": pair_name(pair), "quote": self.quotes[pair]})
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    async def _fetch_quote(self, pair):
+        try:
+            return pair, await self.get_quote(*pair)
+        except Exception as e:
+            logging.error(f"Price feed: quote failed for {pair_name(pair)}: {str(e)}")
+            return pair, None
+
+    async def tick(self):
+        """Fetch everything subscribed once and push the changes"""
+        symbols = set().union(*(s.symbols for s in self.subscribers))
+        pairs = set().union(*(s.pairs for s in self.subscribers))
+
+        results = await asyncio.gather(
+            self.get_prices(sorted(symbols)) if symbols else asyncio.sleep(0, {}),
+            *(self._fetch_quote(pair) for pair in pairs),
+            return_exceptions=True,
+        )
+        prices, quotes = results[0], results[1:]
+        if isinstance(prices, Exception):
+            logging.error(f"Price feed: price refresh failed: {str(prices)}")
+            prices = {}
+
+        changed_prices = {s: p for s, p in (prices or {}).items() if self.prices.get(s) != p}
+        self.prices.update(changed_prices)
+
+        changed_quotes = {}
+        for result in quotes:
+            if isinstance(result, Exception):
+                continue
+            pair, quote = result
+            if quote is not None and self.quotes.get(pair) != quote:
+                self.quotes[pair] = quote
+                changed_quotes[pair] = quote
+
+        for subscription in list(self.subscribers):
+            deltas = {s: p for s, p in changed_prices.items() if s in subscription.symbols}
+            if deltas:
+                subscription.push("prices", deltas)
+            for pair in subscription.pairs:
+                if pair in changed_quotes:
+                    subscription.push("quote", {"pair": pair_name(pair), "quote": changed_quotes[pair]})
+        self.ticks += 1
+
+    async def _run(self):
+        # The refresher stops on its own once the last client disconnects
+        while self.subscribers:
+            started = time.monotonic()
+            try:
+                await self.tick()
+            except Exception as e:
+                logging.error(f"Price feed: tick failed: {str(e)}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "ticks": self.ticks,
+            "interval": self.interval,
+            "symbols": sorted(self.prices),
+            "pairs": [pair_name(pair) for pair in self.quotes],
+        }
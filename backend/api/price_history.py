@@ -0,0 +1,258 @@
+"""Append-only on-disk history of every fetched price.
+
+Each tick is a fixed-width 17 byte record (float64 unix time, float64 USD
+price, uint8 source code) appended to PRICE_HISTORY_DIR/<SYMBOL>/<YYYY-MM-DD>.ticks.
+Whole records are appended with one write, so a reader never sees a
+misaligned file and several workers can share a directory. That is why the
+fields share one record file rather than one file per field: separate
+column files could not be appended or merged atomically together. Reads
+memory-map the day files; the timestamp, price and source columns of a range
+are numpy views into the mapping, so nothing is copied until a range spans
+several days. One tick per second for a token is about 1.4 MB per day.
+
+Every day file is kept sorted by time, which range queries rely on
+(searchsorted). A flush sorts its buffered ticks and appends them when they
+all come after the file's last tick. Late ticks, e.g. from another worker,
+are merged in instead: the file is rewritten to a temporary file and moved
+into place. Writers to one symbol hold a lock file while they do this.
+Cached mappings are reopened when their file changes size or is replaced.
+
+Recording is disabled unless PRICE_HISTORY_DIR is set. Ticks are buffered and
+written every PRICE_HISTORY_FLUSH_INTERVAL seconds; inside the event loop the
+write happens on a worker thread. record() only waits for the buffer swap,
+never for a write.
+"""
+import asyncio
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one writer process is supported
+    fcntl = None
+
+PRICE_HISTORY_DIR = os.getenv("PRICE_HISTORY_DIR", "")
+PRICE_HISTORY_FLUSH_INTERVAL = float(os.getenv("PRICE_HISTORY_FLUSH_INTERVAL", "1.0"))
+PRICE_HISTORY_MAX_BUFFER = int(os.getenv("PRICE_HISTORY_MAX_BUFFER", "10000"))
+
+TICK_DTYPE = np.dtype([("ts", "<f8"), ("price", "<f8"), ("source", "u1")])
+
+# Stored as one byte per tick; unknown sources are recorded as 0
+SOURCE_CODES = {"unknown": 0, "1inch": 1, "CoinGecko": 2, "replay": 3}
+SOURCE_NAMES = {code: name for name, code in SOURCE_CODES.items()}
+
+SECONDS_PER_DAY = 86400
+_SYMBOL_RE = re.compile(r"^[A-Z0-9][A-Z0-9_-]*$")
+
+
+def _day(ts):
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+class PriceHistory:
+    def __init__(self, directory=PRICE_HISTORY_DIR, flush_interval=PRICE_HISTORY_FLUSH_INTERVAL,
+                 max_buffer=PRICE_HISTORY_MAX_BUFFER, max_open_segments=64):
+        self.directory = directory
+        self.enabled = bool(directory)
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.max_open_segments = max_open_segments
+        self._buffer = {}  # (symbol, day) -> [(ts, price, source code)]
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()  # guards the buffer only
+        self._write_lock = threading.Lock()  # one flush writes at a time, in buffer order
+        self._segments = OrderedDict()  # path -> (memmap, (size, inode) it was opened at)
+        self._segments_lock = threading.Lock()  # queries run on worker threads
+        self._flushing = None  # background flush in progress, if any
+        self.recorded = 0
+        self.flushes = 0
+        self.merges = 0
+        self.write_errors = 0
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    def record(self, source, prices, ts=None):
+        """Buffer {SYMBOL: price} seen from source at ts (default now)"""
+        if not self.enabled or not prices:
+            return
+        ts = time.time() if ts is None else ts
+        code = SOURCE_CODES.get(source, 0)
+        day = _day(ts)
+        with self._lock:
+            for symbol, price in prices.items():
+                if price is None:
+                    continue
+                self._buffer.setdefault((symbol.upper(), day), []).append((ts, float(price), code))
+                self._buffered += 1
+                self.recorded += 1
+            due = self._buffered >= self.max_buffer or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Flush on a worker thread when called from the event loop, inline otherwise"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flushing is None or self._flushing.done():
+            self._flushing = asyncio.ensure_future(asyncio.to_thread(self.flush))
+
+    def _path(self, symbol, day):
+        return os.path.join(self.directory, symbol, f"{day}.ticks")
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, {}
+                self._buffered = 0
+                self._last_flush = time.monotonic()
+            if not buffer:
+                return
+            for (symbol, day), rows in buffer.items():
+                path = self._path(symbol, day)
+                ticks = np.array(rows, dtype=TICK_DTYPE)
+                ticks = ticks[np.argsort(ticks["ts"], kind="stable")]
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with self._file_lock(symbol):
+                        self._write(path, ticks)
+                except OSError as e:
+                    self.write_errors += 1
+                    logging.error(f"Price history: can't append to {path}: {str(e)}")
+            self.flushes += 1
+
+    def _file_lock(self, symbol):
+        """Exclusive lock on a symbol's directory, shared with other worker processes"""
+        return _FileLock(os.path.join(self.directory, symbol, ".lock"))
+
+    def _write(self, path, ticks):
+        """Add sorted ticks to a day file, keeping the file sorted"""
+        with open(path, "ab+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size >= TICK_DTYPE.itemsize:
+                f.seek(size - size % TICK_DTYPE.itemsize - TICK_DTYPE.itemsize)
+                last_ts = np.frombuffer(f.read(TICK_DTYPE.itemsize), dtype=TICK_DTYPE)["ts"][0]
+            else:
+                last_ts = -np.inf
+            if ticks["ts"][0] >= last_ts:
+                f.write(ticks.tobytes())
+                return
+            f.seek(0)
+            existing = np.frombuffer(f.read(size - size % TICK_DTYPE.itemsize), dtype=TICK_DTYPE)
+        # Out of order: merge and swap the file, so open mappings keep their old, consistent view
+        merged = np.concatenate([existing, ticks])
+        merged = merged[np.argsort(merged["ts"], kind="stable")]
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(merged.tobytes())
+        os.replace(tmp_path, path)
+        self.merges += 1
+
+    def _segment(self, symbol, day):
+        path = self._path(symbol, day)
+        with self._segments_lock:
+            return self._open_segment(path)
+
+    def _open_segment(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._segments.pop(path, None)
+            return None
+        version = (stat.st_size, stat.st_ino)
+        cached = self._segments.get(path)
+        if cached is not None and cached[1] == version:
+            self._segments.move_to_end(path)
+            return cached[0]
+        count = stat.st_size // TICK_DTYPE.itemsize
+        if count == 0:
+            return None
+        segment = np.memmap(path, dtype=TICK_DTYPE, mode="r", shape=(count,))
+        # Reused until the file grows or is replaced by a merge
+        self._segments[path] = (segment, version)
+        self._segments.move_to_end(path)
+        while len(self._segments) > self.max_open_segments:
+            self._segments.popitem(last=False)
+        return segment
+
+    def query_segments(self, symbol, start, end):
+        """Yield per-day tick arrays with start <= ts < end, as views into the mapped files"""
+        symbol = symbol.upper()
+        if not _SYMBOL_RE.match(symbol):
+            raise ValueError(f"Invalid symbol {symbol!r}")
+        if end <= start:
+            return
+        self.flush()
+        day_start = start - start % SECONDS_PER_DAY
+        while day_start < end:
+            segment = self._segment(symbol, _day(day_start))
+            day_start += SECONDS_PER_DAY
+            if segment is None:
+                continue
+            timestamps = segment["ts"]
+            lo = np.searchsorted(timestamps, start, side="left")
+            hi = np.searchsorted(timestamps, end, side="left")
+            if hi > lo:
+                yield segment[lo:hi]
+
+    def query(self, symbol, start, end):
+        """Ticks for symbol in [start, end) as one structured array (fields ts, price, source).
+
+        Within one day the result is a view of the memory-mapped file; ranges
+        spanning several days are concatenated into a new array. This touches
+        the disk, so async callers should run it with asyncio.to_thread.
+        """
+        segments = list(self.query_segments(symbol, start, end))
+        if not segments:
+            return np.empty(0, dtype=TICK_DTYPE)
+        if len(segments) == 1:
+            return segments[0]
+        return np.concatenate(segments)
+
+    def symbols(self):
+        if not self.enabled:
+            return []
+        return sorted(name for name in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, name)))
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "directory": self.directory or None,
+            "recorded": self.recorded,
+            "buffered": self._buffered,
+            "flushes": self.flushes,
+            "merges": self.merges,
+            "write_errors": self.write_errors,
+            "open_segments": len(self._segments),
+        }
+
+
+class _FileLock:
+    __slots__ = ("path", "_file")
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, "a")
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
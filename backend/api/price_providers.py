@@ -0,0 +1,167 @@
+"""Price provider wrappers with per-provider timeouts and hedged fetching.
+
+hedged_fetch queries a primary and a secondary provider for a batch of
+symbols. Depending on the hedge delay it behaves as:
+
+- None: plain fallback, the secondary only asks for what the primary missed
+- 0: race, both providers start at once
+- > 0: hedge, the secondary starts once the primary is slower than the delay
+
+The first answer per symbol wins and the slower request is cancelled once
+every symbol has a price. A primary whose circuit breaker is open or whose
+rate limit is exhausted is skipped, so the secondary answers straight away.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+PRICE_FETCH_MODES = ("fallback", "race", "hedge")
+PRICE_FETCH_MODE = os.getenv("PRICE_FETCH_MODE", "fallback").lower()
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "90"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "0.3"))
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies (seconds)"""
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class PriceProvider:
+    def __init__(self, name, fetch_many, supports, timeout, fetch_one=None, guard=None, on_prices=None):
+        """
+        fetch_many(symbols) -> {SYMBOL: price}; fetch_one(symbol) -> price or None
+        is used instead for single-symbol lookups when given; supports(symbol)
+        tells whether the provider has a mapping for the symbol. guard is the
+        provider's resilience.ProviderGuard (rate limit and circuit breaker).
+        on_prices(name, prices) is called with every successful answer.
+        """
+        self.name = name
+        self.fetch_many = fetch_many
+        self.fetch_one = fetch_one
+        self.supports = supports
+        self.timeout = timeout
+        self.guard = guard
+        self.on_prices = on_prices
+        self.latency = LatencyTracker()
+        self.timeouts = 0
+        self.skipped = 0
+
+    def available(self):
+        return self.guard is None or self.guard.available()
+
+    async def fetch(self, symbols):
+        """Fetch prices within the provider timeout; failures yield an empty dict"""
+        if self.guard is not None and not await self.guard.acquire():
+            self.skipped += 1
+            return {}
+        started = time.monotonic()
+        try:
+            if len(symbols) == 1 and self.fetch_one is not None:
+                price = await asyncio.wait_for(self.fetch_one(symbols[0]), self.timeout)
+                prices = {symbols[0]: price} if price is not None else {}
+            else:
+                prices = await asyncio.wait_for(self.fetch_many(symbols), self.timeout) or {}
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self._record(False)
+            logging.warning(f"{self.name}: price request timed out after {self.timeout}s")
+            return {}
+        except asyncio.CancelledError:
+            # Lost a race or hedge; says nothing about the provider's health
+            if self.guard is not None:
+                self.guard.breaker.release_probe()
+            raise
+        except Exception as e:
+            self._record(False)
+            logging.error(f"{self.name}: price request failed: {str(e)}")
+            return {}
+        self.latency.record(time.monotonic() - started)
+        # The fetch functions swallow HTTP errors, so an empty answer counts as a failure
+        self._record(bool(prices))
+        if prices and self.on_prices is not None:
+            self.on_prices(self.name, prices)
+        return prices
+
+    def _record(self, ok):
+        if self.guard is None:
+            return
+        if ok:
+            self.guard.record_success()
+        else:
+            self.guard.record_failure()
+
+    def hedge_delay(self):
+        delay = self.latency.percentile(HEDGE_PERCENTILE)
+        return delay if delay is not None else HEDGE_DEFAULT_DELAY
+
+
+def hedge_delay_for_mode(mode, primary):
+    if mode == "race":
+        return 0.0
+    if mode == "hedge":
+        return primary.hedge_delay()
+    return None
+
+
+async def hedged_fetch(symbols, primary, secondary, hedge_delay=None):
+    """Fetch symbols from primary and secondary, first answer per symbol wins"""
+    symbols = list(dict.fromkeys(symbols))
+    if not primary.available() and secondary.available():
+        logging.info(f"{primary.name} unavailable (circuit open or rate limited), using {secondary.name}")
+        primary, secondary = secondary, primary
+    prices = {}
+    tasks = set()
+
+    def merge(task):
+        for symbol, price in (task.result() or {}).items():
+            prices.setdefault(symbol, price)
+
+    def covered():
+        return all(symbol in prices for symbol in symbols)
+
+    # Only ask the primary for symbols it can price (e.g. 1inch skips other
+    # chains); the rest go to the secondary straight away
+    primary_symbols = [symbol for symbol in symbols if primary.supports(symbol)]
+    only_secondary = [symbol for symbol in symbols if symbol not in primary_symbols and secondary.supports(symbol)]
+    if only_secondary:
+        tasks.add(asyncio.ensure_future(secondary.fetch(only_secondary)))
+    primary_task = None
+    if primary_symbols:
+        primary_task = asyncio.ensure_future(primary.fetch(primary_symbols))
+        tasks.add(primary_task)
+    try:
+        if primary_task is not None and (hedge_delay is None or hedge_delay > 0):
+            done, _ = await asyncio.wait({primary_task}, timeout=hedge_delay)
+            if done:
+                merge(primary_task)
+                tasks.discard(primary_task)
+            if covered():
+                return prices
+
+        missing = [symbol for symbol in primary_symbols if symbol not in prices and secondary.supports(symbol)]
+        if missing:
+            if primary_task.done():
+                logging.info(f"Falling back to {secondary.name} for {len(missing)} tokens after {primary.name} failure")
+            tasks.add(asyncio.ensure_future(secondary.fetch(missing)))
+
+        while tasks and not covered():
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                merge(task)
+        return prices
+    finally:
+        for task in tasks:
+            task.cancel()
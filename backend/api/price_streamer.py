@@ -0,0 +1,108 @@
+"""Background price streamer keeping a hot snapshot of every mapped token.
+
+A single task refreshes all prices on a fixed interval (one batched upstream
+call per tick) and publishes an immutable snapshot. Readers only look at the
+current snapshot, so serving prices from it needs no network I/O.
+"""
+import asyncio
+import logging
+import os
+import time
+from types import MappingProxyType
+
+PRICE_STREAMER_ENABLED = os.getenv("PRICE_STREAMER_ENABLED", "false").lower() in ("1", "true", "yes")
+PRICE_STREAMER_INTERVAL = float(os.getenv("PRICE_STREAMER_INTERVAL", "10"))
+
+
+class PriceSnapshot:
+    """Read-only view of prices fetched in one refresh"""
+    __slots__ = ("prices", "source", "updated_at")
+
+    def __init__(self, prices, source, updated_at):
+        self.prices = MappingProxyType(dict(prices))
+        self.source = source
+        self.updated_at = updated_at
+
+    def age(self):
+        return time.time() - self.updated_at
+
+
+class PriceStreamer:
+    def __init__(self, fetch_prices, interval=PRICE_STREAMER_INTERVAL, max_age=None):
+        """fetch_prices is a coroutine function returning ({symbol: price}, source)"""
+        self.fetch_prices = fetch_prices
+        self.interval = interval
+        # Snapshots older than this are no longer served (e.g. upstream outage)
+        self.max_age = max_age if max_age is not None else interval * 3
+        self.snapshot = None
+        self.refreshes = 0
+        self.failures = 0
+        self._task = None
+
+    def start(self, loop):
+        """Schedule the refresh loop on the given event loop (thread-safe)"""
+        loop.call_soon_threadsafe(self._create_task)
+
+    def _create_task(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.get_loop().call_soon_threadsafe(self._task.cancel)
+            self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def refresh(self):
+        prices, source = await self.fetch_prices()
+        if prices:
+            self.snapshot = PriceSnapshot(prices, source, time.time())
+            self.refreshes += 1
+        else:
+            self.failures += 1
+            logging.warning("Price streamer: refresh returned no prices, keeping previous snapshot")
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.failures += 1
+                logging.error(f"Price streamer: refresh failed: {str(e)}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def current(self):
+        """Return the latest snapshot if it's fresh enough to serve, else None"""
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.age() > self.max_age:
+            return None
+        return snapshot
+
+    def lookup(self, symbols):
+        """Return {symbol: price} from the snapshot, or None unless every symbol is present"""
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+        prices = {}
+        for symbol in symbols:
+            price = snapshot.prices.get(symbol)
+            if price is None:
+                return None
+            prices[symbol] = price
+        return prices
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "tokens": len(snapshot.prices) if snapshot else 0,
+            "source": snapshot.source if snapshot else None,
+            "age": snapshot.age() if snapshot else None,
+        }
@@ -0,0 +1,222 @@
+"""Offline upstream backends: replayed market data and a stub LLM.
+
+With UPSTREAM_MODE=replay the app never calls 1inch, CoinGecko or
+OpenRouter. Prices come from a fixtures file (REPLAY_FIXTURES) and, for
+symbols it doesn't list, from the recorded price history. Quotes are
+computed from the replayed prices with each token's decimals, and the LLM is
+replaced by StubLLM, which answers swap extraction prompts with the local
+swap parser, tournament trade prompts with reproducible random trades and
+everything else with a canned reply.
+
+Replay time starts at the first fixture tick (or REPLAY_START) and runs
+REPLAY_SPEED times faster than wall time, looping over the recorded span so
+long load tests keep seeing moving prices. Prices still pass through the
+price cache, so lower PRICE_CACHE_TTL to follow fast replays closely.
+
+Fixtures format:
+
+    {"prices": {"ETH": 3500.0, "WBTC": [[1717000000, 67000.0], [1717000010, 67012.5]]},
+     "gas_price_wei": 20000000000, "estimated_gas": 180000}
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import random
+import re
+import time
+import zlib
+from decimal import Decimal
+
+from swap_parser import parse_swap_intent
+
+DEFAULT_REPLAY_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay_fixtures.json")
+REPLAY_FIXTURES = os.getenv("REPLAY_FIXTURES", DEFAULT_REPLAY_FIXTURES)
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))
+REPLAY_START = float(os.getenv("REPLAY_START", "0"))
+REPLAY_LOOP = os.getenv("REPLAY_LOOP", "true").lower() in ("1", "true", "yes")
+# How far back to look in the price history for the latest tick
+REPLAY_HISTORY_LOOKBACK = float(os.getenv("REPLAY_HISTORY_LOOKBACK", "3600"))
+REPLAY_LLM_LATENCY = float(os.getenv("REPLAY_LLM_LATENCY", "0"))
+
+DEFAULT_GAS_PRICE_WEI = 20 * 10 ** 9
+DEFAULT_ESTIMATED_GAS = 200000
+
+
+class ReplayClock:
+    """Replay time: start + elapsed wall time * speed, optionally looping over [start, end]"""
+
+    def __init__(self, start, end=None, speed=REPLAY_SPEED, loop=REPLAY_LOOP):
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.loop = loop
+        self.started = time.monotonic()
+
+    def now(self):
+        elapsed = (time.monotonic() - self.started) * self.speed
+        if self.loop and self.end is not None and self.end > self.start:
+            elapsed %= self.end - self.start
+        return self.start + elapsed
+
+
+class ReplayMarket:
+    def __init__(self, registry, fixtures_path=REPLAY_FIXTURES, history=None, start=REPLAY_START):
+        self.registry = registry
+        self.history = history
+        self.constants = {}  # SYMBOL -> price
+        self.series = {}  # SYMBOL -> ([ts...], [price...]) sorted by ts
+        self.gas_price_wei = DEFAULT_GAS_PRICE_WEI
+        self.estimated_gas = DEFAULT_ESTIMATED_GAS
+        self.prices_served = 0
+        self.quotes_served = 0
+        if fixtures_path:
+            self._load_fixtures(fixtures_path)
+
+        first = [ts[0] for ts, _ in self.series.values()]
+        last = [ts[-1] for ts, _ in self.series.values()]
+        start = start or (min(first) if first else time.time())
+        self.clock = ReplayClock(start, max(last) if last else None)
+
+    def _load_fixtures(self, path):
+        try:
+            with open(path) as f:
+                fixtures = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Replay: can't load fixtures {path}: {str(e)}")
+            return
+        for symbol, value in fixtures.get("prices", {}).items():
+            if isinstance(value, list):
+                ticks = sorted((float(ts), float(price)) for ts, price in value)
+                self.series[symbol.upper()] = ([ts for ts, _ in ticks], [price for _, price in ticks])
+            else:
+                self.constants[symbol.upper()] = float(value)
+        self.gas_price_wei = int(fixtures.get("gas_price_wei", self.gas_price_wei))
+        self.estimated_gas = int(fixtures.get("estimated_gas", self.estimated_gas))
+        logging.info(f"Replay: loaded {len(self.series)} price series and {len(self.constants)} fixed prices from {path}")
+
+    def price(self, symbol, at=None):
+        """Latest price at or before replay time `at` (default now), or None"""
+        symbol = symbol.upper()
+        at = self.clock.now() if at is None else at
+        series = self.series.get(symbol)
+        if series is not None:
+            timestamps, prices = series
+            index = bisect.bisect_right(timestamps, at) - 1
+            return prices[max(index, 0)]
+        if symbol in self.constants:
+            return self.constants[symbol]
+        if self.history is not None and self.history.enabled:
+            ticks = self.history.query(symbol, at - REPLAY_HISTORY_LOOKBACK, at + 1e-6)
+            if len(ticks):
+                return float(ticks["price"][-1])
+        return None
+
+    def supports(self, symbol):
+        return symbol.upper() in self.series or symbol.upper() in self.constants or (
+            self.history is not None and self.history.enabled and symbol in self.registry)
+
+    async def get_prices(self, symbols):
+        at = self.clock.now()
+        prices = {}
+        for symbol in symbols:
+            price = self.price(symbol, at)
+            if price is not None:
+                prices[symbol.upper()] = price
+        self.prices_served += len(prices)
+        return prices
+
+    async def get_price(self, symbol):
+        return self.price(symbol)
+
+    async def quote(self, from_token_address, to_token_address, amount_in_wei, chain_id):
+        """1inch-shaped quote at the replayed price ratio, or None when a price is missing"""
+        from_token = self.registry.by_address(from_token_address, chain_id)
+        to_token = self.registry.by_address(to_token_address, chain_id)
+        if from_token is None or to_token is None:
+            return None
+        at = self.clock.now()
+        from_price = self.price(from_token.symbol, at)
+        to_price = self.price(to_token.symbol, at)
+        if not from_price or not to_price:
+            return None
+        to_amount = from_token.from_wei(amount_in_wei) * Decimal(str(from_price)) / Decimal(str(to_price))
+        self.quotes_served += 1
+        return {
+            "fromToken": {"symbol": from_token.symbol, "address": from_token.address, "decimals": from_token.decimals},
+            "toToken": {"symbol": to_token.symbol, "address": to_token.address, "decimals": to_token.decimals},
+            "toAmount": str(to_token.to_wei(to_amount)),
+            "estimatedGas": self.estimated_gas,
+            "protocols": [],
+            "replay_time": at,
+        }
+
+    async def get_gas_price_wei(self):
+        return self.gas_price_wei
+
+    def stats(self):
+        return {
+            "replay_time": self.clock.now(),
+            "speed": self.clock.speed,
+            "series": len(self.series),
+            "fixed_prices": len(self.constants),
+            "prices_served": self.prices_served,
+            "quotes_served": self.quotes_served,
+        }
+
+
+_REQUEST_RE = re.compile(r"User's request: (.*?)\n\n", re.S)
+_QUESTION_RE = re.compile(r"Question: (.*?)\n\n", re.S)
+_SWAP_INFO_RE = re.compile(r"SWAP_INFO: (.*?)\n\n", re.S)
+_TOKENS_RE = re.compile(r"Tokens: (.*?)\n\n", re.S)
+_HOLDINGS_RE = re.compile(r"Holdings: (.*?)\n\n", re.S)
+
+
+class StubLLM:
+    """Deterministic stand-in for OpenRouter completions"""
+
+    def __init__(self, symbols, latency=REPLAY_LLM_LATENCY):
+        self.symbols = symbols
+        self.latency = latency
+        self.completions = 0
+
+    async def complete(self, prompt, model, prompt_type="answer"):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.completions += 1
+        if prompt_type == "trade_decision":
+            return self.trade_decision(prompt, model)
+        if prompt_type == "swap_extraction":
+            match = _REQUEST_RE.search(prompt)
+            info = parse_swap_intent(match.group(1) if match else prompt, self.symbols).to_swap_info()
+            return (f"TokenA: {info['inputToken']}, TokenB: {info['outputToken']}, "
+                    f"AmountA: {info['inputAmount']}, AmountB: {info['outputAmount']}")
+
+        question = _QUESTION_RE.search(prompt)
+        swap_info = _SWAP_INFO_RE.search(prompt)
+        reply = f"🤖 Stub answer from {model}.\n\n- Question: {question.group(1) if question else prompt[:200]}"
+        if swap_info:
+            reply += f"\n\nSWAP_INFO: {swap_info.group(1)}"
+        return reply
+
+    def trade_decision(self, prompt, model):
+        """Pseudo-random but reproducible tournament move: the same prompt and model always trade the same way"""
+        rng = random.Random(zlib.crc32(f"{model}\n{prompt}".encode()))
+        tokens = _TOKENS_RE.search(prompt)
+        holdings = _HOLDINGS_RE.search(prompt)
+        symbols = [s.strip() for s in tokens.group(1).split(",")] if tokens else []
+        held = [item.split("=")[0].strip() for item in holdings.group(1).split(",") if "=" in item] if holdings else []
+        if not held or len(symbols) < 2 or rng.random() < 0.3:
+            return "HOLD"
+        from_token = rng.choice(held)
+        to_token = rng.choice([s for s in symbols if s != from_token] or [from_token])
+        return f"SWAP {rng.choice((10, 25, 50, 100))}% {from_token} -> {to_token}"
+
+    async def stream(self, prompt, model):
+        """Yield the stub answer a few words at a time"""
+        reply = await self.complete(prompt, model)
+        words = reply.split(" ")
+        for i in range(0, len(words), 4):
+            yield " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+            await asyncio.sleep(0)
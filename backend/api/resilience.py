@@ -0,0 +1,209 @@
+"""Per-provider rate limiting and circuit breaking for upstream APIs.
+
+Each upstream provider gets one ProviderGuard shared by every call made to
+it (prices, quotes, gas price): a token bucket sized to the provider's quota
+and a circuit breaker that opens after consecutive failures. While the
+breaker is open calls are rejected immediately, so callers can go straight
+to another provider instead of paying for a failed round trip. After
+`reset_timeout` a single half-open probe is let through; its outcome closes
+or re-opens the breaker.
+
+Quotas are set per provider (ONEINCH_RATE_LIMIT / ONEINCH_BURST,
+COINGECKO_RATE_LIMIT / COINGECKO_BURST). Breaker settings default to
+PROVIDER_BREAKER_THRESHOLD / PROVIDER_BREAKER_RESET and can be overridden per
+provider, e.g. ONEINCH_BREAKER_THRESHOLD.
+
+The 1inch defaults also bound /get_exchange_quotes: within QUOTE_DEADLINE
+only about ONEINCH_BURST + ONEINCH_RATE_LIMIT * QUOTE_DEADLINE legs get a
+1inch quote, and the rest fall back to price-implied quotes (see
+exchange_quotes_view). Raise both when the API plan allows larger batches.
+"""
+import asyncio
+import os
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Consecutive failures that open a breaker, and seconds until it lets a probe through
+PROVIDER_BREAKER_THRESHOLD = int(os.getenv("PROVIDER_BREAKER_THRESHOLD", "5"))
+PROVIDER_BREAKER_RESET = float(os.getenv("PROVIDER_BREAKER_RESET", "30"))
+
+# Calls per second and burst size; defaults follow the free-tier quotas
+# (1inch dev portal ~1 rps, CoinGecko ~30 calls/min). A rate <= 0 disables limiting.
+ONEINCH_RATE_LIMIT = float(os.getenv("ONEINCH_RATE_LIMIT", "1"))
+ONEINCH_BURST = float(os.getenv("ONEINCH_BURST", "5"))
+COINGECKO_RATE_LIMIT = float(os.getenv("COINGECKO_RATE_LIMIT", "0.5"))
+COINGECKO_BURST = float(os.getenv("COINGECKO_BURST", "5"))
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        """rate tokens per second, up to capacity; rate <= 0 disables limiting"""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def peek(self):
+        if self.rate <= 0:
+            return True
+        self._refill()
+        return self.tokens >= 1
+
+    def try_acquire(self):
+        if self.rate <= 0:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, max_wait=0.0):
+        """Take a token, waiting up to max_wait seconds for one to refill"""
+        deadline = time.monotonic() + max_wait
+        while not self.try_acquire():
+            wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=PROVIDER_BREAKER_THRESHOLD, reset_timeout=PROVIDER_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.trips = 0
+
+    def _reset_elapsed(self):
+        return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def available(self):
+        """Whether a call would currently be allowed (doesn't take the probe slot)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return self._reset_elapsed()
+        return not self.probe_in_flight
+
+    def allow(self):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if not self._reset_elapsed():
+                return False
+            self.state = HALF_OPEN
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        self.probe_in_flight = False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+
+
+class ProviderGuard:
+    def __init__(self, name, rate, burst, failure_threshold=PROVIDER_BREAKER_THRESHOLD, reset_timeout=PROVIDER_BREAKER_RESET):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.rejected_open = 0
+        self.rejected_rate = 0
+
+    def available(self):
+        return self.breaker.available() and self.bucket.peek()
+
+    async def acquire(self, max_wait=0.0):
+        """Reserve one call to the provider; False means skip it"""
+        if not self.breaker.allow():
+            self.rejected_open += 1
+            return False
+        if not await self.bucket.acquire(max_wait):
+            self.breaker.release_probe()
+            self.rejected_rate += 1
+            return False
+        return True
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self):
+        self.breaker.record_failure()
+
+    def record_status(self, status):
+        """Throttling and server errors count against the provider, anything else shows it is up"""
+        if status == 429 or status >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "trips": self.breaker.trips,
+            "rejected_open": self.rejected_open,
+            "rejected_rate": self.rejected_rate,
+            "rate": self.bucket.rate,
+            "burst": self.bucket.capacity,
+        }
+
+
+def _guard_from_env(name, prefix, rate, burst):
+    return ProviderGuard(
+        name,
+        rate,
+        burst,
+        int(os.getenv(f"{prefix}_BREAKER_THRESHOLD", str(PROVIDER_BREAKER_THRESHOLD))),
+        float(os.getenv(f"{prefix}_BREAKER_RESET", str(PROVIDER_BREAKER_RESET))),
+    )
+
+
+provider_guards = {
+    "1inch": _guard_from_env("1inch", "ONEINCH", ONEINCH_RATE_LIMIT, ONEINCH_BURST),
+    "CoinGecko": _guard_from_env("CoinGecko", "COINGECKO", COINGECKO_RATE_LIMIT, COINGECKO_BURST),
+}
+
+
+def get_guard(name):
+    return provider_guards[name]
+
+
+def provider_status(guards=None):
+    """"ok", "degraded" while some breakers are open, "unavailable" while all of them are"""
+    guards = provider_guards if guards is None else guards
+    open_count = sum(1 for guard in guards.values() if guard.breaker.state == OPEN)
+    if open_count == len(guards):
+        return "unavailable"
+    return "degraded" if open_count else "ok"
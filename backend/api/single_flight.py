@@ -0,0 +1,82 @@
+"""Single-flight execution of identical concurrent upstream calls.
+
+Calls are keyed on (endpoint, normalized params). While a call for a key is
+in flight, later callers await the same task instead of issuing their own
+request, and a successful, non-empty result is kept for `retention` seconds so a burst
+of identical requests (e.g. every client asking for the same quote when a
+round starts) costs one upstream call. The shared task is shielded, so a
+caller that gives up (deadline, disconnect) doesn't cancel it for the rest.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+SINGLE_FLIGHT_RETENTION = float(os.getenv("SINGLE_FLIGHT_RETENTION", "1.0"))
+SINGLE_FLIGHT_MAX_RETAINED = int(os.getenv("SINGLE_FLIGHT_MAX_RETAINED", "1024"))
+
+
+def _retainable(value):
+    """False for failures: None, an empty result ({} from a failed price batch) or an error payload"""
+    if value is None:
+        return False
+    if isinstance(value, (dict, list, tuple)) and not value:
+        return False
+    return not (isinstance(value, dict) and "error" in value)
+
+
+class SingleFlight:
+    def __init__(self, retention=SINGLE_FLIGHT_RETENTION, max_retained=SINGLE_FLIGHT_MAX_RETAINED):
+        self.retention = retention
+        self.max_retained = max_retained
+        self._inflight = {}  # key -> asyncio.Task
+        self._results = OrderedDict()  # key -> (value, expires_at)
+        self.calls = {}  # endpoint -> {"upstream": n, "shared": n, "retained": n}
+
+    def _count(self, endpoint, outcome):
+        counts = self.calls.setdefault(endpoint, {"upstream": 0, "shared": 0, "retained": 0})
+        counts[outcome] += 1
+
+    async def do(self, key, factory):
+        """Return factory()'s result, sharing it with identical concurrent calls.
+
+        key[0] names the endpoint for stats; factory is a coroutine function.
+        """
+        entry = self._results.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self._count(key[0], "retained")
+                return value
+            del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self._count(key[0], "upstream")
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._count(key[0], "shared")
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        # Failures still reach the callers already waiting, but the next caller retries
+        if not _retainable(value) or self.retention <= 0:
+            return
+        self._results[key] = (value, time.monotonic() + self.retention)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_retained:
+            self._results.popitem(last=False)
+
+    def stats(self):
+        return {
+            "retention": self.retention,
+            "in_flight": len(self._inflight),
+            "retained": len(self._results),
+            "calls": self.calls,
+        }
@@ -0,0 +1,256 @@
+"""Fast local extraction of swap intents from free-form questions.
+
+Handles the common phrasings ("swap 1 ETH to USDC", "sell 100 UNI for DAI",
+"buy 2 ETH with USDT", "how much DAI for 3 LINK", "1 ETH -> WBTC") without an
+LLM round trip. Every result carries a confidence score so callers can fall
+back to the LLM extractor for anything it isn't sure about.
+
+Which token is given and which is received is decided by where each one
+sits relative to the linking word (to/for/into, with/using/from). A swap
+that leaves a token slot or the amount unfilled, or has an amount or a word
+in a token slot that the parser can't place, scores below
+SWAP_PARSER_MIN_CONFIDENCE, so the LLM gets the final word.
+"""
+import os
+import re
+from decimal import Decimal, InvalidOperation
+
+# Verbs where the first token mentioned is the one being given away
+SELL_VERBS = {"swap", "sell", "convert", "exchange", "trade", "change", "turn", "dump", "bridge"}
+# Verbs where the first token mentioned is the one being received
+BUY_VERBS = {"buy", "purchase", "get", "acquire", "receive", "obtain"}
+# Words linking the given token to the received one ("ETH to USDC")
+TO_WORDS = {"to", "for", "into", "->"}
+# Words linking the received token to the given one ("ETH with USDC")
+WITH_WORDS = {"with", "using", "from"}
+QUESTION_WORDS = {"much", "many"}
+# Words that can sit where a token is expected without naming one ("10 of my ETH", "to get USDC")
+FILLER_WORDS = {
+    "of", "my", "the", "a", "an", "some", "more", "worth", "in", "on", "at", "and", "or", "now", "please",
+    "me", "us", "it", "them", "you", "i", "is", "what", "how", "would", "will", "could", "can", "should",
+    "tokens", "token", "coins", "coin", "units", "unit",
+} | QUESTION_WORDS
+# Relative amounts the local parser can't resolve to a number
+VAGUE_AMOUNT_WORDS = {"half", "quarter", "third", "all", "everything", "rest", "percent", "most"}
+
+# Common names and spellings that aren't ticker symbols
+TOKEN_ALIASES = {
+    "ether": "ETH",
+    "ethereum": "ETH",
+    "eth": "ETH",
+    "bitcoin": "BTC",
+    "bitcoins": "BTC",
+    "dollar": "USD",
+    "dollars": "USD",
+    "usd": "USD",
+    "tether": "USDT",
+    "chainlink": "LINK",
+    "uniswap": "UNI",
+    "maker": "MKR",
+    "yearn": "YFI",
+    "sushiswap": "SUSHI",
+}
+
+# Below this confidence callers should ask the LLM instead
+SWAP_PARSER_MIN_CONFIDENCE = float(os.getenv("SWAP_PARSER_MIN_CONFIDENCE", "0.75"))
+# Cap for swaps missing a token or the amount; keep it below SWAP_PARSER_MIN_CONFIDENCE
+SWAP_PARSER_PARTIAL_CONFIDENCE = 0.5
+
+_EXPONENT = r"(?:e[+-]?\d+)?"
+_WORD_RE = re.compile(rf"->|\$?\d[\d,]*(?:\.\d+)?{_EXPONENT}[a-z0-9]*|\.\d+{_EXPONENT}|[a-z][a-z0-9]*")
+_NUMBER_RE = re.compile(rf"^\$?(\d[\d,]*(?:\.\d+)?{_EXPONENT}|\.\d+{_EXPONENT})([a-z][a-z0-9]*)?$")
+# Lower-case words that could be a ticker when they sit in a token slot
+_WORD_TICKER_RE = re.compile(r"^[a-z][a-z0-9]{1,9}$")
+# Upper-case words in the original text that look like unknown tickers
+_TICKER_RE = re.compile(r"\b[A-Z][A-Z0-9]{1,9}\b")
+
+
+class SwapIntent:
+    __slots__ = ("input_token", "input_amount", "output_token", "output_amount", "confidence")
+
+    def __init__(self, input_token="", input_amount="", output_token="", output_amount="", confidence=0.0):
+        self.input_token = input_token
+        self.input_amount = input_amount
+        self.output_token = output_token
+        self.output_amount = output_amount
+        self.confidence = confidence
+
+    def to_swap_info(self):
+        """Same shape as recognize_swap_request_with_ai returns"""
+        return {
+            "inputToken": self.input_token,
+            "inputAmount": self.input_amount,
+            "outputToken": self.output_token,
+            "outputAmount": self.output_amount,
+        }
+
+
+def _format_amount(raw):
+    amount = raw.replace(",", "")
+    if "e" in amount:
+        # Scientific notation ("1e3") as a plain decimal
+        try:
+            amount = format(Decimal(amount).normalize(), "f")
+        except InvalidOperation:
+            pass
+    if amount.startswith("."):
+        amount = "0" + amount
+    return amount
+
+
+def _resolve_symbol(word, symbols):
+    upper = word.upper()
+    if upper in symbols:
+        return upper
+    alias = TOKEN_ALIASES.get(word)
+    if alias in symbols:
+        return alias
+    # Plural tickers ("10 links")
+    if word.endswith("s") and word[:-1].upper() in symbols:
+        return word[:-1].upper()
+    return None
+
+
+def _scan(text, symbols):
+    """Split text into ('amount'|'token'|'word', value) items"""
+    items = []
+    for word in _WORD_RE.findall(text.lower()):
+        number = _NUMBER_RE.match(word)
+        if number and not _resolve_symbol(word, symbols):
+            items.append(("amount", _format_amount(number.group(1))))
+            suffix = number.group(2)
+            if suffix:
+                symbol = _resolve_symbol(suffix, symbols)
+                items.append(("token", symbol) if symbol else ("word", suffix))
+            elif word.startswith("$"):
+                items.append(("token", "USD"))
+            continue
+        symbol = _resolve_symbol(word, symbols)
+        items.append(("token", symbol) if symbol else ("word", word))
+    return items
+
+
+def _received_first(linking, is_question, has_buy_verb, has_sell_verb):
+    """Whether the token before the linking words is the received one; None without a linking word"""
+    if linking & WITH_WORDS:
+        # "buy 2 ETH with USDC": first mention is received
+        return True
+    if linking & TO_WORDS:
+        # "swap 2 ETH to USDC" normally, but "how much DAI for 3 LINK" and
+        # "buy 2 ETH for 4000 USDC" name the received token first
+        return is_question or (has_buy_verb and not has_sell_verb)
+    return None
+
+
+def _unknown_slot_words(items):
+    """Words sitting where a token belongs (after an amount or a linking word) that aren't known tokens"""
+    unknown = []
+    for i, (kind, value) in enumerate(items):
+        if kind != "word" or not _WORD_TICKER_RE.match(value):
+            continue
+        if value in FILLER_WORDS or value in SELL_VERBS or value in BUY_VERBS or value in VAGUE_AMOUNT_WORDS:
+            continue
+        previous = items[i - 1] if i >= 1 else None
+        if previous and previous[0] == "amount" and i >= 2 and items[i - 2][0] == "word" and items[i - 2][1] in TO_WORDS | WITH_WORDS:
+            previous = items[i - 2]
+        if previous and (previous[0] == "amount" or previous[1] in TO_WORDS | WITH_WORDS):
+            unknown.append(value)
+    return unknown
+
+
+def parse_swap_intent(text, symbols):
+    """Extract a swap intent from text using the given set of known token symbols"""
+    symbols = set(symbols)
+    items = _scan(text, symbols)
+
+    # Collect token mentions with the amount written right before them
+    # ("10 ETH", "10 of ETH") and the index they appear at
+    mentions = []
+    placed_amounts = set()
+    for i, (kind, value) in enumerate(items):
+        if kind != "token":
+            continue
+        amount = ""
+        if i >= 1 and items[i - 1][0] == "amount":
+            amount = items[i - 1][1]
+            placed_amounts.add(i - 1)
+        elif i >= 2 and items[i - 1] == ("word", "of") and items[i - 2][0] == "amount":
+            amount = items[i - 2][1]
+            placed_amounts.add(i - 2)
+        if mentions and mentions[-1][1] == value and not amount:
+            continue
+        mentions.append((i, value, amount))
+    # Amounts not attached to a token ("swap ETH to USDC 1.5") could belong to either side
+    has_stray_amount = any(kind == "amount" and i not in placed_amounts for i, (kind, _) in enumerate(items))
+
+    words = [value for kind, value in items if kind == "word"]
+    has_sell_verb = any(word in SELL_VERBS for word in words)
+    has_buy_verb = any(word in BUY_VERBS for word in words)
+    has_vague_amount = "%" in text or any(word in VAGUE_AMOUNT_WORDS for word in words)
+
+    # Upper-case words we don't know, or any word in a token slot, might be tickers the LLM can still handle
+    unknown_tickers = [t for t in _TICKER_RE.findall(text) if t not in symbols and t.lower() not in TOKEN_ALIASES]
+    unknown_tickers += _unknown_slot_words(items)
+
+    if not mentions:
+        if has_sell_verb or has_buy_verb or unknown_tickers:
+            return SwapIntent(confidence=0.2)
+        # Nothing that looks like a trade at all
+        return SwapIntent(confidence=0.9)
+
+    first = mentions[0]
+    # "how much DAI ..." names the received token right after the question
+    is_question = first[0] >= 2 and items[first[0] - 2] == ("word", "how") and items[first[0] - 1][1] in QUESTION_WORDS
+
+    if len({m[1] for m in mentions}) == 1:
+        # One token only: "sell 2 ETH" / "buy 2 ETH" / "trade 10 sol for ETH" are
+        # partial swaps, anything else ("what is ETH?") is not a swap request at all
+        mention = first
+        before = {value for kind, value in items[:mention[0]] if kind == "word"}
+        after = {value for kind, value in items[mention[0] + 1:] if kind == "word"}
+        if (before | after) & (TO_WORDS | WITH_WORDS):
+            # The token is on one side of the linking word; the other side is missing or unknown
+            if after & (TO_WORDS | WITH_WORDS):
+                received = _received_first(after, is_question, has_buy_verb, has_sell_verb)
+            else:
+                received = not _received_first(before, is_question, has_buy_verb, has_sell_verb)
+        elif has_sell_verb != has_buy_verb:
+            received = has_buy_verb
+        elif has_sell_verb:
+            return SwapIntent(confidence=0.3)
+        else:
+            return SwapIntent(confidence=0.4 if unknown_tickers or has_vague_amount else 0.8)
+        confidence = 0.4 if unknown_tickers or has_vague_amount else SWAP_PARSER_PARTIAL_CONFIDENCE
+        if received:
+            return SwapIntent("", "", mention[1], mention[2], confidence)
+        return SwapIntent(mention[1], mention[2], "", "", confidence)
+
+    second = mentions[1]
+    between = {value for kind, value in items[first[0] + 1:second[0]] if kind == "word"}
+
+    if between == {"of"} and has_buy_verb and not has_sell_verb:
+        # "buy $100 of ETH": spend the first amount on the second token
+        given, output = first, second
+        return SwapIntent(given[1], given[2], output[1], output[2], 0.85)
+
+    received_first = _received_first(between, is_question, has_buy_verb, has_sell_verb)
+    if received_first is None:
+        return SwapIntent(confidence=0.3)
+
+    if received_first:
+        output, given = first, second
+    else:
+        given, output = first, second
+
+    confidence = 0.95 if (has_sell_verb or has_buy_verb or is_question) else 0.8
+    if len({m[1] for m in mentions}) > 2 or unknown_tickers or has_vague_amount:
+        confidence -= 0.4
+    if (not given[2] and not output[2]) or has_stray_amount:
+        confidence = min(confidence, SWAP_PARSER_PARTIAL_CONFIDENCE)
+
+    return SwapIntent(given[1], given[2], output[1], output[2], round(confidence, 2))
+
+
+def detect_token_symbols(text, symbols):
+    """Return the known token symbols mentioned in text, in order of appearance"""
+    return list(dict.fromkeys(value for kind, value in _scan(text, set(symbols)) if kind == "token"))
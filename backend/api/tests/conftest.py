@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app runs offline against recorded fixtures, and its modules import each other as top-level names
+os.environ.setdefault("UPSTREAM_MODE", "replay")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
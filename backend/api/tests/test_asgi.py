@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+import asgi
+
+
+def request(method, path):
+    """(status, headers, JSON body) of one request served by asgi.app"""
+    messages = []
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.app(scope, receive, send))
+    start = messages[0]
+    return start["status"], dict(start["headers"]), json.loads(messages[-1]["body"])
+
+
+@pytest.fixture
+def split_routes():
+    """A greedy GET route registered before a POST route its pattern also matches"""
+    routes = list(asgi.ROUTES)
+
+    async def read(req, name):
+        return {"read": name}, 200
+
+    async def write(req):
+        return {"written": True}, 201
+
+    asgi.route(r"/test_items/(?P<name>.+)", ["GET"])(read)
+    asgi.route(r"/test_items/new", ["POST"])(write)
+    yield
+    asgi.ROUTES[:] = routes
+
+
+def test_later_route_takes_the_method(split_routes):
+    status, _, body = request("POST", "/test_items/new")
+    assert (status, body) == (201, {"written": True})
+    status, _, body = request("GET", "/test_items/new")
+    assert (status, body) == (200, {"read": "new"})
+
+
+def test_405_lists_the_allowed_methods(split_routes):
+    status, headers, _ = request("DELETE", "/test_items/new")
+    assert status == 405
+    assert headers[b"allow"] == b"GET, POST"
+    assert request("DELETE", "/no_such_route")[0] == 404
@@ -0,0 +1,47 @@
+import asyncio
+
+import index
+from completion_cache import CompletionCache
+
+MESSAGES = [{"role": "user", "content": "swap 1 ETH to USDC"}]
+POLICY = {"swap_extraction": 60, "answer": 0}
+
+
+def test_disk_tier_serves_any_route_model(tmp_path):
+    db_path = str(tmp_path / "completions.db")
+
+    async def run():
+        await CompletionCache(db_path=db_path, policy=POLICY).put("b", MESSAGES, "swap_extraction", "TokenA: ETH")
+        cache = CompletionCache(db_path=db_path, policy=POLICY)
+        reply = await cache.get_any(["a", "b"], MESSAGES, "swap_extraction")
+        assert await cache.get("a", MESSAGES, "answer") is None
+        return reply, cache.stats()
+
+    reply, stats = asyncio.run(run())
+    assert reply == "TokenA: ETH"
+    assert (stats["disk_hits"], stats["misses"], stats["bypassed"]) == (1, 0, 1)
+
+
+def test_cache_hits_are_not_routed(monkeypatch):
+    cache = CompletionCache(policy=POLICY)
+    monkeypatch.setattr(index, "completion_cache", cache)
+    monkeypatch.setattr(index, "stub_llm", None)
+    routed = []
+
+    async def call(prompt_type, call, model=None):
+        routed.append(prompt_type)
+        return "fresh"
+
+    monkeypatch.setattr(index.model_router, "call", call)
+    assistant = index.crypto_assistant
+    model = index.model_router.models("swap_extraction")[0]
+
+    async def run():
+        await cache.put(model, assistant.build_messages("swap 1 ETH to USDC"), "swap_extraction", "cached")
+        return (
+            await assistant.ask_openrouter("swap  1 eth to USDC", None, "swap_extraction"),
+            await assistant.ask_openrouter("what is ETH?", None, "swap_extraction"),
+        )
+
+    assert asyncio.run(run()) == ("cached", "fresh")
+    assert routed == ["swap_extraction"]
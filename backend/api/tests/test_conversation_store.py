@@ -0,0 +1,33 @@
+import asyncio
+
+from conversation_store import ConversationStore
+
+
+def test_evicted_session_reloads_from_disk(tmp_path):
+    store = ConversationStore(max_sessions=1, db_path=str(tmp_path / "turns.db"))
+
+    async def run():
+        await store.add_turn("0xa", "swap 1 ETH to USDC", "Done.")
+        await store.add_turn("0xb", "price of BTC?", "About 60k.")
+        # 0xa was evicted by 0xb and comes back from SQLite
+        turns = await store.turns("0xa")
+        history, _ = await store.prompt_context("0xa")
+        cleared = await store.clear("0xa")
+        return turns, history, cleared, await store.turns("0xa")
+
+    turns, history, cleared, after = asyncio.run(run())
+    assert [turn["question"] for turn in turns] == ["swap 1 ETH to USDC"]
+    assert history == "User: swap 1 ETH to USDC\nAssistant: Done."
+    assert cleared and after == []
+    assert store.stats()["evictions"] >= 1
+    assert store.stats()["loaded_from_disk"] == 1
+
+
+def test_concurrent_first_turns_share_one_session(tmp_path):
+    store = ConversationStore(db_path=str(tmp_path / "turns.db"))
+
+    async def run():
+        await asyncio.gather(*(store.add_turn("0xa", f"question {i}", "answer") for i in range(5)))
+        return await store.turns("0xa")
+
+    assert len(asyncio.run(run())) == 5
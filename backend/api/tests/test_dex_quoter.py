@@ -0,0 +1,57 @@
+import os
+
+from dex_quoter import NATIVE_TOKEN_ADDRESS, LocalQuoter, get_amount_out
+from token_registry import TokenRegistry
+
+POOLS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dex_pools.json")
+registry = TokenRegistry.load()
+
+
+def make_quoter():
+    quoter = LocalQuoter(registry)
+    quoter.load_snapshot(POOLS_PATH)
+    return quoter
+
+
+def test_constant_product_output():
+    # 1 WETH into 10,000 WETH / 40M USDC at 0.3%: 9970 * 40e12 // (100,000,000 + 9970)
+    assert get_amount_out(10**18, 10_000 * 10**18, 40_000_000 * 10**6) == 3_987_602_436
+    assert get_amount_out(10**18, 10_000 * 10**18, 40_000_000 * 10**6, fee_bps=0) == 3_999_600_039
+    assert get_amount_out(0, 1, 1) == 0
+    assert get_amount_out(1, 0, 1) == 0
+
+
+def test_native_token_routes_through_weth():
+    quoter = make_quoter()
+    usdc = registry.get("USDC")
+    pool = next(p for p in quoter.pools.values() if {p.token0, p.token1} == {registry.get("WETH").address, usdc.address})
+    quote = quoter.quote(NATIVE_TOKEN_ADDRESS, usdc.address, 10**18)
+    assert quote["route"] == ["ETH", "USDC"]
+    assert int(quote["toAmount"]) == get_amount_out(10**18, pool.reserve0, pool.reserve1, pool.fee_bps)
+
+
+def test_best_route_is_chosen_and_paths_are_cached():
+    quoter = make_quoter()
+    link, usdc = registry.get("LINK").address, registry.get("USDC").address
+    paths = quoter.paths(1, link, usdc)
+    assert paths[0] == [link, usdc]
+    assert [link, registry.get("WETH").address, usdc] in paths
+    assert quoter.paths(1, link, usdc) is paths
+
+    amount, _, _ = quoter.best_route(1, link, usdc, 100 * 10**18)
+    for candidate in paths:
+        out = 100 * 10**18
+        for token_in, token_out in zip(candidate, candidate[1:]):
+            out = max(pool.amount_out(token_in, out) for pool in quoter._edges[(1, token_in, token_out)])
+        assert out <= amount
+
+    # New reserves change the answer but not the cached paths
+    quoter.apply_reserves({pool.address: (pool.reserve0, pool.reserve1 * 2) for pool in quoter.pools.values()})
+    assert quoter.paths(1, link, usdc) is paths
+    assert quoter.best_route(1, link, usdc, 100 * 10**18)[0] > amount
+
+
+def test_unroutable_pairs_return_none():
+    quoter = make_quoter()
+    assert quoter.quote(registry.get("CELO", 42220).address, registry.get("USDC").address, 10**18) is None
+    assert quoter.stats()["unroutable"] == 1
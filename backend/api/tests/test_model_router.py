@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from model_router import ModelRouter, NoModelAvailable
+
+
+def make_router(**kwargs):
+    return ModelRouter({"answer": ["a", "b", "c"]}, deadlines={"answer": 1}, **kwargs)
+
+
+def test_unknown_model_falls_back_to_candidates():
+    router = make_router()
+    assert router.candidates("answer", "attacker/model-123") == ["a", "b", "c"]
+    assert "attacker/model-123" not in router.health
+    assert router.stats()["rejected_models"] == 1
+
+
+def test_allowlisted_model_goes_first():
+    router = make_router(allowed_models=["extra"])
+    assert router.candidates("answer", "extra") == ["extra", "a", "b"]
+    assert router.candidates("answer", "c")[0] == "c"
+
+
+def test_open_breakers_do_not_use_up_attempts():
+    router = make_router(max_attempts=2)
+    for _ in range(router._health("a").breaker.failure_threshold):
+        router.record_failure("answer", "a", "error")
+    assert router.candidates("answer") == ["b", "c"]
+    assert router.stats()["skipped_open"] == {"a": 1}
+
+
+def test_call_fails_over_past_an_open_breaker():
+    router = make_router(max_attempts=1)
+    for _ in range(router._health("a").breaker.failure_threshold):
+        router.record_failure("answer", "a", "error")
+
+    async def call(model):
+        return f"reply from {model}"
+
+    assert asyncio.run(router.call("answer", call)) == "reply from b"
+
+
+def test_no_candidates_left():
+    router = ModelRouter({"trade_decision": []})
+
+    async def call(model):
+        return "HOLD"
+
+    with pytest.raises(NoModelAvailable):
+        asyncio.run(router.call("trade_decision", call, "not-allowed"))
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from portfolio_book import PortfolioBook
+
+
+def make_book():
+    book = PortfolioBook(["ETH", "USDC"], capacity=2)
+    for name, eth in (("alice", 1), ("bob", 2), ("carol", 1)):
+        book.add(name, {"ETH": eth, "USDC": 0})
+    return book
+
+
+def test_values_and_ranking():
+    book = make_book()
+    values = book.value(book.price_vector({"ETH": 3000, "USDC": 1, "DAI": 1}))
+    assert values.tolist() == [3000, 6000, 3000]
+    assert book.top() == [("bob", 6000), ("alice", 3000), ("carol", 3000)]
+    assert book.ranks().tolist() == [2, 1, 3]
+    assert book.top(1) == [("bob", 6000)]
+
+
+def test_ties_keep_the_previous_order():
+    book = make_book()
+    book.value(book.price_vector({"ETH": 1}))
+    assert [name for name, _ in book.top()] == ["bob", "alice", "carol"]
+
+    # carol pulls ahead of alice, then they tie again: carol keeps her place
+    book.transfer(book.rows["carol"], "ETH", 0, "USDC", 1)
+    book.value(book.price_vector({"ETH": 1, "USDC": 1}))
+    assert [name for name, _ in book.top()] == ["bob", "carol", "alice"]
+    book.value(book.price_vector({"ETH": 1, "USDC": 0}))
+    assert [name for name, _ in book.top()] == ["bob", "carol", "alice"]
+
+
+def test_repeated_ticks_are_deterministic():
+    rng = np.random.default_rng(7)
+    book = PortfolioBook(["ETH", "BTC"])
+    for i in range(200):
+        book.add(f"agent{i}", {"ETH": float(rng.integers(0, 3)), "BTC": float(rng.integers(0, 2))})
+    book.value(book.price_vector({"ETH": 1, "BTC": 1}))
+    first = book.ranking().copy()
+    for _ in range(5):
+        book.value(book.price_vector({"ETH": 1, "BTC": 1}))
+        assert np.array_equal(book.ranking(), first)
+    values = book.values[first]
+    assert np.all(values[:-1] >= values[1:])
+
+
+def test_transfer_and_unknown_tokens():
+    book = make_book()
+    row = book.rows["alice"]
+    book.transfer(row, "eth", 2, "USDC", 3000)
+    assert book.holdings_of(row) == {"USDC": 3000}
+    with pytest.raises(ValueError):
+        book.transfer(row, "DAI", 1, "ETH", 1)
+    with pytest.raises(ValueError):
+        book.add("alice")
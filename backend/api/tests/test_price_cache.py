@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import price_cache
+from price_cache import PriceCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(price_cache, "time", clock)
+    return clock
+
+
+def counting_loader(prices):
+    calls = []
+
+    async def load(keys):
+        calls.append(list(keys))
+        return {key: prices[key] for key in keys if key in prices}
+
+    return load, calls
+
+
+def test_fresh_stale_and_expired_entries(clock):
+    cache = PriceCache(ttl=10, stale_ttl=20)
+    prices = {"ETH": 1}
+    load, calls = counting_loader(prices)
+
+    async def run():
+        assert await cache.get_many(["ETH"], load) == {"ETH": 1}
+        prices["ETH"] = 2
+        clock.now += 5
+        assert await cache.get_many(["ETH"], load) == {"ETH": 1}  # fresh, no call
+        clock.now += 10
+        # Stale: the old price is served at once and refreshed in the background
+        assert await cache.get_many(["ETH"], load) == {"ETH": 1}
+        await asyncio.sleep(0)
+        assert await cache.get_many(["ETH"], load) == {"ETH": 2}
+        clock.now += 31
+        prices["ETH"] = 3
+        # Past ttl + stale_ttl the entry is gone and the caller waits for the fetch
+        assert await cache.get_many(["ETH"], load) == {"ETH": 3}
+
+    asyncio.run(run())
+    assert calls == [["ETH"], ["ETH"], ["ETH"]]
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (2, 1, 2)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = PriceCache(ttl=10, stale_ttl=0, max_size=2)
+    load, calls = counting_loader({"ETH": 1, "BTC": 2, "DAI": 3})
+
+    async def run():
+        await cache.get_many(["ETH", "BTC"], load)
+        await cache.get_many(["ETH"], load)  # BTC is now least recently used
+        await cache.get_many(["DAI"], load)
+        await cache.get_many(["ETH", "BTC"], load)
+
+    asyncio.run(run())
+    assert calls == [["ETH", "BTC"], ["DAI"], ["BTC"]]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_missing_prices_are_not_cached(clock):
+    cache = PriceCache(ttl=10)
+    load, calls = counting_loader({})
+
+    async def run():
+        assert await cache.get_many(["ETH"], load) == {}
+        assert await cache.get_many(["ETH"], load) == {}
+
+    asyncio.run(run())
+    assert calls == [["ETH"], ["ETH"]]
+
+
+def test_concurrent_misses_share_one_fetch(clock):
+    cache = PriceCache(ttl=10)
+    calls = []
+
+    async def load(keys):
+        calls.append(list(keys))
+        await asyncio.sleep(0.01)
+        return {key: 1 for key in keys}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_many(["ETH"], load) for _ in range(5)))
+
+    assert asyncio.run(run()) == [{"ETH": 1}] * 5
+    assert calls == [["ETH"]]
+    assert cache.stats()["coalesced"] == 4
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from price_history import PriceHistory
+
+DAY = 1717000000 - 1717000000 % 86400
+
+
+def make_history(tmp_path):
+    return PriceHistory(str(tmp_path), flush_interval=3600)
+
+
+def test_out_of_order_ticks_are_merged(tmp_path):
+    history = make_history(tmp_path)
+    history.record("1inch", {"ETH": 3}, ts=DAY + 30)
+    history.record("1inch", {"ETH": 1}, ts=DAY + 10)
+    history.flush()
+    # A later flush with ticks before the ones already on disk
+    history.record("1inch", {"ETH": 2}, ts=DAY + 20)
+    history.record("1inch", {"ETH": 4}, ts=DAY + 40)
+    history.flush()
+
+    ticks = history.query("ETH", DAY, DAY + 3600)
+    assert ticks["ts"].tolist() == [DAY + 10, DAY + 20, DAY + 30, DAY + 40]
+    assert ticks["price"].tolist() == [1, 2, 3, 4]
+    assert history.query("ETH", DAY + 15, DAY + 35)["price"].tolist() == [2, 3]
+    assert history.stats()["merges"] == 1
+
+
+def test_cached_segment_sees_new_ticks(tmp_path):
+    history = make_history(tmp_path)
+    history.record("1inch", {"ETH": 1}, ts=DAY + 10)
+    assert len(history.query("ETH", DAY, DAY + 3600)) == 1
+
+    # Another worker writes to the same day file
+    other = make_history(tmp_path)
+    other.record("CoinGecko", {"ETH": 2}, ts=DAY + 20)
+    other.record("CoinGecko", {"ETH": 0.5}, ts=DAY + 5)
+    other.flush()
+
+    assert history.query("ETH", DAY, DAY + 3600)["price"].tolist() == [0.5, 1, 2]
+
+
+def test_flush_runs_off_the_event_loop(tmp_path):
+    history = PriceHistory(str(tmp_path), flush_interval=0)
+    loop_thread = threading.get_ident()
+    flush_threads = []
+    flush = history.flush
+
+    def tracked_flush():
+        flush_threads.append(threading.get_ident())
+        flush()
+
+    history.flush = tracked_flush
+
+    async def record():
+        history.record("1inch", {"ETH": 1}, ts=DAY + 10)
+        await wait_for_flushes(history, 1)
+
+    asyncio.run(record())
+    assert flush_threads and loop_thread not in flush_threads
+    assert np.array_equal(history.query("ETH", DAY, DAY + 3600)["price"], [1])
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs flock")
+def test_record_does_not_wait_for_a_write(tmp_path):
+    history = PriceHistory(str(tmp_path), flush_interval=0)
+    os.makedirs(tmp_path / "ETH")
+    # Another worker holds the symbol's lock, so the background write blocks
+    with open(tmp_path / "ETH" / ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+
+        async def record():
+            history.record("1inch", {"ETH": 1}, ts=DAY + 10)
+            await asyncio.sleep(0.1)
+            # Released from another thread, so a record() stuck behind the write can't deadlock the test
+            release = threading.Timer(1, fcntl.flock, (lock, fcntl.LOCK_UN))
+            release.start()
+            started = time.monotonic()
+            history.record("1inch", {"ETH": 2}, ts=DAY + 20)
+            assert time.monotonic() - started < 0.05
+            assert history.stats()["flushes"] == 0
+            await wait_for_flushes(history, 1)
+
+        asyncio.run(record())
+    assert history.query("ETH", DAY, DAY + 3600)["price"].tolist() == [1, 2]
+
+
+async def wait_for_flushes(history, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while history.stats()["flushes"] < count:
+        assert time.monotonic() < deadline, "flush did not finish"
+        await asyncio.sleep(0.01)
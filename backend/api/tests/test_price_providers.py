@@ -0,0 +1,103 @@
+import asyncio
+
+from price_providers import PriceProvider, hedged_fetch
+
+
+def make_provider(name, prices, delay, events, supports=None):
+    """Provider answering `prices` after `delay` seconds, logging start/finish/cancel to events"""
+    async def fetch_many(symbols):
+        events.append((name, "start", list(symbols)))
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            events.append((name, "cancelled"))
+            raise
+        events.append((name, "finish"))
+        return {symbol: prices[symbol] for symbol in symbols if symbol in prices}
+
+    return PriceProvider(name, fetch_many, supports or (lambda symbol: True), timeout=1)
+
+
+class ClosedGuard:
+    def available(self):
+        return False
+
+
+def fetch(symbols, primary, secondary, hedge_delay):
+    async def run():
+        prices = await hedged_fetch(symbols, primary, secondary, hedge_delay)
+        await asyncio.sleep(0)  # let cancelled requests log it
+        return prices
+    return asyncio.run(run())
+
+
+def test_fallback_asks_the_secondary_only_for_what_the_primary_missed():
+    events = []
+    primary = make_provider("1inch", {"ETH": 1}, 0.01, events)
+    secondary = make_provider("CoinGecko", {"ETH": 9, "BTC": 2}, 0.01, events)
+
+    assert fetch(["ETH", "BTC"], primary, secondary, None) == {"ETH": 1, "BTC": 2}
+    assert events == [
+        ("1inch", "start", ["ETH", "BTC"]), ("1inch", "finish"),
+        ("CoinGecko", "start", ["BTC"]), ("CoinGecko", "finish"),
+    ]
+
+
+def test_fallback_skips_the_secondary_when_the_primary_covers_everything():
+    events = []
+    primary = make_provider("1inch", {"ETH": 1}, 0.01, events)
+    secondary = make_provider("CoinGecko", {"ETH": 9}, 0.01, events)
+
+    assert fetch(["ETH"], primary, secondary, None) == {"ETH": 1}
+    assert [event[0] for event in events] == ["1inch", "1inch"]
+
+
+def test_hedge_starts_the_secondary_after_the_delay_and_cancels_the_loser():
+    events = []
+    primary = make_provider("1inch", {"ETH": 1}, 0.5, events)
+    secondary = make_provider("CoinGecko", {"ETH": 9}, 0.01, events)
+
+    assert fetch(["ETH"], primary, secondary, 0.05) == {"ETH": 9}
+    assert events == [
+        ("1inch", "start", ["ETH"]),
+        ("CoinGecko", "start", ["ETH"]), ("CoinGecko", "finish"),
+        ("1inch", "cancelled"),
+    ]
+
+
+def test_hedge_waits_for_a_primary_inside_the_delay():
+    events = []
+    primary = make_provider("1inch", {"ETH": 1}, 0.01, events)
+    secondary = make_provider("CoinGecko", {"ETH": 9}, 0.01, events)
+
+    assert fetch(["ETH"], primary, secondary, 0.5) == {"ETH": 1}
+    assert [event[0] for event in events] == ["1inch", "1inch"]
+
+
+def test_race_starts_both_and_the_first_answer_wins():
+    events = []
+    primary = make_provider("1inch", {"ETH": 1}, 0.2, events)
+    secondary = make_provider("CoinGecko", {"ETH": 9}, 0.01, events)
+
+    assert fetch(["ETH"], primary, secondary, 0) == {"ETH": 9}
+    assert events[:2] == [("1inch", "start", ["ETH"]), ("CoinGecko", "start", ["ETH"])]
+    assert events[2:] == [("CoinGecko", "finish"), ("1inch", "cancelled")]
+
+
+def test_unavailable_primary_swaps_with_the_secondary():
+    events = []
+    primary = make_provider("1inch", {"ETH": 1}, 0.01, events)
+    primary.guard = ClosedGuard()
+    secondary = make_provider("CoinGecko", {"ETH": 9}, 0.01, events)
+
+    assert fetch(["ETH"], primary, secondary, None) == {"ETH": 9}
+    assert [event[0] for event in events] == ["CoinGecko", "CoinGecko"]
+
+
+def test_symbols_the_primary_cannot_price_go_straight_to_the_secondary():
+    events = []
+    primary = make_provider("1inch", {"ETH": 1}, 0.05, events, supports=lambda symbol: symbol != "CELO")
+    secondary = make_provider("CoinGecko", {"CELO": 0.5}, 0.01, events)
+
+    assert fetch(["ETH", "CELO"], primary, secondary, None) == {"ETH": 1, "CELO": 0.5}
+    assert events[:2] == [("CoinGecko", "start", ["CELO"]), ("1inch", "start", ["ETH"])]
@@ -0,0 +1,54 @@
+import pytest
+
+import index
+
+BAD_AMOUNTS = ["0", "-5", "nan", "inf"]
+
+
+@pytest.fixture
+def client():
+    return index.app.test_client()
+
+
+@pytest.mark.parametrize("amount", BAD_AMOUNTS)
+def test_single_quote_rejects_bad_amount(client, amount):
+    response = client.get(f"/get_exchange_quote?from_token=1INCH&to_token=ETH&from_amount={amount}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "from_amount must be a positive number"}
+
+
+def test_single_quote_rejects_non_numeric_amount(client):
+    response = client.get("/get_exchange_quote?from_token=1INCH&to_token=ETH&from_amount=abc")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "from_amount must be a number"}
+
+
+def test_single_quote(client):
+    response = client.get("/get_exchange_quote?from_token=1INCH&to_token=ETH&from_amount=10")
+    assert response.status_code == 200
+    assert response.get_json()["to"]["amount"] > 0
+
+
+@pytest.mark.parametrize("amount", [0, -5, "nan", float("nan")])
+def test_batch_quote_rejects_bad_amount(client, amount):
+    response = client.post("/get_exchange_quotes", json={"quotes": [
+        {"from_token": "1INCH", "to_token": "ETH", "from_amount": amount},
+        {"from_token": "1INCH", "to_token": "ETH", "from_amount": 10},
+    ]})
+    assert response.status_code == 200
+    bad, good = response.get_json()["quotes"]
+    assert bad == {"error": "from_amount must be a positive number"}
+    assert good["to"]["amount"] > 0
+
+
+def test_batch_legs_without_a_quote_fall_back_to_prices(client, monkeypatch):
+    async def no_quote(*args):
+        return None
+
+    monkeypatch.setattr(index, "get_swap_quote", no_quote)
+    response = client.post("/get_exchange_quotes", json={"quotes": [
+        {"from_token": "1INCH", "to_token": "ETH", "from_amount": 10},
+    ]})
+    (quote,) = response.get_json()["quotes"]
+    assert quote["quote_source"] == "price_estimate"
+    assert quote["to"]["amount"] == pytest.approx(10 * quote["from"]["price_usd"] / quote["to"]["price_usd"])
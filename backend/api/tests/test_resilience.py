@@ -0,0 +1,22 @@
+from resilience import ProviderGuard, provider_status
+
+
+def make_guard(name):
+    return ProviderGuard(name, rate=0, burst=1, failure_threshold=1, reset_timeout=30)
+
+
+def test_status_follows_the_breakers():
+    guards = {"a": make_guard("a"), "b": make_guard("b")}
+    assert provider_status(guards) == "ok"
+    guards["a"].record_failure()
+    assert provider_status(guards) == "degraded"
+    guards["b"].record_failure()
+    assert provider_status(guards) == "unavailable"
+
+
+def test_price_cache_stats_keeps_the_providers_key():
+    import index
+
+    stats = index.app.test_client().get("/price_cache_stats").get_json()
+    assert set(stats["providers"]) == {"1inch", "CoinGecko"}
+    assert stats["provider_status"] in ("ok", "degraded", "unavailable")
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def run_twice(flight, results):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        return results[len(calls) - 1]
+
+    async def main():
+        first = await flight.do(("prices", "ETH"), factory)
+        second = await flight.do(("prices", "ETH"), factory)
+        return first, second
+
+    return asyncio.run(main()), len(calls)
+
+
+def test_success_is_retained():
+    (first, second), calls = run_twice(SingleFlight(retention=60), [{"ETH": 1.0}, {"ETH": 2.0}])
+    assert (first, second, calls) == ({"ETH": 1.0}, {"ETH": 1.0}, 1)
+
+
+@pytest.mark.parametrize("failure", [None, {}, [], {"error": "upstream 503"}])
+def test_failures_are_not_retained(failure):
+    (first, second), calls = run_twice(SingleFlight(retention=60), [failure, {"ETH": 2.0}])
+    assert (first, second, calls) == (failure, {"ETH": 2.0}, 2)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight(retention=0)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"ETH": 1.0}
+
+    async def main():
+        return await asyncio.gather(*(flight.do(("prices", "ETH"), factory) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"ETH": 1.0}] * 5
+    assert len(calls) == 1
+    assert flight.stats()["calls"]["prices"] == {"upstream": 1, "shared": 4, "retained": 0}
@@ -0,0 +1,58 @@
+import pytest
+
+from swap_parser import SWAP_PARSER_MIN_CONFIDENCE, parse_swap_intent
+
+SYMBOLS = {"ETH", "WBTC", "USDC", "USDT", "DAI", "LINK", "UNI", "1INCH", "USD"}
+
+
+def parse(text):
+    return parse_swap_intent(text, SYMBOLS)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("swap 1 ETH to USDC", ("ETH", "1", "USDC", "")),
+    ("sell 100 uni for dai", ("UNI", "100", "DAI", "")),
+    ("convert 1,000 usdc into eth", ("USDC", "1000", "ETH", "")),
+    ("buy 2 ETH with USDC", ("USDC", "", "ETH", "2")),
+    ("buy 2 ETH for 4000 USDC", ("USDC", "4000", "ETH", "2")),
+    ("how much DAI for 3 LINK", ("LINK", "3", "DAI", "")),
+    ("swap 1e3 USDC to ETH", ("USDC", "1000", "ETH", "")),
+    ("buy 2 ETH with 1e-3 WBTC", ("WBTC", "0.001", "ETH", "2")),
+    ("1 ETH -> WBTC", ("ETH", "1", "WBTC", "")),
+])
+def test_confident_swaps(text, expected):
+    intent = parse(text)
+    assert (intent.input_token, intent.input_amount, intent.output_token, intent.output_amount) == expected
+    assert intent.confidence >= SWAP_PARSER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("text", [
+    # Unknown lower-case ticker in either slot
+    "trade 10 sol for eth",
+    "swap 10 eth to sol",
+    "swap 10 ETH to FOOBAR",
+    # Amount that can't be placed on either side
+    "swap ETH to USDC 1.5",
+    # Missing amount or token slot
+    "swap ETH to USDC",
+    "ETH -> WBTC",
+    "sell 2 ETH",
+    "buy 2 ETH",
+    # Relative amount
+    "swap half my ETH to USDC",
+])
+def test_defers_to_llm(text):
+    assert parse(text).confidence < SWAP_PARSER_MIN_CONFIDENCE
+
+
+def test_direction_follows_linking_word():
+    intent = parse("trade 10 sol for eth")
+    assert (intent.input_token, intent.output_token) == ("", "ETH")
+    intent = parse("swap 10 eth to sol")
+    assert (intent.input_token, intent.input_amount, intent.output_token) == ("ETH", "10", "")
+
+
+def test_not_a_swap():
+    intent = parse("what is ETH?")
+    assert intent.to_swap_info() == {"inputToken": "", "inputAmount": "", "outputToken": "", "outputAmount": ""}
+    assert intent.confidence >= SWAP_PARSER_MIN_CONFIDENCE
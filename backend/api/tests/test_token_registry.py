@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+from index import CHAIN_NATIVE_SYMBOLS
+from token_registry import Token, TokenRegistry
+
+POLYGON_USDC = "0x3c499c542cef5e3811e1192ce70d8cc03d5c3359"
+USDC = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+
+
+def test_one_symbol_on_several_chains():
+    registry = TokenRegistry([
+        Token("USDC", POLYGON_USDC, 6, "usd-coin", chain_id=137),
+        Token("USDC", USDC, 6, "usd-coin"),
+    ])
+    assert registry.get("usdc").chain_id == 1
+    assert registry.get("USDC", 137).address == POLYGON_USDC
+    assert registry.address("USDC", 137) == POLYGON_USDC
+    assert registry.address("USDC", 10) is None
+    assert registry.chains("USDC") == [137, 1]
+    assert registry.symbols() == ["USDC"]
+    assert registry.by_address(POLYGON_USDC, 137).chain_id == 137
+
+
+def test_later_entry_replaces_the_same_chain_only():
+    registry = TokenRegistry([Token("CELO", "0x01", 18, chain_id=42220), Token("CELO", "0x02", 18, chain_id=1)])
+    registry.add(Token("CELO", "0x03", 18, chain_id=42220))
+    assert registry.get("CELO", 42220).address == "0x03"
+    assert registry.by_address("0x01", 42220) is None
+    assert len(registry) == 2
+
+
+def test_every_native_gas_token_can_be_priced():
+    registry = TokenRegistry.load()
+    for symbol in set(CHAIN_NATIVE_SYMBOLS.values()):
+        assert registry.coingecko_id(symbol), symbol
+
+
+def test_wei_conversion_is_exact_for_6_8_and_18_decimals():
+    registry = TokenRegistry.load()
+    usdc, wbtc, eth = registry.get("USDC"), registry.get("WBTC"), registry.get("ETH")
+    assert (usdc.decimals, wbtc.decimals, eth.decimals) == (6, 8, 18)
+
+    assert usdc.to_wei(0.1) == 100_000
+    assert usdc.to_wei("1234.567891") == 1_234_567_891
+    assert wbtc.to_wei(0.00000001) == 1
+    assert wbtc.to_wei(21_000_000) == 2_100_000_000_000_000
+    # Decimal(0.1) * 10**18 would carry the binary error: 100000000000000005
+    assert eth.to_wei(0.1) == 10**17
+    assert eth.to_wei("123456789.123456789123456789") == 123_456_789_123_456_789_123_456_789
+
+    assert usdc.from_wei(1_234_567_891) == Decimal("1234.567891")
+    assert wbtc.from_wei("1") == Decimal("0.00000001")
+    assert eth.from_wei(10**17) == Decimal("0.1")
+
+
+def test_wei_conversion_rounds_down_below_one_base_unit():
+    usdc = Token("USDC", USDC, 6)
+    assert usdc.to_wei("0.0000019") == 1
+    assert usdc.to_wei(Decimal("2.9999999")) == 2_999_999
+    assert usdc.to_wei(0) == 0
+    for wei in (1, 999_999, 10**12 + 7):
+        assert usdc.to_wei(usdc.from_wei(wei)) == wei
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+import index
+from model_router import ModelRouter, NoModelAvailable
+from tournament import AgentConfig, Tournament
+
+
+@pytest.fixture
+def client():
+    return index.app.test_client()
+
+
+def run_tournament(client, agents):
+    response = client.post("/tournaments", json={"agents": agents, "rounds": 1})
+    assert response.status_code == 202, response.get_json()
+    tournament_id = response.get_json()["id"]
+    for _ in range(100):
+        if client.get(f"/tournaments/{tournament_id}").get_json()["status"] not in ("pending", "running"):
+            break
+        time.sleep(0.05)
+    return tournament_id
+
+
+def test_limit_is_clamped_to_the_agents(client):
+    tournament_id = run_tournament(client, [{"name": "a"}, {"name": "b"}, {"name": "c"}])
+    for limit, expected in (("2", 2), ("0", 1), ("-1", 1), ("50", 3)):
+        response = client.get(f"/tournaments/{tournament_id}?limit={limit}")
+        assert response.status_code == 200
+        assert len(response.get_json()["leaderboard"]) == expected
+
+
+def test_bad_limit_is_rejected(client):
+    tournament_id = run_tournament(client, [{"name": "a"}])
+    response = client.get(f"/tournaments/{tournament_id}?limit=abc")
+    assert response.status_code == 400
+
+
+def test_model_failures_count_as_errors():
+    router = ModelRouter({"trade_decision": []})
+
+    async def failing(model):
+        raise RuntimeError("upstream down")
+
+    async def ask_llm(prompt, model):
+        return await router.call("trade_decision", failing, model)
+
+    async def get_prices(symbols):
+        return {"ETH": 3000.0, "USDC": 1.0}
+
+    async def play():
+        tournament = Tournament(
+            "t", [AgentConfig("a", "some-model")], ["ETH", "USDC"], ask_llm, get_prices,
+            rounds=2, round_interval=0, llm_semaphore=asyncio.Semaphore(1),
+        )
+        await tournament.run()
+        return tournament
+
+    tournament = asyncio.run(play())
+    agent = tournament.agents[0]
+    assert agent.errors == 2
+    assert agent.decisions == 0
+    with pytest.raises(NoModelAvailable):
+        asyncio.run(ask_llm("prompt", "some-model"))
+
+
+def test_unknown_agent_model_is_rejected(client):
+    response = client.post("/tournaments", json={"agents": [{"name": "a", "model": "attacker/model-123"}]})
+    assert response.status_code == 400
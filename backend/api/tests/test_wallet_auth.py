@@ -0,0 +1,79 @@
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+import index
+
+
+@pytest.fixture
+def client():
+    return index.app.test_client()
+
+
+@pytest.fixture
+def account():
+    return Account.create()
+
+
+def sign_in(client, account):
+    address = account.address
+    message = client.post("/wallet_auth/nonce", json={"wallet_address": address}).get_json()["message"]
+    signature = Account.sign_message(encode_defunct(text=message), account.key).signature.hex()
+    return client.post("/wallet_auth/verify", json={"wallet_address": address, "signature": signature})
+
+
+def test_sign_in_unlocks_the_conversation(client, account):
+    response = sign_in(client, account)
+    assert response.status_code == 200
+    token = response.get_json()["session_token"]
+
+    response = client.get(f"/conversation/{account.address}", headers={"X-Wallet-Session": token})
+    assert response.status_code == 200
+    assert response.get_json()["turns"] == []
+    response = client.delete(f"/conversation/{account.address}?session_token={token}")
+    assert response.status_code == 200
+
+
+def test_conversation_needs_a_session(client, account):
+    assert client.get(f"/conversation/{account.address}").status_code == 401
+    assert client.delete(f"/conversation/{account.address}").status_code == 401
+    response = client.get(f"/conversation/{account.address}", headers={"X-Wallet-Session": "forged"})
+    assert response.status_code == 401
+
+
+def test_session_is_bound_to_its_wallet(client, account):
+    token = sign_in(client, account).get_json()["session_token"]
+    other = Account.create().address
+    response = client.get(f"/conversation/{other}", headers={"X-Wallet-Session": token})
+    assert response.status_code == 401
+
+
+def test_ask_ai_with_wallet_needs_a_session(client, account):
+    response = client.post("/ask_ai", json={"question": "what is ETH?", "wallet_address": account.address})
+    assert response.status_code == 401
+    # Without a wallet the question stands alone and needs no sign in
+    assert client.post("/ask_ai", json={"question": "what is ETH?"}).status_code == 200
+
+
+def test_signature_from_another_key_is_rejected(client, account):
+    message = client.post("/wallet_auth/nonce", json={"wallet_address": account.address}).get_json()["message"]
+    signature = Account.sign_message(encode_defunct(text=message), Account.create().key).signature.hex()
+    response = client.post("/wallet_auth/verify", json={"wallet_address": account.address, "signature": signature})
+    assert response.status_code == 401
+
+
+def test_nonce_is_single_use(client, account):
+    address = account.address
+    message = client.post("/wallet_auth/nonce", json={"wallet_address": address}).get_json()["message"]
+    signature = Account.sign_message(encode_defunct(text=message), account.key).signature.hex()
+    body = {"wallet_address": address, "signature": signature}
+    assert client.post("/wallet_auth/verify", json=body).status_code == 200
+    assert client.post("/wallet_auth/verify", json=body).status_code == 401
+
+
+def test_signed_in_questions_are_kept(client, account):
+    token = sign_in(client, account).get_json()["session_token"]
+    body = {"question": "what is ETH?", "wallet_address": account.address, "session_token": token}
+    assert client.post("/ask_ai", json=body).status_code == 200
+    response = client.get(f"/conversation/{account.address}", headers={"X-Wallet-Session": token})
+    assert len(response.get_json()["turns"]) == 1
@@ -0,0 +1,52 @@
+"""Per-stage wall clock timing for multi-step request handling."""
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Collects how long each named stage of one request took"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self):
+        """Close the timer and return stage durations in milliseconds"""
+        self.stages["total"] = time.perf_counter() - self.started
+        return {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()}
+
+
+class TimingLog:
+    """Bounded log of recent per-request stage timings with averages"""
+
+    def __init__(self, size=200):
+        self.records = deque(maxlen=size)
+
+    def add(self, record):
+        self.records.append(record)
+
+    def summary(self):
+        totals = {}
+        counts = {}
+        for record in self.records:
+            for name, ms in record.items():
+                if isinstance(ms, (int, float)):
+                    totals[name] = totals.get(name, 0.0) + ms
+                    counts[name] = counts.get(name, 0) + 1
+        return {
+            "requests": len(self.records),
+            "mean_ms": {name: round(totals[name] / counts[name], 3) for name in totals},
+            "recent": list(self.records)[-20:],
+        }
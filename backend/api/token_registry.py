@@ -0,0 +1,158 @@
+"""Token metadata (address, decimals, CoinGecko id, chain) loaded once at startup.
+
+Tokens come from tokens.json next to this module, or from the JSON/CSV files
+listed in TOKEN_REGISTRY_PATH (comma separated, later files override earlier
+entries with the same symbol on the same chain), so tokens can be added without
+code changes. Tokens are keyed by (chain id, symbol), so one symbol can be
+listed on several chains, e.g. USDC on Ethereum and on Polygon. A lookup by
+symbol alone resolves to the Ethereum token, or to the first chain listed when
+there is none on Ethereum. Symbol lookups are case-insensitive and lookups by
+address are keyed on (chain id, lower-case address); both are plain dict
+lookups. Several symbols may share one address, e.g. USD is priced and quoted
+as USDC and BTC as WBTC.
+
+Amounts are converted to and from base units (wei) with Decimal arithmetic so
+6 and 8 decimal tokens (USDC, USDT, WBTC) come out exact.
+"""
+import csv
+import json
+import logging
+import os
+from decimal import ROUND_DOWN, Decimal
+
+DEFAULT_TOKEN_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokens.json")
+TOKEN_REGISTRY_PATH = os.getenv("TOKEN_REGISTRY_PATH", DEFAULT_TOKEN_REGISTRY_PATH)
+
+ETHEREUM_CHAIN_ID = 1
+
+
+class Token:
+    __slots__ = ("symbol", "address", "decimals", "coingecko_id", "chain_id", "_unit")
+
+    def __init__(self, symbol, address, decimals, coingecko_id=None, chain_id=ETHEREUM_CHAIN_ID):
+        self.symbol = symbol.upper()
+        self.address = address.lower() if address else None
+        self.decimals = int(decimals)
+        self.coingecko_id = coingecko_id or None
+        self.chain_id = int(chain_id)
+        self._unit = Decimal(10) ** self.decimals
+
+    def to_wei(self, amount):
+        """Whole-token amount (float, str or Decimal) to integer base units, rounded down"""
+        # str() keeps float inputs like 0.1 from carrying binary rounding noise
+        return int((Decimal(str(amount)) * self._unit).to_integral_value(rounding=ROUND_DOWN))
+
+    def from_wei(self, wei):
+        """Integer base units (int or decimal string) to a Decimal token amount"""
+        return Decimal(int(wei)) / self._unit
+
+    def to_dict(self):
+        return {
+            "symbol": self.symbol,
+            "address": self.address,
+            "decimals": self.decimals,
+            "coingecko_id": self.coingecko_id,
+            "chain_id": self.chain_id,
+        }
+
+    def __repr__(self):
+        return f"Token({self.symbol}, chain {self.chain_id}, {self.decimals} decimals)"
+
+
+def _read_rows(path):
+    if path.lower().endswith(".csv"):
+        with open(path, newline="") as f:
+            return list(csv.DictReader(f))
+    with open(path) as f:
+        return json.load(f)
+
+
+class TokenRegistry:
+    def __init__(self, tokens=()):
+        self.tokens = []
+        self._by_symbol = {}  # (chain id, symbol) -> Token
+        self._chains = {}  # symbol -> chain ids it is listed on, in load order
+        self._by_address = {}  # (chain id, address) -> [Token], first one is canonical
+        self.symbol_set = frozenset()
+        for token in tokens:
+            self.add(token)
+
+    @classmethod
+    def load(cls, paths=TOKEN_REGISTRY_PATH):
+        registry = cls()
+        for path in (p.strip() for p in paths.split(",")):
+            if not path:
+                continue
+            for row in _read_rows(path):
+                registry.add(Token(
+                    row["symbol"],
+                    row.get("address"),
+                    row["decimals"],
+                    row.get("coingecko_id"),
+                    row.get("chain_id") or ETHEREUM_CHAIN_ID,
+                ))
+            logging.info(f"Token registry: loaded {path}, {len(registry.tokens)} tokens")
+        return registry
+
+    def add(self, token):
+        key = (token.chain_id, token.symbol)
+        previous = self._by_symbol.get(key)
+        if previous is not None:
+            self.tokens.remove(previous)
+            if previous.address:
+                self._by_address[(previous.chain_id, previous.address)].remove(previous)
+        else:
+            self._chains.setdefault(token.symbol, []).append(token.chain_id)
+        self.tokens.append(token)
+        self._by_symbol[key] = token
+        if token.address:
+            self._by_address.setdefault((token.chain_id, token.address), []).append(token)
+        self.symbol_set = frozenset(self._chains)
+
+    def get(self, symbol, chain_id=None):
+        """Token for a symbol in any case on chain_id, or on its default chain when chain_id is None; None if unlisted"""
+        if not symbol:
+            return None
+        symbol = symbol.upper()
+        if chain_id is None:
+            chains = self._chains.get(symbol)
+            if not chains:
+                return None
+            chain_id = ETHEREUM_CHAIN_ID if ETHEREUM_CHAIN_ID in chains else chains[0]
+        return self._by_symbol.get((chain_id, symbol))
+
+    def chains(self, symbol):
+        """Chain ids a symbol is listed on"""
+        return list(self._chains.get(symbol.upper(), ())) if symbol else []
+
+    def by_address(self, address, chain_id=ETHEREUM_CHAIN_ID):
+        tokens = self._by_address.get((chain_id, address.lower()))
+        return tokens[0] if tokens else None
+
+    def symbols_for_address(self, address, chain_id=ETHEREUM_CHAIN_ID):
+        """Every symbol sharing an address (e.g. USD and USDC)"""
+        return [token.symbol for token in self._by_address.get((chain_id, address.lower()), ())]
+
+    def address(self, symbol, chain_id=ETHEREUM_CHAIN_ID):
+        """Contract address of a symbol on the given chain, or None"""
+        token = self.get(symbol, chain_id)
+        return token.address if token is not None else None
+
+    def coingecko_id(self, symbol):
+        token = self.get(symbol)
+        return token.coingecko_id if token is not None else None
+
+    def symbols(self, chain_id=None):
+        """Symbols listed on chain_id, or every distinct symbol when chain_id is None"""
+        if chain_id is None:
+            return list(self._chains)
+        return [token.symbol for token in self.tokens if token.chain_id == chain_id]
+
+    def coingecko_symbols(self):
+        return [symbol for symbol in self._chains if self.coingecko_id(symbol)]
+
+    def __contains__(self, symbol):
+        return self.get(symbol) is not None
+
+    def __len__(self):
+        return len(self.tokens)
@@ -0,0 +1,357 @@
+"""Tournaments of AI traders playing against each other on simulated portfolios.
+
+Every agent is a model plus a strategy prompt. All agents of all tournaments
+run as tasks on the app's event loop. In each round the agents see the same
+price snapshot, which is one batched lookup through the price layer. They
+reply with one trade ("SWAP 25% ETH -> USDC" or "HOLD"). The trade is applied
+to their simulated portfolio at snapshot prices less TOURNAMENT_FEE_BPS.
+Holdings live in a PortfolioBook (see portfolio_book.py), so scoring a round
+is one matrix-vector product and the leaderboard is kept as a sorted index.
+
+One semaphore shared by all tournaments bounds concurrent LLM calls to
+TOURNAMENT_LLM_CONCURRENCY. A decision that fails, times out or can't be
+parsed counts as HOLD; failures and timeouts, including no model answering,
+also count as agent errors. Run with UPSTREAM_MODE=replay to play offline
+against replayed prices and the stub LLM.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+from portfolio_book import PortfolioBook
+
+TOURNAMENT_LLM_CONCURRENCY = int(os.getenv("TOURNAMENT_LLM_CONCURRENCY", "16"))
+TOURNAMENT_DECISION_TIMEOUT = float(os.getenv("TOURNAMENT_DECISION_TIMEOUT", "30"))
+TOURNAMENT_FEE_BPS = float(os.getenv("TOURNAMENT_FEE_BPS", "30"))
+TOURNAMENT_MAX_AGENTS = int(os.getenv("TOURNAMENT_MAX_AGENTS", "500"))
+TOURNAMENT_MAX_ROUNDS = int(os.getenv("TOURNAMENT_MAX_ROUNDS", "1000"))
+# Finished tournaments kept for the results API, oldest dropped first
+TOURNAMENT_MAX_KEPT = int(os.getenv("TOURNAMENT_MAX_KEPT", "20"))
+
+DEFAULT_STARTING_BALANCE = {"USDC": 1000.0}
+DEFAULT_STRATEGY = "Grow the portfolio's USD value."
+
+DECISION_RE = re.compile(r"\bSWAP\s+([0-9]*\.?[0-9]+)\s*%\s+([A-Za-z0-9-]+)\s*(?:->|\bto\b)\s*([A-Za-z0-9-]+)", re.I)
+
+
+def parse_decision(reply):
+    """(from, to, fraction) for a 'SWAP <pct>% <FROM> -> <TO>' reply, or None for HOLD/anything else"""
+    match = DECISION_RE.search(reply or "")
+    if not match:
+        return None
+    fraction = min(float(match.group(1)) / 100, 1.0)
+    if fraction <= 0:
+        return None
+    return match.group(2).upper(), match.group(3).upper(), fraction
+
+
+class AgentConfig:
+    __slots__ = ("name", "model", "prompt")
+
+    def __init__(self, name, model, prompt=DEFAULT_STRATEGY):
+        self.name = name
+        self.model = model
+        self.prompt = prompt or DEFAULT_STRATEGY
+
+    @classmethod
+    def from_dict(cls, data, default_model):
+        if not isinstance(data, dict) or not data.get("name"):
+            raise ValueError("Every agent needs a name")
+        return cls(str(data["name"]), data.get("model") or default_model, data.get("prompt"))
+
+    def to_dict(self):
+        return {"name": self.name, "model": self.model, "prompt": self.prompt}
+
+
+class Portfolio:
+    """One agent's row in the tournament's PortfolioBook"""
+
+    def __init__(self, book, row):
+        self.book = book
+        self.row = row
+        self.trades = 0
+        self.fees_usd = 0.0
+
+    @property
+    def holdings(self):
+        return self.book.holdings_of(self.row)
+
+    @property
+    def value(self):
+        """USD value at the last valuation, or None before the first one"""
+        return float(self.book.values[self.row]) if self.book.valuations else None
+
+    def swap(self, from_token, to_token, fraction, prices, fee_bps=TOURNAMENT_FEE_BPS):
+        """Sell `fraction` of the from_token holding for to_token; returns the trade or None if not possible"""
+        amount = self.book.amount(self.row, from_token) * fraction
+        from_price = prices.get(from_token)
+        to_price = prices.get(to_token)
+        if amount <= 0 or from_token == to_token or not from_price or not to_price:
+            return None
+        gross_usd = amount * from_price
+        fee_usd = gross_usd * fee_bps / 10000
+        received = (gross_usd - fee_usd) / to_price
+
+        self.book.transfer(self.row, from_token, amount, to_token, received)
+        self.trades += 1
+        self.fees_usd += fee_usd
+        return {"from": from_token, "to": to_token, "from_amount": amount, "to_amount": received, "fee_usd": fee_usd}
+
+
+class Agent:
+    def __init__(self, config, book, starting_balance):
+        self.config = config
+        self.portfolio = Portfolio(book, book.add(config.name, starting_balance))
+        self.starting_value = None
+        self.last_trade = None
+        self.decisions = 0
+        self.errors = 0
+
+    def build_prompt(self, round_number, prices):
+        holdings = self.portfolio.holdings
+        holdings = ", ".join(f"{symbol}={amount:.6g}" for symbol, amount in sorted(holdings.items())) or "none"
+        quoted = ", ".join(f"{symbol}={price:.6g}" for symbol, price in sorted(prices.items()))
+        return (
+            f"Round: {round_number}\n\n"
+            f"Strategy: {self.config.prompt}\n\n"
+            f"Tokens: {', '.join(sorted(prices))}\n\n"
+            f"Prices USD: {quoted}\n\n"
+            f"Holdings: {holdings}\n\n"
+            "You are an AI trader competing in an EthereumFighter tournament. Your score is your portfolio value in USD.\n"
+            "Reply with exactly one line, either:\n"
+            "- SWAP <percent>% <FROM> -> <TO> to sell that share of your FROM holding for TO, or\n"
+            "- HOLD to keep the portfolio as it is.\n"
+        )
+
+
+class Tournament:
+    def __init__(self, tournament_id, agents, symbols, ask_llm, get_prices, rounds, round_interval,
+                 llm_semaphore, starting_balance=None, fee_bps=TOURNAMENT_FEE_BPS,
+                 decision_timeout=TOURNAMENT_DECISION_TIMEOUT, columns=None):
+        """ask_llm(prompt, model) -> reply text; get_prices(symbols) -> {symbol: price}.
+
+        columns orders the holdings matrix (the token registry order), default the traded symbols.
+        """
+        self.id = tournament_id
+        self.symbols = sorted(symbols)
+        self.starting_balance = dict(starting_balance or DEFAULT_STARTING_BALANCE)
+        self.book = PortfolioBook(columns or self.symbols, capacity=max(len(agents), 1))
+        for symbol in self.symbols:
+            self.book.column(symbol)
+        self.agents = [Agent(config, self.book, self.starting_balance) for config in agents]
+        self.ask_llm = ask_llm
+        self.get_prices = get_prices
+        self.rounds = rounds
+        self.round_interval = round_interval
+        self.llm_semaphore = llm_semaphore
+        self.fee_bps = fee_bps
+        self.decision_timeout = decision_timeout
+        self.status = "pending"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.prices = {}  # last known price per symbol, carried over rounds where a lookup misses
+        self.history = []  # per round: {"round", "time", "prices", "values"}
+        self.agent_rounds = 0
+
+    async def _decide(self, agent, round_number, prices):
+        prompt = agent.build_prompt(round_number, prices)
+        try:
+            async with self.llm_semaphore:
+                reply = await asyncio.wait_for(self.ask_llm(prompt, agent.config.model), self.decision_timeout)
+        except asyncio.TimeoutError:
+            agent.errors += 1
+            logging.warning(f"Tournament {self.id}: {agent.config.name} timed out in round {round_number}")
+            return None
+        except Exception as e:
+            agent.errors += 1
+            logging.error(f"Tournament {self.id}: {agent.config.name} failed in round {round_number}: {str(e)}")
+            return None
+        agent.decisions += 1
+        return parse_decision(reply)
+
+    async def play_round(self, round_number):
+        fetched = await self.get_prices(self.symbols)
+        self.prices.update({symbol: price for symbol, price in (fetched or {}).items() if price})
+        prices = dict(self.prices)
+        if not prices:
+            raise RuntimeError("No prices available")
+
+        price_vector = self.book.price_vector(prices)
+        if round_number == 0:
+            for agent, value in zip(self.agents, self.book.value(price_vector).tolist()):
+                agent.starting_value = value
+
+        decisions = await asyncio.gather(*(self._decide(agent, round_number, prices) for agent in self.agents))
+        for agent, decision in zip(self.agents, decisions):
+            agent.last_trade = agent.portfolio.swap(*decision, prices, self.fee_bps) if decision else None
+        values = self.book.value(price_vector)
+        self.agent_rounds += len(self.agents)
+        self.history.append({
+            "round": round_number,
+            "time": time.time(),
+            "prices": prices,
+            "values": dict(zip(self.book.names, values.tolist())),
+        })
+
+    async def run(self):
+        self.status = "running"
+        self.started_at = time.time()
+        try:
+            for round_number in range(self.rounds):
+                if round_number and self.round_interval > 0:
+                    await asyncio.sleep(self.round_interval)
+                await self.play_round(round_number)
+            self.status = "finished"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+            logging.error(f"Tournament {self.id} failed: {str(e)}")
+        finally:
+            self.finished_at = time.time()
+            logging.info(f"Tournament {self.id} {self.status} after {len(self.history)} rounds, {self.agent_rounds} agent-rounds")
+
+    def leaderboard(self, limit=None):
+        """Agents best first, from the book's sorted index"""
+        order = self.book.ranking()
+        board = []
+        for rank, row in enumerate((order if limit is None else order[:max(limit, 0)]).tolist(), 1):
+            agent = self.agents[row]
+            value = agent.portfolio.value
+            pnl = None
+            if agent.starting_value and value is not None:
+                pnl = (value - agent.starting_value) / agent.starting_value * 100
+            board.append({
+                "rank": rank,
+                "agent": agent.config.name,
+                "model": agent.config.model,
+                "value_usd": value,
+                "pnl_pct": pnl,
+                "trades": agent.portfolio.trades,
+                "fees_usd": agent.portfolio.fees_usd,
+                "errors": agent.errors,
+                "holdings": agent.portfolio.holdings,
+            })
+        return board
+
+    def summary(self):
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "agents": len(self.agents),
+            "rounds": self.rounds,
+            "rounds_played": len(self.history),
+            "agent_rounds": self.agent_rounds,
+            "agent_rounds_per_minute": self.agent_rounds / elapsed * 60 if elapsed > 0 else None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def results(self, include_history=False, limit=None):
+        results = self.summary()
+        results["symbols"] = self.symbols
+        results["starting_balance"] = self.starting_balance
+        results["agent_configs"] = [agent.config.to_dict() for agent in self.agents]
+        results["leaderboard"] = self.leaderboard(limit)
+        if include_history:
+            results["history"] = self.history
+        return results
+
+
+class TournamentManager:
+    """Creates tournaments on the running event loop and keeps recent ones for the results API"""
+
+    def __init__(self, ask_llm, get_prices, default_symbols, default_model,
+                 llm_concurrency=TOURNAMENT_LLM_CONCURRENCY, max_kept=TOURNAMENT_MAX_KEPT, model_allowed=None):
+        """default_symbols (the token registry order) also fixes the holdings matrix columns.
+
+        model_allowed(model) -> bool, when given, rejects agents asking for other models.
+        """
+        self.model_allowed = model_allowed
+        self.ask_llm = ask_llm
+        self.get_prices = get_prices
+        self.default_symbols = list(default_symbols)
+        self.default_model = default_model
+        self.llm_concurrency = llm_concurrency
+        self.max_kept = max_kept
+        self.tournaments = OrderedDict()
+        self._ids = itertools.count(1)
+        self._tasks = {}
+        self._semaphore = None
+
+    def create(self, agents, symbols=None, rounds=10, round_interval=0.0, starting_balance=None):
+        """Validate the config and start the tournament; must be called on the event loop"""
+        if not agents:
+            raise ValueError("At least one agent is required")
+        if len(agents) > TOURNAMENT_MAX_AGENTS:
+            raise ValueError(f"At most {TOURNAMENT_MAX_AGENTS} agents per tournament")
+        configs = [AgentConfig.from_dict(agent, self.default_model) for agent in agents]
+        if len({config.name for config in configs}) != len(configs):
+            raise ValueError("Agent names must be unique")
+        if self.model_allowed is not None:
+            for config in configs:
+                if not self.model_allowed(config.model):
+                    raise ValueError(f"Model {config.model!r} is not allowed")
+        rounds = int(rounds)
+        if not 1 <= rounds <= TOURNAMENT_MAX_ROUNDS:
+            raise ValueError(f"rounds must be between 1 and {TOURNAMENT_MAX_ROUNDS}")
+        round_interval = float(round_interval)
+        if round_interval < 0:
+            raise ValueError("round_interval can't be negative")
+        starting_balance = {str(k).upper(): float(v) for k, v in (starting_balance or DEFAULT_STARTING_BALANCE).items()}
+        if any(amount < 0 for amount in starting_balance.values()):
+            raise ValueError("starting_balance amounts can't be negative")
+        symbols = sorted({s.upper() for s in (symbols or self.default_symbols)} | set(starting_balance))
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.llm_concurrency)
+        tournament = Tournament(
+            str(next(self._ids)), configs, symbols, self.ask_llm, self.get_prices,
+            rounds, round_interval, self._semaphore, starting_balance, columns=self.default_symbols,
+        )
+        self.tournaments[tournament.id] = tournament
+        self._evict()
+
+        task = asyncio.ensure_future(tournament.run())
+        self._tasks[tournament.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(tournament.id, None))
+        return tournament
+
+    def _evict(self):
+        # Only tournaments that are done are dropped, running ones are always kept
+        done = [tid for tid, t in self.tournaments.items() if tid not in self._tasks and t.status != "pending"]
+        while len(self.tournaments) > self.max_kept and done:
+            del self.tournaments[done.pop(0)]
+
+    def get(self, tournament_id):
+        return self.tournaments.get(str(tournament_id))
+
+    def cancel(self, tournament_id):
+        task = self._tasks.get(str(tournament_id))
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def stats(self):
+        statuses = {}
+        for tournament in self.tournaments.values():
+            statuses[tournament.status] = statuses.get(tournament.status, 0) + 1
+        return {
+            "tournaments": len(self.tournaments),
+            "running": len(self._tasks),
+            "by_status": statuses,
+            "agent_rounds": sum(t.agent_rounds for t in self.tournaments.values()),
+            "llm_concurrency": self.llm_concurrency,
+        }
@@ -0,0 +1,100 @@
+"""Proof that a caller controls a wallet, required before its chat history is used.
+
+Conversation history is keyed by wallet address (see conversation_store.py).
+An address alone proves nothing, so reading, writing and clearing history
+first needs a signed challenge:
+
+1. POST /wallet_auth/nonce {"wallet_address"} returns a one-time message
+   naming the address and a random nonce, valid for WALLET_AUTH_NONCE_TTL.
+2. The wallet signs the message with personal_sign (EIP-191).
+3. POST /wallet_auth/verify {"wallet_address", "signature"} recovers the
+   signer. If it matches the address, the response carries a session token
+   valid for WALLET_AUTH_SESSION_TTL.
+4. The token is sent with /ask_ai, /ask_ai_stream and /conversation
+   requests, either in the X-Wallet-Session header or as session_token.
+
+A nonce can be used once. Pending nonces and sessions are held in memory,
+in LRU order and bounded by WALLET_AUTH_MAX_ENTRIES, so with several
+workers a client must sign in on the one that serves it.
+"""
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+WALLET_AUTH_NONCE_TTL = float(os.getenv("WALLET_AUTH_NONCE_TTL", "300"))
+WALLET_AUTH_SESSION_TTL = float(os.getenv("WALLET_AUTH_SESSION_TTL", "86400"))
+WALLET_AUTH_MAX_ENTRIES = int(os.getenv("WALLET_AUTH_MAX_ENTRIES", "10000"))
+
+WALLET_SESSION_HEADER = "X-Wallet-Session"
+
+
+def challenge_message(wallet_address, nonce):
+    return f"Sign in to Ethereum Fighter chat history\nWallet: {wallet_address}\nNonce: {nonce}"
+
+
+def _put(entries, key, value, max_entries):
+    entries[key] = value
+    entries.move_to_end(key)
+    while len(entries) > max_entries:
+        entries.popitem(last=False)
+
+
+class WalletAuth:
+    def __init__(self, nonce_ttl=WALLET_AUTH_NONCE_TTL, session_ttl=WALLET_AUTH_SESSION_TTL,
+                 max_entries=WALLET_AUTH_MAX_ENTRIES):
+        self.nonce_ttl = nonce_ttl
+        self.session_ttl = session_ttl
+        self.max_entries = max_entries
+        self._nonces = OrderedDict()  # address -> (message, expires at)
+        self._sessions = OrderedDict()  # token -> (address, expires at)
+        self.nonces_issued = 0
+        self.sessions_issued = 0
+        self.failed_verifications = 0
+
+    def issue_nonce(self, wallet_address):
+        """One-time message the wallet has to sign; a new one replaces the previous"""
+        message = challenge_message(wallet_address, secrets.token_hex(16))
+        _put(self._nonces, wallet_address, (message, time.monotonic() + self.nonce_ttl), self.max_entries)
+        self.nonces_issued += 1
+        return message
+
+    def verify(self, wallet_address, signature):
+        """Session token for a signature over the pending nonce; raises PermissionError otherwise"""
+        pending = self._nonces.pop(wallet_address, None)
+        if pending is None or pending[1] < time.monotonic():
+            self.failed_verifications += 1
+            raise PermissionError("No pending nonce for this wallet, request one from /wallet_auth/nonce")
+        try:
+            signer = Account.recover_message(encode_defunct(text=pending[0]), signature=signature)
+        except Exception:
+            signer = None
+        if not signer or signer.lower() != wallet_address:
+            self.failed_verifications += 1
+            raise PermissionError("Signature does not match the wallet address")
+        token = secrets.token_urlsafe(32)
+        _put(self._sessions, token, (wallet_address, time.monotonic() + self.session_ttl), self.max_entries)
+        self.sessions_issued += 1
+        return token
+
+    def wallet_for(self, token):
+        """Address a live session token was issued for, or None"""
+        session = self._sessions.get(token) if token else None
+        if session is None:
+            return None
+        if session[1] < time.monotonic():
+            del self._sessions[token]
+            return None
+        return session[0]
+
+    def stats(self):
+        return {
+            "pending_nonces": len(self._nonces),
+            "sessions": len(self._sessions),
+            "nonces_issued": self.nonces_issued,
+            "sessions_issued": self.sessions_issued,
+            "failed_verifications": self.failed_verifications,
+        }
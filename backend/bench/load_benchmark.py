@@ -0,0 +1,116 @@
+"""Simple HTTP load benchmark for comparing the WSGI and ASGI serving modes.
+
+Start both servers, then run e.g.:
+
+    python3 bench/load_benchmark.py \
+        --target wsgi=http://localhost:5000 \
+        --target asgi=http://localhost:5001 \
+        --path "/token_price/ETH" --concurrency 50 --requests 500
+
+Prints requests/sec and latency percentiles for every target. With
+--upstream-calls the target's /metrics is scraped before and after the run to
+report how many outbound calls (1inch, CoinGecko, OpenRouter) the load cost,
+e.g. to see request coalescing at work with a burst of identical quotes.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import aiohttp
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def count_upstream_calls(session, base_url):
+    """Sum of upstream_request_duration_seconds_count over all providers, from /metrics"""
+    async with session.get(base_url + "/metrics") as response:
+        text = await response.text()
+    total = 0
+    for line in text.splitlines():
+        if line.startswith("upstream_request_duration_seconds_count"):
+            total += float(line.rsplit(" ", 1)[1])
+    return int(total)
+
+
+async def run_load(base_url, path, concurrency, total_requests, method="GET", payload=None, upstream_calls=False):
+    """Fire total_requests at base_url+path with the given concurrency"""
+    latencies = []
+    errors = 0
+    counter = iter(range(total_requests))
+
+    async def worker(session):
+        nonlocal errors
+        for _ in counter:
+            start = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, json=payload) as response:
+                    await response.read()
+                    if response.status >= 500:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        upstream_before = await count_upstream_calls(session, base_url) if upstream_calls else None
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        upstream_after = await count_upstream_calls(session, base_url) if upstream_calls else None
+
+    result = {
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "requests_per_sec": total_requests / elapsed if elapsed else None,
+        "latency_mean_ms": statistics.mean(latencies) * 1000 if latencies else None,
+        "latency_p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "latency_p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "latency_p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+    }
+    if upstream_calls:
+        result["upstream_calls"] = upstream_after - upstream_before
+        result["upstream_calls_per_request"] = result["upstream_calls"] / total_requests
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="name=base_url, may be repeated")
+    parser.add_argument("--path", default="/token_price/ETH")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--json", default=None, help="JSON request body")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--upstream-calls", action="store_true", help="report outbound calls made during the run")
+    args = parser.parse_args()
+
+    payload = json.loads(args.json) if args.json else None
+    results = {}
+    for target in args.target:
+        name, _, base_url = target.partition("=")
+        results[name] = asyncio.run(run_load(
+            base_url.rstrip("/"), args.path, args.concurrency, args.requests, args.method, payload, args.upstream_calls
+        ))
+        r = results[name]
+        print(f"{name:>8}: {r['requests_per_sec']:.1f} req/s, "
+              f"p50 {r['latency_p50_ms']:.1f} ms, p95 {r['latency_p95_ms']:.1f} ms, "
+              f"p99 {r['latency_p99_ms']:.1f} ms, errors {r['errors']}")
+        if args.upstream_calls:
+            print(f"{'':>8}  upstream calls {r['upstream_calls']} ({r['upstream_calls_per_request']:.3f} per request)")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
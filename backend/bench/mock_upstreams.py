@@ -0,0 +1,167 @@
+"""Local stand-ins for the 1inch, CoinGecko and OpenRouter APIs.
+
+Serves the endpoints the backend calls, under /1inch, /coingecko and
+/openrouter, with configurable latency, jitter and error injection. Prices
+and quotes come from the replay fixtures (see api/replay.py) so they are
+consistent with the token registry. Point the app at it with:
+
+    ONEINCH_API_URL=http://127.0.0.1:8900/1inch
+    COINGECKO_API_URL=http://127.0.0.1:8900/coingecko
+    OPENROUTER_API_URL=http://127.0.0.1:8900/openrouter/chat/completions
+
+    python3 bench/mock_upstreams.py --port 8900 --latency-ms 50 --jitter-ms 10 --error-rate 0.01
+
+GET /_stats returns the number of calls served per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from replay import ReplayMarket, StubLLM  # noqa: E402
+from token_registry import TokenRegistry  # noqa: E402
+
+
+class MockUpstreams:
+    def __init__(self, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0, error_status=503):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.registry = TokenRegistry.load()
+        self.market = ReplayMarket(self.registry)
+        self.llm = StubLLM(self.registry.symbol_set)
+        self.calls = {}
+        self.errors = 0
+
+    async def _delay(self, endpoint):
+        """Count the call and sleep for the injected latency; returns an error response to inject, or None"""
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=self.error_status, text="injected error")
+        return None
+
+    def _addresses_to_prices(self, chain_id, addresses):
+        prices = {}
+        for address in addresses:
+            token = self.registry.by_address(address, chain_id)
+            price = self.market.price(token.symbol) if token else None
+            if price is not None:
+                prices[address.lower()] = str(price)
+        return prices
+
+    async def oneinch_price_get(self, request):
+        error = await self._delay("1inch_price")
+        if error is not None:
+            return error
+        chain_id = int(request.match_info["chain"])
+        return web.json_response(self._addresses_to_prices(chain_id, [request.match_info["address"]]))
+
+    async def oneinch_price_post(self, request):
+        error = await self._delay("1inch_price")
+        if error is not None:
+            return error
+        body = await request.json()
+        chain_id = int(request.match_info["chain"])
+        return web.json_response(self._addresses_to_prices(chain_id, body.get("tokens", [])))
+
+    async def oneinch_quote(self, request):
+        error = await self._delay("1inch_quote")
+        if error is not None:
+            return error
+        args = request.query
+        quote = await self.market.quote(args["src"], args["dst"], int(args["amount"]), int(request.match_info["chain"]))
+        if quote is None:
+            return web.json_response({"error": "insufficient liquidity"}, status=400)
+        return web.json_response(quote)
+
+    async def oneinch_gas_price(self, request):
+        error = await self._delay("1inch_gas_price")
+        if error is not None:
+            return error
+        fee = str(self.market.gas_price_wei)
+        return web.json_response({"medium": {"maxFeePerGas": fee, "maxPriorityFeePerGas": "1000000000"}})
+
+    async def coingecko_price(self, request):
+        error = await self._delay("coingecko_price")
+        if error is not None:
+            return error
+        ids = set(request.query.get("ids", "").split(","))
+        prices = {}
+        for token in self.registry.tokens:
+            if token.coingecko_id in ids and token.coingecko_id not in prices:
+                price = self.market.price(token.symbol)
+                if price is not None:
+                    prices[token.coingecko_id] = {"usd": price}
+        return web.json_response(prices)
+
+    async def openrouter_completion(self, request):
+        error = await self._delay("openrouter_completion")
+        if error is not None:
+            return error
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        if "User's request:" in prompt:
+            prompt_type = "swap_extraction"
+        elif "Holdings:" in prompt:
+            prompt_type = "trade_decision"
+        else:
+            prompt_type = "answer"
+        model = body.get("model", "mock")
+        if not body.get("stream"):
+            reply = await self.llm.complete(prompt, model, prompt_type)
+            return web.json_response({
+                "model": model,
+                "choices": [{"message": {"role": "assistant", "content": reply}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        async for chunk in self.llm.stream(prompt, model):
+            data = json.dumps({"choices": [{"delta": {"content": chunk}}]})
+            await response.write(f"data: {data}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def stats(self, request):
+        return web.json_response({"calls": self.calls, "errors": self.errors})
+
+    def app(self):
+        app = web.Application()
+        app.add_routes([
+            web.get("/1inch/price/v1.1/{chain}/{address}", self.oneinch_price_get),
+            web.post("/1inch/price/v1.1/{chain}", self.oneinch_price_post),
+            web.get("/1inch/swap/v5.2/{chain}/quote", self.oneinch_quote),
+            web.get("/1inch/gas-price/v1.5/{chain}", self.oneinch_gas_price),
+            web.get("/coingecko/api/v3/simple/price", self.coingecko_price),
+            web.post("/openrouter/chat/completions", self.openrouter_completion),
+            web.get("/_stats", self.stats),
+        ])
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    mock = MockUpstreams(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Benchmark suite for the backend routes against local mock upstreams.
+
+Starts bench/mock_upstreams.py and the ASGI app (uvicorn) pointed at it, then
+measures throughput and p50/p95/p99 latency for /token_price, /token_prices,
+/get_exchange_quote and /ask_ai at each concurrency level, plus
+micro-benchmarks for the swap extraction regex and calculate_token_rate.
+The report is JSON; pass a previous one as --baseline to fail (exit 1) when
+a p95 latency or micro-benchmark mean regresses by more than --tolerance.
+
+    python3 bench/route_benchmark.py --concurrency 1,8,32,128 --requests 200 \\
+        --latency-ms 50 --error-rate 0.01 --output report.json
+
+Extra app settings can be passed with --env, e.g. --env PRICE_CACHE_TTL=0 to
+measure the uncached upstream path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(BENCH_DIR, "..", "api")
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, API_DIR)
+
+from load_benchmark import percentile, run_load  # noqa: E402
+
+ROUTES = [
+    ("GET", "/token_price/ETH", None),
+    ("GET", "/token_prices?tokens=ETH,WBTC,USDC,LINK,1INCH", None),
+    ("GET", "/get_exchange_quote?from_token=1INCH&to_token=ETH&from_amount=10", None),
+    ("POST", "/ask_ai", {"question": "swap 10 1inch to eth"}),
+]
+
+# Replies in the shape the swap extraction prompt asks for, plus noisy variants
+SWAP_EXTRACTION_REPLIES = [
+    "TokenA: 1INCH, TokenB: ETH, AmountA: 10, AmountB: ''",
+    "TokenA: \"WBTC\", TokenB: \"USDC\", AmountA: \"0.5\", AmountB: \"\"",
+    "TokenA: ETH, TokenB: DAI, AmountA: '', AmountB: 1,000",
+    "Sure! TokenA: LINK, TokenB: USDT, AmountB: 250, AmountA: ",
+    "I could not find a swap in this request.",
+]
+
+
+async def wait_until_up(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def mock_calls(mock_url):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(mock_url + "/_stats") as response:
+            stats = await response.json()
+    return sum(stats["calls"].values())
+
+
+async def run_routes(app_url, mock_url, levels, total_requests):
+    results = {}
+    for method, path, payload in ROUTES:
+        runs = []
+        for concurrency in levels:
+            before = await mock_calls(mock_url) if mock_url else None
+            run = await run_load(app_url, path, concurrency, max(total_requests, concurrency), method, payload)
+            if mock_url:
+                run["upstream_calls"] = await mock_calls(mock_url) - before
+            runs.append(run)
+            print(f"{method} {path} c={concurrency}: {run['requests_per_sec']:.1f} req/s, "
+                  f"p50 {run['latency_p50_ms']:.1f} ms, p95 {run['latency_p95_ms']:.1f} ms, "
+                  f"p99 {run['latency_p99_ms']:.1f} ms, errors {run['errors']}", file=sys.stderr)
+        results[f"{method} {path}"] = runs
+    return results
+
+
+def summarize(timings):
+    return {
+        "iterations": len(timings),
+        "mean_us": sum(timings) / len(timings) * 1e6,
+        "p50_us": percentile(timings, 50) * 1e6,
+        "p99_us": percentile(timings, 99) * 1e6,
+    }
+
+
+def run_micro(iterations):
+    """Micro-benchmarks run in-process; the app is imported in replay mode so nothing hits the network"""
+    os.environ["UPSTREAM_MODE"] = "replay"
+    import index  # noqa: E402
+
+    timings = []
+    for i in range(iterations):
+        reply = SWAP_EXTRACTION_REPLIES[i % len(SWAP_EXTRACTION_REPLIES)]
+        started = time.perf_counter()
+        index.parse_swap_extraction_reply(reply)
+        timings.append(time.perf_counter() - started)
+    micro = {"swap_extraction_regex": summarize(timings)}
+
+    pairs = [("1INCH", "ETH"), ("ETH", "USDC"), ("WBTC", "DAI"), ("LINK", "USDT")]
+
+    async def rate_timings():
+        # First call per pair warms the price cache, as in steady state
+        for from_token, to_token in pairs:
+            await index.calculate_token_rate(from_token, to_token, 10)
+        result = []
+        for _ in range(iterations):
+            from_token, to_token = random.choice(pairs)
+            started = time.perf_counter()
+            await index.calculate_token_rate(from_token, to_token, 10)
+            result.append(time.perf_counter() - started)
+        return result
+
+    micro["calculate_token_rate"] = summarize(index.run_async(rate_timings()))
+    return micro
+
+
+def find_regressions(report, baseline, tolerance):
+    regressions = []
+    for route, runs in report.get("routes", {}).items():
+        old_runs = {run["concurrency"]: run for run in baseline.get("routes", {}).get(route, [])}
+        for run in runs:
+            old = old_runs.get(run["concurrency"])
+            if old and old.get("latency_p95_ms") and run["latency_p95_ms"] > old["latency_p95_ms"] * (1 + tolerance):
+                regressions.append(f"{route} c={run['concurrency']}: p95 {old['latency_p95_ms']:.1f} -> {run['latency_p95_ms']:.1f} ms")
+    for name, result in report.get("micro", {}).items():
+        old = baseline.get("micro", {}).get(name)
+        if old and result["mean_us"] > old["mean_us"] * (1 + tolerance):
+            regressions.append(f"{name}: mean {old['mean_us']:.1f} -> {result['mean_us']:.1f} us")
+    return regressions
+
+
+def start_process(args, env=None):
+    return subprocess.Popen([sys.executable] + args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route and concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mock upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock upstream calls that fail")
+    parser.add_argument("--app-port", type=int, default=8901)
+    parser.add_argument("--mock-port", type=int, default=8900)
+    parser.add_argument("--app-url", default=None, help="benchmark an already running app instead of starting one")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE passed to the app, may be repeated")
+    parser.add_argument("--micro-iterations", type=int, default=20000)
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--output", default=None, help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs. the baseline")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    report = {
+        "generated_at": time.time(),
+        "config": {
+            "concurrency": levels,
+            "requests": args.requests,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "env": args.env,
+        },
+    }
+
+    processes = []
+    try:
+        if not args.skip_routes:
+            app_url = args.app_url
+            mock_url = None
+            if app_url is None:
+                mock_url = f"http://127.0.0.1:{args.mock_port}"
+                processes.append(start_process([
+                    os.path.join(BENCH_DIR, "mock_upstreams.py"), "--port", str(args.mock_port),
+                    "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                    "--error-rate", str(args.error_rate),
+                ]))
+                env = dict(os.environ, ONEINCH_API_URL=f"{mock_url}/1inch", COINGECKO_API_URL=f"{mock_url}/coingecko",
+                           OPENROUTER_API_URL=f"{mock_url}/openrouter/chat/completions", OPENROUTER_API_KEY="mock",
+                           ONEINCH_RATE_LIMIT="0", COINGECKO_RATE_LIMIT="0", LOG_SAMPLE_RATE="0")
+                env.update(item.split("=", 1) for item in args.env)
+                processes.append(start_process(
+                    ["-m", "uvicorn", "asgi:app", "--app-dir", API_DIR, "--port", str(args.app_port), "--log-level", "warning"],
+                    env,
+                ))
+                app_url = f"http://127.0.0.1:{args.app_port}"
+                asyncio.run(wait_until_up(mock_url + "/_stats"))
+            asyncio.run(wait_until_up(app_url + "/"))
+            report["routes"] = asyncio.run(run_routes(app_url.rstrip("/"), mock_url, levels, args.requests))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    if not args.skip_micro:
+        report["micro"] = run_micro(args.micro_iterations)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = find_regressions(report, json.load(f), args.tolerance)
+        for regression in report["regressions"]:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
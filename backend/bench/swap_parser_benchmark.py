@@ -0,0 +1,98 @@
+"""Accuracy and speed benchmark for the local swap-intent parser.
+
+Runs every sample in swap_intent_corpus.json through parse_swap_intent and
+reports how many requests it answers confidently (LLM calls avoided), how
+accurate those answers are, and the parse time per request.
+
+    python3 bench/swap_parser_benchmark.py [--corpus FILE] [--min-confidence 0.75] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from index import token_registry  # noqa: E402
+from swap_parser import SWAP_PARSER_MIN_CONFIDENCE, parse_swap_intent  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "swap_intent_corpus.json")
+
+
+def same_amount(a, b):
+    if not a or not b:
+        return a == b
+    return float(a) == float(b)
+
+
+def matches(swap_info, expected):
+    return (
+        swap_info["inputToken"] == expected["inputToken"]
+        and swap_info["outputToken"] == expected["outputToken"]
+        and same_amount(swap_info["inputAmount"], expected["inputAmount"])
+        and same_amount(swap_info["outputAmount"], expected["outputAmount"])
+    )
+
+
+def run(corpus, min_confidence, repeat=200):
+    symbols = token_registry.symbol_set
+    confident = 0
+    correct = 0
+    failures = []
+    for sample in corpus:
+        intent = parse_swap_intent(sample["text"], symbols)
+        if intent.confidence < min_confidence:
+            continue
+        confident += 1
+        if matches(intent.to_swap_info(), sample["expected"]):
+            correct += 1
+        else:
+            failures.append({"text": sample["text"], "got": intent.to_swap_info(), "expected": sample["expected"]})
+
+    timings = []
+    for _ in range(repeat):
+        for sample in corpus:
+            started = time.perf_counter()
+            parse_swap_intent(sample["text"], symbols)
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    return {
+        "samples": len(corpus),
+        "min_confidence": min_confidence,
+        "handled_locally": confident,
+        "llm_calls_avoided_ratio": confident / len(corpus) if corpus else None,
+        "local_accuracy": correct / confident if confident else None,
+        "parse_mean_us": sum(timings) / len(timings) * 1e6,
+        "parse_p99_us": timings[int(0.99 * (len(timings) - 1))] * 1e6,
+        "mismatches": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--min-confidence", type=float, default=SWAP_PARSER_MIN_CONFIDENCE)
+    parser.add_argument("--json", action="store_true", help="print the machine-readable report only")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        corpus = json.load(f)
+    report = run(corpus, args.min_confidence)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"samples:            {report['samples']}")
+    print(f"handled locally:    {report['handled_locally']} ({report['llm_calls_avoided_ratio']:.0%} of LLM extraction calls avoided)")
+    if report["local_accuracy"] is not None:
+        print(f"local accuracy:     {report['local_accuracy']:.1%}")
+    print(f"parse time:         mean {report['parse_mean_us']:.1f} us, p99 {report['parse_p99_us']:.1f} us")
+    for failure in report["mismatches"]:
+        print(f"  mismatch: {failure['text']!r}: got {failure['got']}, expected {failure['expected']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -553,6 +553,22 @@ export default function WorldPage() {
         }
     }, [swapModalOpen, exchangeQuote]);
 
+    // Keep the quote live from the backend's shared price stream while the swap modal is open
+    useEffect(() => {
+        if (!swapModalOpen) return;
+
+        const source = new EventSource('http://localhost:5000/price_stream?pairs=1INCH:ETH:10');
+        source.addEventListener('quote', (event) => {
+            const data = JSON.parse((event as MessageEvent).data);
+            setExchangeQuote(data.quote);
+        });
+        source.onerror = (error) => {
+            console.error("Price stream error:", error);
+        };
+
+        return () => source.close();
+    }, [swapModalOpen]);
+
     // Check if a position is next to a temple
     const isNextToTemple = (position: { x: number, y: number }) => {
         const { x, y } = position;